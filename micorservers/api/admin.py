@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Course, Lesson, Enrollment, Challenge, Submission, MCQ, LearningPath, UserProgress
+from .models import Course, Lesson, Enrollment, Challenge, Submission, MCQ, LearningPath, UserProgress, GradingJob, PDFIngestJob
 
 # Register your models here.
 admin.site.register(Course)
@@ -10,3 +10,5 @@ admin.site.register(Submission)
 admin.site.register(MCQ)
 admin.site.register(LearningPath)
 admin.site.register(UserProgress)
+admin.site.register(GradingJob)
+admin.site.register(PDFIngestJob)
@@ -0,0 +1,118 @@
+"""
+Versioned read-through cache for the public course catalog.
+
+Every course has a version counter, and so does the catalog as a whole
+(``courses``); signals bump them after any write to a course or its modules,
+lessons, challenges, MCQs or rating stats commits. Cached payloads and ETags
+embed the versions they were built from, so invalidating is a single counter
+increment and stale entries are simply never read again (they expire after
+``TTL``). Counters live in the cache; one that is evicted restarts from the
+current time in nanoseconds, above any value it could have reached before.
+That only holds if every process reads the same counters, which is why the
+settings refuse a per-process cache outside DEBUG: with ``LocMemCache`` a
+bump would be invisible to the other workers. Bulk writes that skip signals
+(``rebuild_rating_stats``, ``progress.reconcile``, ``seed_demo --mode load``)
+call ``bump`` themselves.
+
+``Cache-Control: public, max-age=MAX_AGE`` plus the ETag let browsers and
+reverse proxies answer repeats, and revalidations are answered with a 304
+without touching the database. Responses vary on ``Accept`` (JSON or the
+browsable API), so shared caches must keep them apart.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+
+from .models import Lesson
+
+DEFAULTS = {
+    'CACHE': 'default',
+    'TTL': 60 * 60,
+    'MAX_AGE': 60,
+}
+CATALOG = 'courses'
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'CATALOG_CACHE', {}))
+    return config
+
+
+def _cache():
+    return caches[get_config()['CACHE']]
+
+
+def course_scope(course_id):
+    return f'course:{course_id}'
+
+
+def _version_key(scope):
+    return f'catalog-version:{scope}'
+
+
+def versions(scopes):
+    """Current version of each scope, starting missing counters at the current time."""
+    cache = _cache()
+    keys = [_version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def _bump(scopes):
+    cache = _cache()
+    for scope in scopes:
+        try:
+            cache.incr(_version_key(scope))
+        except ValueError:
+            cache.set(_version_key(scope), time.time_ns(), None)
+
+
+def bump(course_ids):
+    """Invalidate the given courses and the catalog listing once the transaction commits."""
+    scopes = [CATALOG] + [course_scope(course_id) for course_id in set(course_ids) if course_id is not None]
+    transaction.on_commit(lambda: _bump(scopes))
+
+
+def bump_for_lessons(lesson_ids):
+    bump(Lesson.objects.filter(pk__in=set(lesson_ids)).values_list('course_id', flat=True))
+
+
+def load(key):
+    return _cache().get(f'catalog:{key}')
+
+
+def store(key, payload):
+    _cache().set(f'catalog:{key}', payload, get_config()['TTL'])
+
+
+# HTTP
+
+def request_tag(request, scopes):
+    """Key and ETag of a GET response: the scope versions, the absolute URL and the negotiated media type."""
+    material = '|'.join(map(str, versions(scopes))) + '|' + request.build_absolute_uri() + '|' + request.headers.get('Accept', '')
+    digest = hashlib.blake2b(material.encode(), digest_size=16).hexdigest()
+    return digest, quote_etag(digest)
+
+
+def not_modified(request, etag):
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        return finish(HttpResponse(status=304), etag)
+    return None
+
+
+def finish(response, etag):
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=get_config()['MAX_AGE'])
+    patch_vary_headers(response, ['Accept'])
+    return response
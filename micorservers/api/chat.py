@@ -0,0 +1,318 @@
+"""
+Course chat over WebSockets (``ws/courses/<course_id>/chat/``), served by the
+ASGI application in ``core/asgi.py`` without extra dependencies.
+
+Only the course instructor, staff and enrolled students may join a room. On
+join a client receives the last ``BACKFILL`` messages of the room as one
+``history`` frame, then ``messages`` frames carrying every new message,
+batched for up to ``BATCH_INTERVAL`` seconds / ``BATCH_SIZE`` messages. It
+posts with ``{"message": "..."}``.
+
+Messages are fanned out through a broker. ``InProcessBroker`` only reaches
+sockets of the current process; ``RedisBroker`` relays through Redis pub/sub
+so messages saved by any web or worker process reach every socket. Messages
+created through the REST API are published by a ``post_save`` signal.
+"""
+import asyncio
+import json
+import re
+import threading
+from http.cookies import SimpleCookie
+from importlib import import_module
+from urllib.parse import parse_qs, urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, load_backend
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.crypto import constant_time_compare
+from django.utils.module_loading import import_string
+from rest_framework.authtoken.models import Token
+
+from .models import ChatMessage, Course, Enrollment
+
+DEFAULTS = {
+    'BROKER': 'api.chat.InProcessBroker',
+    'REDIS_URL': 'redis://localhost:6379/0',
+    'BACKFILL': 50,
+    'BATCH_INTERVAL': 0.05,
+    'BATCH_SIZE': 100,
+    'QUEUE_SIZE': 1000,
+    'MAX_MESSAGE_LENGTH': 4000,
+}
+ROOM_PATH = re.compile(r'^/ws/courses/(?P<course_id>\d+)/chat/$')
+# Close codes: policy violation, unknown room, and "try again later" for consumers that fell behind.
+CLOSE_FORBIDDEN = 4403
+CLOSE_NOT_FOUND = 4404
+CLOSE_LAGGING = 1013
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'CHAT', {}))
+    return config
+
+
+def message_payload(message):
+    return {
+        'id': message.id,
+        'course': message.course_id,
+        'user': message.user_id,
+        'username': message.user.username,
+        'message': message.message,
+        'timestamp': message.timestamp.isoformat(),
+    }
+
+
+# Brokers
+
+class Subscription:
+    def __init__(self, room, loop, size):
+        self.room = room
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=size)
+        self.lagging = False
+
+    def deliver(self, payload):
+        # Runs on the subscriber's event loop.
+        if self.lagging:
+            return
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            # The writer notices on its next batch and closes the socket; the client rejoins with a backfill.
+            self.lagging = True
+
+
+class InProcessBroker:
+    """Fan-out between sockets of this process; ``publish`` is safe from any thread."""
+
+    def __init__(self, config):
+        self.queue_size = config['QUEUE_SIZE']
+        self._lock = threading.Lock()
+        self._rooms = {}
+
+    def subscribe(self, room):
+        subscription = Subscription(room, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._rooms.setdefault(room, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._rooms.get(subscription.room, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self._rooms.pop(subscription.room, None)
+
+    def publish(self, room, payload):
+        self.dispatch(room, payload)
+
+    def dispatch(self, room, payload):
+        with self._lock:
+            subscribers = list(self._rooms.get(room, ()))
+        for subscription in subscribers:
+            subscription.loop.call_soon_threadsafe(subscription.deliver, payload)
+
+
+class RedisBroker(InProcessBroker):
+    """Relays through Redis pub/sub (or any server speaking its protocol) to reach other processes."""
+
+    channel_prefix = 'chat:'
+
+    def __init__(self, config):
+        super().__init__(config)
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError:
+            raise ImproperlyConfigured('CHAT BROKER RedisBroker requires the "redis" package.')
+        self.url = config['REDIS_URL']
+        self._publisher = redis.Redis.from_url(self.url)
+        self._async_redis = redis.asyncio
+        self._listeners = {}
+
+    def subscribe(self, room):
+        loop = asyncio.get_running_loop()
+        if loop not in self._listeners:
+            self._listeners[loop] = loop.create_task(self._listen())
+        return super().subscribe(room)
+
+    def publish(self, room, payload):
+        self._publisher.publish(f'{self.channel_prefix}{room}', json.dumps(payload))
+
+    async def _listen(self):
+        client = self._async_redis.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.psubscribe(f'{self.channel_prefix}*')
+        async for event in pubsub.listen():
+            if event['type'] == 'pmessage':
+                room = event['channel'].decode()[len(self.channel_prefix):]
+                self.dispatch(room, json.loads(event['data']))
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            config = get_config()
+            _broker = import_string(config['BROKER'])(config)
+        return _broker
+
+
+def room_name(course_id):
+    return f'course-{course_id}'
+
+
+def publish_message(message):
+    get_broker().publish(room_name(message.course_id), message_payload(message))
+
+
+# Database access (sync, called through sync_to_async)
+
+def _authenticate(scope):
+    """Return the user for a ``?token=`` query parameter or the session cookie, else None."""
+    token = parse_qs(scope.get('query_string', b'').decode()).get('token')
+    if token:
+        found = Token.objects.select_related('user').filter(key=token[0]).first()
+        return found.user if found and found.user.is_active else None
+
+    cookies = SimpleCookie()
+    cookies.load(_header(scope, b'cookie'))
+    morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+    if morsel is None or not _origin_allowed(scope):
+        return None
+    session = import_module(settings.SESSION_ENGINE).SessionStore(morsel.value)
+    user_id, backend_path = session.get(SESSION_KEY), session.get(BACKEND_SESSION_KEY)
+    if user_id is None or backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return None
+    user = load_backend(backend_path).get_user(user_id)
+    if user is None or not user.is_active:
+        return None
+    # Same check as django.contrib.auth.get_user: a password change ends existing sessions.
+    if not constant_time_compare(session.get(HASH_SESSION_KEY, ''), user.get_session_auth_hash()):
+        return None
+    return user
+
+
+def _membership(user, course_id):
+    """``'member'``, ``'outsider'`` or ``'missing'`` (no such course) for a user joining a room."""
+    instructor_id = Course.objects.filter(pk=course_id).values_list('instructor_id', flat=True).first()
+    if instructor_id is None:
+        return 'missing'
+    if user.is_staff or instructor_id == user.pk or Enrollment.objects.filter(user=user, course_id=course_id).exists():
+        return 'member'
+    return 'outsider'
+
+
+def _backfill(course_id, limit):
+    messages = ChatMessage.objects.filter(course_id=course_id).select_related('user').order_by('-timestamp', '-id')[:limit]
+    return [message_payload(message) for message in reversed(messages)]
+
+
+def _post(user, course_id, text):
+    ChatMessage.objects.create(course_id=course_id, user=user, message=text)
+
+
+def _header(scope, name):
+    for key, value in scope.get('headers', ()):
+        if key == name:
+            return value.decode('latin-1')
+    return ''
+
+
+def _origin_allowed(scope):
+    """
+    Cookie-authenticated sockets must come from our own host or a trusted
+    origin. Browsers always send ``Origin`` on WebSocket handshakes, so one
+    without it is not treated as same-origin.
+    """
+    origin = _header(scope, b'origin')
+    if not origin:
+        return False
+    if origin in getattr(settings, 'CSRF_TRUSTED_ORIGINS', ()):
+        return True
+    return urlsplit(origin).netloc == _header(scope, b'host')
+
+
+# ASGI application
+
+async def websocket_application(scope, receive, send):
+    match = ROOM_PATH.match(scope['path'])
+    event = await receive()
+    if event['type'] != 'websocket.connect':
+        return
+    if match is None:
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+        return
+    course_id = int(match['course_id'])
+    user = await sync_to_async(_authenticate)(scope)
+    if user is None:
+        await send({'type': 'websocket.close', 'code': CLOSE_FORBIDDEN})
+        return
+    membership = await sync_to_async(_membership)(user, course_id)
+    if membership != 'member':
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND if membership == 'missing' else CLOSE_FORBIDDEN})
+        return
+
+    config = get_config()
+    broker = get_broker()
+    # Subscribe before reading the backfill so nothing published in between is lost.
+    subscription = broker.subscribe(room_name(course_id))
+    try:
+        await send({'type': 'websocket.accept'})
+        history = await sync_to_async(_backfill)(course_id, config['BACKFILL'])
+        await send({'type': 'websocket.send', 'text': json.dumps({'type': 'history', 'messages': history})})
+        last_seen = history[-1]['id'] if history else 0
+        writer = asyncio.create_task(_write(send, subscription, last_seen, config))
+        try:
+            await _read(receive, send, user, course_id, config)
+        finally:
+            writer.cancel()
+            await asyncio.gather(writer, return_exceptions=True)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def _read(receive, send, user, course_id, config):
+    while True:
+        event = await receive()
+        if event['type'] == 'websocket.disconnect':
+            return
+        if event['type'] != 'websocket.receive':
+            continue
+        try:
+            text = json.loads(event.get('text') or event.get('bytes') or b'')['message']
+        except (ValueError, TypeError, KeyError):
+            text = None
+        if not isinstance(text, str) or not text.strip() or len(text) > config['MAX_MESSAGE_LENGTH']:
+            await send({'type': 'websocket.send', 'text': json.dumps({'type': 'error', 'error': 'invalid message'})})
+            continue
+        await sync_to_async(_post)(user, course_id, text)
+
+
+async def _write(send, subscription, last_seen, config):
+    queue = subscription.queue
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await queue.get()]
+        deadline = loop.time() + config['BATCH_INTERVAL']
+        while len(batch) < config['BATCH_SIZE']:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        if subscription.lagging:
+            await send({'type': 'websocket.close', 'code': CLOSE_LAGGING})
+            return
+        # Messages already part of the backfill may also arrive through the broker.
+        messages = [payload for payload in batch if payload['id'] > last_seen]
+        if messages:
+            await send({'type': 'websocket.send', 'text': json.dumps({'type': 'messages', 'messages': messages})})
@@ -0,0 +1,46 @@
+"""
+Per-user cache of the landing page payloads (``home_overview`` and
+``UserStatsView``).
+
+Entries are dropped by signals when the user's enrollments, lesson progress or
+submissions change, after the surrounding transaction commits so a concurrent
+request cannot cache the pre-commit state; other processes only see the drop
+because the cache is shared (see ``CACHES`` in settings). Recommendation and
+trending tables are global and only picked up when an entry expires (``TTL``).
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+DEFAULTS = {
+    'CACHE': 'default',
+    'TTL': 15 * 60,
+}
+PARTS = ('stats', 'overview')
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'DASHBOARD_CACHE', {}))
+    return config
+
+
+def _key(user_id, part):
+    return f'dashboard:{user_id}:{part}'
+
+
+def cached(user_id, part, build):
+    """Return the cached ``part`` payload of the user, building and storing it on a miss."""
+    config = get_config()
+    cache = caches[config['CACHE']]
+    key = _key(user_id, part)
+    payload = cache.get(key)
+    if payload is None:
+        payload = build()
+        cache.set(key, payload, config['TTL'])
+    return payload
+
+
+def invalidate(user_id):
+    keys = [_key(user_id, part) for part in PARTS]
+    transaction.on_commit(lambda: caches[get_config()['CACHE']].delete_many(keys))
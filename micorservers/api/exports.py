@@ -0,0 +1,92 @@
+"""
+Per-course instructor exports streamed as CSV or NDJSON.
+
+Each export is a ``values_list`` queryset read with ``.iterator()`` in
+``CHUNK_SIZE`` rows, so neither models nor serializers are instantiated and
+memory stays flat however large the course is. Rows are encoded one at a time
+as the response is consumed.
+"""
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Submission, TestSubmission, UserProgress
+
+CHUNK_SIZE = 2000
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+EXPORTS = {
+    'submissions': (
+        Submission, 'challenge__lesson__course_id',
+        {
+            'id': 'id',
+            'user': 'user_id',
+            'username': 'user__username',
+            'lesson': 'challenge__lesson_id',
+            'challenge': 'challenge_id',
+            'challenge_title': 'challenge__title',
+            'language': 'language',
+            'is_correct': 'is_correct',
+            'submitted_at': 'submitted_at',
+        },
+    ),
+    'test-results': (
+        TestSubmission, 'test__course_id',
+        {
+            'id': 'id',
+            'user': 'user_id',
+            'username': 'user__username',
+            'test': 'test_id',
+            'test_title': 'test__title',
+            'score': 'score',
+            'is_graded': 'is_graded',
+            'submitted_at': 'submitted_at',
+        },
+    ),
+    'progress': (
+        UserProgress, 'lesson__course_id',
+        {
+            'id': 'id',
+            'user': 'user_id',
+            'username': 'user__username',
+            'lesson': 'lesson_id',
+            'lesson_title': 'lesson__title',
+            'completed': 'completed',
+            'last_accessed': 'last_accessed',
+        },
+    ),
+}
+
+
+class _Echo:
+    """File-like object whose ``write`` hands back the line ``csv.writer`` produced."""
+
+    def write(self, value):
+        return value
+
+
+def rows(kind, course_id):
+    model, course_field, columns = EXPORTS[kind]
+    queryset = model.objects.filter(**{course_field: course_id}).order_by('pk').values_list(*columns.values())
+    return list(columns), queryset.iterator(chunk_size=CHUNK_SIZE)
+
+
+def _csv(header, values):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in values:
+        yield writer.writerow(row)
+
+
+def _ndjson(header, values):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in values:
+        yield encoder.encode(dict(zip(header, row))) + '\n'
+
+
+def stream(kind, course_id, fmt):
+    """Iterator of encoded lines for ``kind`` in ``fmt`` (a key of ``FORMATS``)."""
+    header, values = rows(kind, course_id)
+    return _csv(header, values) if fmt == 'csv' else _ndjson(header, values)
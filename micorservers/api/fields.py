@@ -0,0 +1,48 @@
+import base64
+import zlib
+
+from django.db import models
+
+# Marks a zlib-compressed, base64-encoded value; a control character cannot start real lesson text.
+COMPRESSED_PREFIX = '\x1fz:'
+
+
+def compress_text(value, above):
+    """Stored form of ``value``: compressed when longer than ``above`` characters and smaller that way."""
+    if value is None or (len(value) <= above and not value.startswith(COMPRESSED_PREFIX)):
+        return value
+    packed = COMPRESSED_PREFIX + base64.b64encode(zlib.compress(value.encode(), 6)).decode('ascii')
+    return packed if len(packed) < len(value) or value.startswith(COMPRESSED_PREFIX) else value
+
+
+def decompress_text(value):
+    if isinstance(value, str) and value.startswith(COMPRESSED_PREFIX):
+        return zlib.decompress(base64.b64decode(value[len(COMPRESSED_PREFIX):])).decode()
+    return value
+
+
+class CompressedTextField(models.TextField):
+    """
+    ``TextField`` whose values above ``compress_above`` characters are stored
+    zlib-compressed; reads always return the original text. Pattern lookups
+    (``contains``, ``icontains``...) only match uncompressed rows.
+    """
+
+    def __init__(self, *args, compress_above=2048, **kwargs):
+        self.compress_above = compress_above
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.compress_above != 2048:
+            kwargs['compress_above'] = self.compress_above
+        return name, path, args, kwargs
+
+    def from_db_value(self, value, expression, connection):
+        return decompress_text(value)
+
+    def to_python(self, value):
+        return decompress_text(super().to_python(value))
+
+    def get_prep_value(self, value):
+        return compress_text(super().get_prep_value(value), self.compress_above)
@@ -0,0 +1,186 @@
+import json
+import socket
+import threading
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import GradingJob, Submission, Test
+from . import verdict_cache
+from .sandbox import SandboxError, get_config as get_sandbox_config, run_test_cases
+
+# Only verdicts the code alone determines are cached: timeouts, memory kills
+# and errors can depend on machine load or on the sandbox itself.
+CACHEABLE_VERDICTS = {'passed', 'wrong_answer'}
+
+
+def get_test_cases(challenge):
+    if challenge.test_cases:
+        return challenge.test_cases
+    return [{'input': '', 'output': challenge.expected_output}]
+
+
+def _submission_key(challenge, code, language, stop_on_failure):
+    if stop_on_failure is None:
+        stop_on_failure = get_sandbox_config()['STOP_ON_FAILURE']
+    return verdict_cache.submission_key(challenge, code, language, stop_on_failure), stop_on_failure
+
+
+def _case_feedback(case):
+    entry = {'case': case['case'], 'verdict': case['verdict'], 'time': case['time']}
+    stderr = (case.get('stderr') or '').strip()
+    if stderr:
+        entry['message'] = stderr.splitlines()[-1]
+    return entry
+
+
+def grade_submission(submission, stop_on_failure=None):
+    """
+    Run a submission against all of its challenge's test cases in one sandbox
+    session and store the verdict. ``feedback`` receives a JSON document with
+    a summary line plus the verdict and timing of every case that ran.
+
+    Raises ``SandboxError`` when the sandbox could not run the code, so the
+    submission is left pending and its job is retried instead of being
+    stored as failing every case.
+    """
+    challenge = submission.challenge
+    key, stop_on_failure = _submission_key(challenge, submission.code, submission.language, stop_on_failure)
+    verdict = verdict_cache.lookup(key)
+    if verdict is None:
+        cases = get_test_cases(challenge)
+        result = run_test_cases(submission.code, cases, language=submission.language, stop_on_failure=stop_on_failure)
+        if result['status'] == 'unavailable':
+            raise SandboxError(result['stderr'] or 'Sandbox unavailable')
+        case_results = [_case_feedback(case) for case in result['cases']]
+        passed = sum(1 for case in case_results if case['verdict'] == 'passed')
+        verdict = {
+            'is_correct': passed == len(cases),
+            'feedback': json.dumps({
+                'summary': f'Passed {passed}/{len(cases)} test cases',
+                'passed': passed,
+                'total': len(cases),
+                'time': result['time'],
+                'cases': case_results,
+            }),
+        }
+        if result['status'] == 'ok' and all(case['verdict'] in CACHEABLE_VERDICTS for case in case_results):
+            verdict_cache.store(key, verdict)
+    submission.is_correct = verdict['is_correct']
+    submission.feedback = verdict['feedback']
+    submission.save(update_fields=['is_correct', 'feedback'])
+    return submission
+
+
+# Grading queue
+
+def enqueue_submission(**fields):
+    """
+    Create a submission together with the job that will grade it. When an
+    identical submission was already graded the cached verdict is applied
+    straight away and no job is created (``job`` is ``None``).
+    """
+    key, _ = _submission_key(fields['challenge'], fields['code'], fields.get('language'), None)
+    verdict = verdict_cache.lookup(key)
+    if verdict is not None:
+        return Submission.objects.create(**verdict, **fields), None
+    with transaction.atomic():
+        submission = Submission.objects.create(is_correct=False, feedback='Pending evaluation', **fields)
+        job = GradingJob.objects.create(submission=submission)
+    return submission, job
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{threading.get_ident()}'
+
+
+def claim_next_job(worker, batch=10):
+    """
+    Atomically move the oldest queued job to ``running`` and return it.
+
+    The conditional UPDATE is what makes a claim exclusive, so several
+    workers (or processes) can poll the same table without a broker.
+    """
+    candidates = GradingJob.objects.filter(status=GradingJob.QUEUED).order_by('id').values_list('id', flat=True)[:batch]
+    for job_id in candidates:
+        claimed = GradingJob.objects.filter(pk=job_id, status=GradingJob.QUEUED).update(
+            status=GradingJob.RUNNING,
+            worker=worker,
+            started_at=timezone.now(),
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return GradingJob.objects.select_related('submission__challenge').get(pk=job_id)
+    return None
+
+
+def process_job(job, max_attempts=3):
+    try:
+        grade_submission(job.submission)
+    except Exception as exc:
+        job.status = GradingJob.FAILED if job.attempts >= max_attempts else GradingJob.QUEUED
+        job.error = f'{type(exc).__name__}: {exc}'
+    else:
+        job.status = GradingJob.DONE
+        job.error = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
+    return job
+
+
+def requeue_stale_jobs(older_than, max_attempts=3):
+    """
+    Put back jobs left ``running`` by a worker that died mid-grade; jobs that
+    already used ``max_attempts`` are failed instead, so a submission that
+    kills or hangs its worker is not claimed forever. Returns ``(requeued, failed)``.
+    """
+    now = timezone.now()
+    stale = GradingJob.objects.filter(status=GradingJob.RUNNING, started_at__lt=now - timedelta(seconds=older_than))
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status=GradingJob.FAILED, error=f'Worker stopped responding after {max_attempts} attempts', finished_at=now,
+    )
+    return stale.update(status=GradingJob.QUEUED), failed
+
+
+# MCQ tests
+
+ANSWER_KEY_TIMEOUT = 24 * 3600
+
+
+def answer_key_cache_key(test_id):
+    return f'test-answer-key:{test_id}'
+
+
+def get_answer_key(test_id):
+    """
+    Return ``{mcq_id: answer}`` for a test, or ``None`` if the test does not
+    exist. Keys are cached and dropped by the signals in ``api.signals``
+    whenever the test's questions or their answers change; the settings
+    refuse a per-process cache outside DEBUG, so the drop reaches every
+    web process and the grade_worker.
+    """
+    key = cache.get(answer_key_cache_key(test_id))
+    if key is None:
+        if not Test.objects.filter(pk=test_id).exists():
+            return None
+        key = {
+            str(mcq_id): answer
+            for mcq_id, answer in Test.mcqs.through.objects.filter(test_id=test_id).values_list('mcq_id', 'mcq__answer')
+        }
+        cache.set(answer_key_cache_key(test_id), key, ANSWER_KEY_TIMEOUT)
+    return key
+
+
+def invalidate_answer_keys(test_ids):
+    cache.delete_many([answer_key_cache_key(test_id) for test_id in test_ids])
+
+
+def score_answers(answer_key, answers):
+    """Score answers against a key in one pass; returns ``(percent, {mcq_id: correct})``."""
+    answers = answers if isinstance(answers, dict) else {}
+    results = {mcq_id: bool(answers.get(mcq_id)) and answers.get(mcq_id) == answer for mcq_id, answer in answer_key.items()}
+    correct = sum(results.values())
+    return (correct / len(results)) * 100 if results else 0, results
@@ -0,0 +1,204 @@
+"""
+PDF ingestion pipeline behind ``PDFUploadView``.
+
+Uploads are streamed to a temporary file by ``LimitedUploadHandler`` and moved
+into ``SPOOL_DIR``; the web process never holds the document in memory, and an
+upload is cut off as soon as it exceeds ``MAX_UPLOAD_MB``. The
+``ingest_pdfs`` worker claims jobs from ``PDFIngestJob`` the same way
+``grade_worker`` claims grading jobs, extracts text a few pages at a time in a
+process pool and stores it in ``CHUNK_CHARS`` pieces as lessons of a course or
+notes on a lesson while updating ``pages_done`` for clients polling the job.
+"""
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import timedelta
+from itertools import repeat
+
+from django.conf import settings
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+from django.db.models import F, Max
+from django.utils import timezone
+
+from .models import Lesson, Note, PDFIngestJob
+
+DEFAULTS = {
+    'SPOOL_DIR': os.path.join(tempfile.gettempdir(), 'codementor-pdf-spool'),
+    'MAX_UPLOAD_MB': 100,
+    'PROCESSES': 2,
+    'PAGES_PER_TASK': 8,
+    'CHUNK_CHARS': 20000,
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'PDF_INGEST', {}))
+    return config
+
+
+def max_upload_bytes():
+    return get_config()['MAX_UPLOAD_MB'] * 1024 * 1024
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """Spool files to disk and stop reading the request once they exceed ``limit`` bytes."""
+
+    def __init__(self, request, limit):
+        super().__init__(request)
+        self.limit = limit
+        self.received = 0
+        self.exceeded = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.limit:
+            self.exceeded = True
+            raise StopUpload(connection_reset=True)
+        return super().receive_data_chunk(raw_data, start)
+
+
+def spool_upload(upload):
+    """Move (or stream) an uploaded file into the spool directory and return its path."""
+    spool_dir = get_config()['SPOOL_DIR']
+    os.makedirs(spool_dir, exist_ok=True)
+    path = os.path.join(spool_dir, f'{uuid.uuid4().hex}.pdf')
+    if hasattr(upload, 'temporary_file_path'):
+        shutil.move(upload.temporary_file_path(), path)
+    else:
+        with open(path, 'wb') as fh:
+            for chunk in upload.chunks():
+                fh.write(chunk)
+    return path
+
+
+# Extraction (runs in pool processes; no Django access)
+
+def _reader(path):
+    from pypdf import PdfReader
+    return PdfReader(path)
+
+
+def page_count(path):
+    return len(_reader(path).pages)
+
+
+def extract_pages(path, start, stop):
+    """Text of pages ``start``..``stop - 1``; pypdf parses only the pages it is asked for."""
+    pages = _reader(path).pages
+    return [(pages[number].extract_text() or '').strip() for number in range(start, stop)]
+
+
+def chunk_pages(pages, chunk_chars):
+    """Group ``(page_number, text)`` pairs into ``(first_page, last_page, text)`` pieces of about ``chunk_chars``."""
+    first, parts, size = None, [], 0
+    for number, text in pages:
+        if first is None:
+            first = number
+        if text:
+            parts.append(text)
+            size += len(text)
+        if size >= chunk_chars:
+            yield first, number, '\n\n'.join(parts)
+            first, parts, size = None, [], 0
+    if parts:
+        yield first, number, '\n\n'.join(parts)
+
+
+# Job queue
+
+def claim_next_job(worker, batch=10):
+    """Atomically move the oldest queued job to ``running`` (see ``grading.claim_next_job``)."""
+    candidates = PDFIngestJob.objects.filter(status=PDFIngestJob.QUEUED).order_by('id').values_list('id', flat=True)[:batch]
+    for job_id in candidates:
+        claimed = PDFIngestJob.objects.filter(pk=job_id, status=PDFIngestJob.QUEUED).update(
+            status=PDFIngestJob.RUNNING,
+            worker=worker,
+            started_at=timezone.now(),
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return PDFIngestJob.objects.get(pk=job_id)
+    return None
+
+
+def _store(job, title, first, last, text, order):
+    if job.course_id:
+        lesson = Lesson.objects.create(
+            course_id=job.course_id, title=f'{title} (pages {first + 1}-{last + 1})', content=text, order=order,
+        )
+        return {'lesson': lesson.pk}
+    note = Note.objects.create(user_id=job.user_id, lesson_id=job.lesson_id, content=text)
+    return {'note': note.pk}
+
+
+def _discard_partial(job):
+    """Remove what an earlier, interrupted attempt created so a retry does not duplicate it."""
+    Lesson.objects.filter(pk__in=[item['lesson'] for item in job.created if 'lesson' in item]).delete()
+    Note.objects.filter(pk__in=[item['note'] for item in job.created if 'note' in item]).delete()
+    job.created = []
+
+
+def ingest(job, pool):
+    config = get_config()
+    _discard_partial(job)
+    total = page_count(job.path)
+    PDFIngestJob.objects.filter(pk=job.pk).update(pages_total=total, pages_done=0, created=[])
+    starts = range(0, total, config['PAGES_PER_TASK'])
+    stops = [min(start + config['PAGES_PER_TASK'], total) for start in starts]
+    title = os.path.splitext(job.filename)[0] or 'Imported PDF'
+    order = (Lesson.objects.filter(course_id=job.course_id).aggregate(last=Max('order'))['last'] or 0) if job.course_id else 0
+
+    def pages():
+        # map() yields in page order while the pool works ahead.
+        for start, texts in zip(starts, pool.map(extract_pages, repeat(job.path), starts, stops)):
+            yield from zip(range(start, start + len(texts)), texts)
+            PDFIngestJob.objects.filter(pk=job.pk).update(pages_done=start + len(texts))
+
+    for first, last, text in chunk_pages(pages(), config['CHUNK_CHARS']):
+        order += 1
+        job.created.append(_store(job, title, first, last, text, order))
+        PDFIngestJob.objects.filter(pk=job.pk).update(created=job.created)
+    return job.created
+
+
+def process_job(job, pool, max_attempts=3):
+    try:
+        ingest(job, pool)
+    except Exception as exc:
+        job.status = PDFIngestJob.FAILED if job.attempts >= max_attempts else PDFIngestJob.QUEUED
+        job.error = f'{type(exc).__name__}: {exc}'
+    else:
+        job.status = PDFIngestJob.DONE
+        job.error = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'created', 'finished_at'])
+    if job.status != PDFIngestJob.QUEUED:
+        try:
+            os.remove(job.path)
+        except FileNotFoundError:
+            pass
+    return job
+
+
+def requeue_stale_jobs(older_than, max_attempts=3):
+    """
+    Put back jobs left ``running`` by a worker that died mid-ingest; jobs that
+    already used ``max_attempts`` are failed and their spooled upload removed,
+    so a PDF that kills or hangs the worker is not claimed forever. Returns
+    ``(requeued, failed)``.
+    """
+    now = timezone.now()
+    stale = PDFIngestJob.objects.filter(status=PDFIngestJob.RUNNING, started_at__lt=now - timedelta(seconds=older_than))
+    exhausted = stale.filter(attempts__gte=max_attempts)
+    paths = list(exhausted.values_list('path', flat=True))
+    failed = exhausted.update(
+        status=PDFIngestJob.FAILED, error=f'Worker stopped responding after {max_attempts} attempts', finished_at=now,
+    )
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    return stale.update(status=PDFIngestJob.QUEUED), failed
@@ -0,0 +1,208 @@
+import json
+import platform
+import re
+import statistics
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from api import exports, urls as api_urls
+from api.metrics import QueryCounter
+from api.models import Course, Lesson, Challenge, PDFIngestJob, Submission, Test
+
+# Models used to fill URL parameters that do not come from the view's queryset.
+PARAMETER_MODELS = {
+    'course_id': Course,
+    'lesson_id': Lesson,
+    'challenge_id': Challenge,
+    'test_id': Test,
+}
+# Models whose pk fills ``pk`` in routes served by views without a queryset.
+ROUTE_MODELS = {
+    'course-outline': Course,
+    'course-export': Course,
+    'lesson-content': Lesson,
+    'submission-similar': Submission,
+    'pdf-job-status': PDFIngestJob,
+}
+# Fixed values for URL parameters that are not primary keys.
+PARAMETER_VALUES = {
+    'kind': next(iter(exports.EXPORTS)),
+    'fmt': next(iter(exports.FORMATS)),
+}
+# Long-polling or side-effecting GET endpoints that make no sense under load.
+SKIPPED_ROUTES = {'submission-status'}
+
+
+def body(response):
+    """The full response body; streamed bodies are consumed so their cost is measured too."""
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every GET endpoint in api/urls.py with a concurrent in-process client and report '
+        'throughput, latency percentiles, query counts and peak memory as JSON. Point it at a '
+        'dedicated database (e.g. --settings with a separate NAME) since --seed-users writes data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed-users', type=int, default=0,
+                            help='Seed a load dataset of this many users first (seed_demo --mode load)')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients per endpoint')
+        parser.add_argument('--only', help='Regex; benchmark only routes whose name matches')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+        parser.add_argument('--compare', help='Previous JSON report to compare against')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Relative p95/query-count increase reported as a regression')
+
+    def handle(self, *args, **options):
+        if options['seed_users']:
+            call_command('seed_demo', mode='load', users=options['seed_users'], stdout=self.stderr)
+        self.user, _ = User.objects.get_or_create(username='bench', defaults={'is_staff': True, 'is_superuser': True})
+        endpoints = self.collect_endpoints(options['only'])
+        if not endpoints:
+            raise CommandError('No endpoints to benchmark; seed some data first.')
+
+        report = {
+            'meta': {
+                'generated_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+            },
+            'endpoints': {},
+        }
+        # ALLOWED_HOSTS is empty in development settings; the test client sends "testserver".
+        with override_settings(ALLOWED_HOSTS=['*']):
+            for name, url in endpoints:
+                self.stderr.write(f'{name}: {url}')
+                report['endpoints'][name] = self.run_endpoint(url, options['requests'], options['concurrency'])
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output + '\n')
+        else:
+            self.stdout.write(output)
+        if options['compare']:
+            with open(options['compare']) as fh:
+                self.compare(json.load(fh), report, options['threshold'])
+
+    def collect_endpoints(self, only):
+        endpoints = []
+        for pattern in api_urls.urlpatterns:
+            name = pattern.name
+            view = getattr(pattern.callback, 'view_class', None) or getattr(pattern.callback, 'cls', None)
+            if name in SKIPPED_ROUTES or view is None or not hasattr(view, 'get'):
+                continue
+            if only and not re.search(only, name):
+                continue
+            url = '/api/' + str(pattern.pattern)
+            for converter, param in re.findall(r'<(?:(\w+):)?(\w+)>', url):
+                value = PARAMETER_VALUES.get(param)
+                if value is None:
+                    model = PARAMETER_MODELS.get(param) or (ROUTE_MODELS.get(name) if param == 'pk' else None)
+                    if model is None and getattr(view, 'queryset', None) is not None:
+                        model = view.queryset.model
+                    value = model.objects.order_by('pk').values_list('pk', flat=True).first() if model else None
+                if value is None:
+                    url = None
+                    break
+                url = re.sub(rf'<(?:\w+:)?{param}>', str(value), url)
+            if url:
+                endpoints.append((name, url))
+        return endpoints
+
+    def client(self):
+        client = Client()
+        client.force_login(self.user)
+        return client
+
+    def run_endpoint(self, url, total, concurrency):
+        local = threading.local()
+        statuses = {}
+        lock = threading.Lock()
+
+        def request(_):
+            if not hasattr(local, 'client'):
+                local.client = self.client()
+                local.counter = QueryCounter()
+            queries_before = local.counter.queries
+            started = time.perf_counter()
+            with connection.execute_wrapper(local.counter):
+                response = local.client.get(url)
+                size = len(body(response))
+            elapsed = time.perf_counter() - started
+            with lock:
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            return elapsed, local.counter.queries - queries_before, size
+
+        body(self.client().get(url))  # warm up caches and lazy imports
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(request, range(total)))
+        wall = time.perf_counter() - started
+        latencies = [elapsed for elapsed, _, _ in results]
+
+        client = self.client()
+        tracemalloc.start()
+        body(client.get(url))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            'url': url,
+            'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+            'throughput_rps': round(total / wall, 2),
+            'latency_ms': {
+                'mean': round(statistics.mean(latencies) * 1000, 3),
+                'p50': round(percentile(latencies, 0.5) * 1000, 3),
+                'p95': round(percentile(latencies, 0.95) * 1000, 3),
+                'p99': round(percentile(latencies, 0.99) * 1000, 3),
+            },
+            'queries_per_request': round(statistics.mean(queries for _, queries, _ in results), 2),
+            'response_bytes': results[-1][2],
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def compare(self, baseline, report, threshold):
+        regressions = []
+        for name, current in report['endpoints'].items():
+            previous = baseline.get('endpoints', {}).get(name)
+            if previous is None:
+                continue
+            for label, before, after in (
+                ('p95 latency', previous['latency_ms']['p95'], current['latency_ms']['p95']),
+                ('queries/request', previous['queries_per_request'], current['queries_per_request']),
+                ('peak memory', previous['peak_memory_kb'], current['peak_memory_kb']),
+            ):
+                if before and after > before * (1 + threshold):
+                    regressions.append(f'{name}: {label} {before} -> {after}')
+        if regressions:
+            self.stderr.write(self.style.ERROR('Regressions:'))
+            for line in regressions:
+                self.stderr.write(f'  {line}')
+        else:
+            self.stderr.write(self.style.SUCCESS('No regressions above threshold.'))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the trending and co-enrollment similarity tables read by home_overview. '
+        'Run it periodically (e.g. hourly from cron); --every keeps it running in a loop.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window-days', type=int, help='Sliding window for trending activity')
+        parser.add_argument('--top-k', type=int, help='Similar courses kept per course')
+        parser.add_argument('--min-common', type=int, help='Minimum shared enrollments for two courses to be similar')
+        parser.add_argument('--skip-trending', action='store_true')
+        parser.add_argument('--skip-similar', action='store_true')
+        parser.add_argument('--every', type=float, help='Recompute every N seconds instead of once')
+
+    def handle(self, *args, **options):
+        while True:
+            self.compute(options)
+            if not options['every']:
+                break
+            time.sleep(options['every'])
+
+    def compute(self, options):
+        if not options['skip_trending']:
+            started = time.monotonic()
+            count = recommendations.compute_trending(window_days=options['window_days'])
+            self.stdout.write(f'Trending: {count} courses in {time.monotonic() - started:.2f}s')
+        if not options['skip_similar']:
+            started = time.monotonic()
+            count = recommendations.compute_similarities(top_k=options['top_k'], min_common=options['min_common'])
+            backend = 'scipy' if recommendations.sparse is not None else 'python'
+            self.stdout.write(f'Similarities: {count} pairs in {time.monotonic() - started:.2f}s ({backend})')
+        self.stdout.write(self.style.SUCCESS('Recommendations recomputed'))
@@ -0,0 +1,43 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import Course, Lesson, Enrollment, Submission, UserProgress, ChatMessage
+
+
+class Command(BaseCommand):
+    help = (
+        'Print query plans and timings for the hot lookup paths. Run it on a seeded database '
+        'before and after `migrate api 0006` to compare plans with and without the composite indexes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='User id to query for (defaults to the first user)')
+        parser.add_argument('--course', type=int, help='Course id to query for (defaults to the first course)')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per query used for the median timing')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(pk=options['user']).first() if options['user'] else User.objects.order_by('pk').first()
+        course = Course.objects.filter(pk=options['course']).first() if options['course'] else Course.objects.order_by('pk').first()
+        if user is None or course is None:
+            raise CommandError('Seed some data first (see seed_demo).')
+
+        queries = {
+            'enrollments completed by user': Enrollment.objects.filter(user=user, completed=True),
+            'lessons completed by user': UserProgress.objects.filter(user=user, completed=True),
+            'recent submissions of user': Submission.objects.filter(user=user).order_by('-submitted_at')[:50],
+            'chat history of course': ChatMessage.objects.filter(course=course).order_by('-timestamp')[:50],
+            'lessons of course in order': Lesson.objects.filter(course=course).order_by('order')[:50],
+            'enrollment lookup (get_or_create)': Enrollment.objects.filter(user=user, course=course),
+        }
+        for label, queryset in queries.items():
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append(time.perf_counter() - started)
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{label}: median {statistics.median(timings) * 1000:.3f} ms'))
+            self.stdout.write(queryset.explain())
+            self.stdout.write('')
@@ -0,0 +1,58 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api.grading import claim_next_job, process_job, requeue_stale_jobs, worker_name
+from api.sandbox import get_config, get_pool
+
+
+class Command(BaseCommand):
+    help = 'Drain the submission grading queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=None, help='Number of jobs graded in parallel (defaults to SANDBOX workers)')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--max-attempts', type=int, default=3, help='Attempts before a job is marked failed')
+        parser.add_argument('--stale-after', type=int, default=300, help='Requeue running jobs older than this many seconds')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        requeued, failed = requeue_stale_jobs(options['stale_after'], max_attempts=options['max_attempts'])
+        if requeued or failed:
+            self.stdout.write(f'Requeued {requeued} stale job(s), failed {failed} out of attempts')
+        concurrency = options['concurrency'] or get_config()['WORKERS']
+        get_pool()
+        self.stop = threading.Event()
+        threads = [
+            threading.Thread(target=self.work, args=(options,), daemon=True)
+            for _ in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(self.style.SUCCESS(f'Grading worker started with concurrency {concurrency}'))
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+
+    def work(self, options):
+        name = worker_name()
+        try:
+            while not self.stop.is_set():
+                job = claim_next_job(name)
+                if job is None:
+                    if options['once']:
+                        return
+                    self.stop.wait(options['poll_interval'])
+                    continue
+                started = time.monotonic()
+                job = process_job(job, max_attempts=options['max_attempts'])
+                self.stdout.write(f'Job {job.pk} (submission {job.submission_id}) {job.status} in {time.monotonic() - started:.2f}s')
+        finally:
+            connection.close()
@@ -0,0 +1,39 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from api.grading import worker_name
+from api.ingest import claim_next_job, get_config, process_job, requeue_stale_jobs
+
+
+class Command(BaseCommand):
+    help = 'Drain the PDF ingestion queue, extracting pages in a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=None, help='Extraction processes (defaults to PDF_INGEST PROCESSES)')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--max-attempts', type=int, default=3, help='Attempts before a job is marked failed')
+        parser.add_argument('--stale-after', type=int, default=1800, help='Requeue running jobs older than this many seconds')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        requeued, failed = requeue_stale_jobs(options['stale_after'], max_attempts=options['max_attempts'])
+        if requeued or failed:
+            self.stdout.write(f'Requeued {requeued} stale job(s), failed {failed} out of attempts')
+        processes = options['processes'] or get_config()['PROCESSES']
+        name = worker_name()
+        self.stdout.write(self.style.SUCCESS(f'PDF ingestion worker started with {processes} processes'))
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            while True:
+                job = claim_next_job(name)
+                if job is None:
+                    if options['once']:
+                        return
+                    time.sleep(options['poll_interval'])
+                    continue
+                started = time.monotonic()
+                job = process_job(job, pool, max_attempts=options['max_attempts'])
+                self.stdout.write(
+                    f'Job {job.pk} ({job.filename}) {job.status}: {len(job.created)} item(s) in {time.monotonic() - started:.2f}s'
+                )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.ratings import rebuild_rating_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized rating count, mean and histogram of every course'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = rebuild_rating_stats(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rating stats for {count} courses'))
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.plagiarism import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the MinHash signatures and LSH buckets of every submission (or of one challenge)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--challenge', type=int, help='Only reindex submissions to this challenge')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        count = rebuild(batch_size=options['batch_size'], challenge_id=options['challenge'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} submissions in {time.monotonic() - started:.1f}s'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text course search index (e.g. after bulk imports that bypass signals)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError('The configured database has no full-text search index.')
+        count = search.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} courses'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.progress import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Recount lessons per course and recompute every enrollment\'s progress from UserProgress'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        count = reconcile(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Fixed progress of {count} enrollments'))
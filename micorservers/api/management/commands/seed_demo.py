@@ -1,11 +1,60 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import islice
+
 from django.core.management.base import BaseCommand
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
-from api.models import Course, Lesson, Enrollment, Challenge, MCQ, LearningPath, UserProgress
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from api import catalog, search
+from api.progress import reconcile
+from api.ratings import rebuild_rating_stats
+from api.models import Course, Lesson, Enrollment, Challenge, Submission, MCQ, LearningPath, UserProgress, CourseReview, ChatMessage
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let bulk_create store the given auto_now/auto_now_add values instead of overwriting them."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
 
 class Command(BaseCommand):
     help = 'Seed the database with demo data for development'
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=['demo', 'load'], default='demo',
+                            help='"demo" creates a handful of rows, "load" generates a sized dataset for benchmarking')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed, so load datasets are reproducible')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--courses', type=int, default=50)
+        parser.add_argument('--lessons-per-course', type=int, default=20)
+        parser.add_argument('--challenges-per-lesson', type=int, default=1)
+        parser.add_argument('--mcqs-per-lesson', type=int, default=3)
+        parser.add_argument('--enrollments-per-user', type=int, default=3)
+        parser.add_argument('--progress-per-user', type=int, default=20)
+        parser.add_argument('--submissions-per-user', type=int, default=50)
+        parser.add_argument('--chat-messages-per-course', type=int, default=500)
+        parser.add_argument('--reviews-per-course', type=int, default=20)
+        parser.add_argument('--days', type=int, default=365, help='Spread generated timestamps over this many past days')
+
+    def handle(self, *args, **options):
+        if options['mode'] == 'load':
+            return self.seed_load(options)
+        self.seed_demo()
+
+    def seed_demo(self):
         # Create users
         user1, _ = User.objects.get_or_create(username='nayan', defaults={'email': 'admin@example.com'})
         user1.set_password('admin')
@@ -45,3 +94,121 @@ class Command(BaseCommand):
         UserProgress.objects.create(user=user1, lesson=lesson2, completed=False)
 
         self.stdout.write(self.style.SUCCESS('Demo data seeded successfully!'))
+
+    # Load dataset
+
+    def bulk_insert(self, model, rows, batch_size, ids=False):
+        """Insert rows from a generator in batches; with ``ids`` returns the primary keys of the new rows."""
+        start = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        rows = iter(rows)
+        total = 0
+        started = time.monotonic()
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                model.objects.bulk_create(batch, batch_size=batch_size)
+            total += len(batch)
+        self.stdout.write(f'{model.__name__}: {total} rows in {time.monotonic() - started:.1f}s')
+        if not ids:
+            return None
+        return list(model.objects.filter(pk__gt=start).order_by('pk').values_list('pk', flat=True))
+
+    def seed_load(self, options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        now = timezone.now()
+        span = options['days'] * 24 * 3600
+
+        def timestamp():
+            return now - timedelta(seconds=rng.randrange(span))
+
+        offset = User.objects.aggregate(last=Max('pk'))['last'] or 0
+        password = make_password('loadtest')
+        user_ids = self.bulk_insert(User, (
+            User(username=f'load{offset + i}', email=f'load{offset + i}@example.com', password=password)
+            for i in range(options['users'])
+        ), batch_size, ids=True)
+
+        course_ids = self.bulk_insert(Course, (
+            Course(title=f'Course {i}', description=f'Generated course {i}', instructor_id=rng.choice(user_ids),
+                   language=rng.choice(['English', 'Hindi', 'Spanish']))
+            for i in range(options['courses'])
+        ), batch_size, ids=True)
+
+        lessons_per_course = options['lessons_per_course']
+        lesson_ids = self.bulk_insert(Lesson, (
+            Lesson(course_id=course_id, title=f'Lesson {order}', content=f'Content of lesson {order}. ' * 20, order=order)
+            for course_id in course_ids for order in range(1, lessons_per_course + 1)
+        ), batch_size, ids=True)
+        # Lessons were generated course by course, so they can be grouped positionally.
+        course_lessons = {
+            course_id: lesson_ids[index * lessons_per_course:(index + 1) * lessons_per_course]
+            for index, course_id in enumerate(course_ids)
+        }
+
+        def challenge(lesson_id, order):
+            a, b = rng.randrange(100), rng.randrange(100)
+            return Challenge(lesson_id=lesson_id, title=f'Challenge {order}', description='Add two numbers',
+                             expected_output=str(a + b), test_cases=[{'input': f'{a} {b}', 'output': str(a + b)}], order=order)
+
+        challenge_ids = self.bulk_insert(Challenge, (
+            challenge(lesson_id, order)
+            for lesson_id in lesson_ids for order in range(1, options['challenges_per_lesson'] + 1)
+        ), batch_size, ids=True)
+
+        self.bulk_insert(MCQ, (
+            MCQ(lesson_id=lesson_id, question=f'Question {n}?', options=['A', 'B', 'C', 'D'], answer=rng.choice('ABCD'))
+            for lesson_id in lesson_ids for n in range(options['mcqs_per_lesson'])
+        ), batch_size)
+
+        enrollments = {
+            user_id: rng.sample(course_ids, min(options['enrollments_per_user'], len(course_ids)))
+            for user_id in user_ids
+        }
+        with explicit_timestamps(Enrollment._meta.get_field('enrolled_at')):
+            self.bulk_insert(Enrollment, (
+                Enrollment(user_id=user_id, course_id=course_id, enrolled_at=timestamp())
+                for user_id, courses in enrollments.items() for course_id in courses
+            ), batch_size)
+
+        def progress_rows():
+            for user_id, courses in enrollments.items():
+                lessons = [lesson_id for course_id in courses for lesson_id in course_lessons[course_id]]
+                for lesson_id in rng.sample(lessons, min(options['progress_per_user'], len(lessons))):
+                    yield UserProgress(user_id=user_id, lesson_id=lesson_id, completed=rng.random() < 0.6)
+
+        self.bulk_insert(UserProgress, progress_rows(), batch_size)
+
+        if challenge_ids:
+            with explicit_timestamps(Submission._meta.get_field('submitted_at')):
+                self.bulk_insert(Submission, (
+                    Submission(user_id=user_id, challenge_id=rng.choice(challenge_ids), code='print(sum(map(int, input().split())))',
+                               language='python', submitted_at=timestamp(), is_correct=rng.random() < 0.5)
+                    for user_id in user_ids for _ in range(options['submissions_per_user'])
+                ), batch_size)
+
+        with explicit_timestamps(ChatMessage._meta.get_field('timestamp')):
+            self.bulk_insert(ChatMessage, (
+                ChatMessage(course_id=course_id, user_id=rng.choice(user_ids), message=f'Message {n}', timestamp=timestamp())
+                for course_id in course_ids for n in range(options['chat_messages_per_course'])
+            ), batch_size)
+
+        self.bulk_insert(CourseReview, (
+            CourseReview(course_id=course_id, user_id=rng.choice(user_ids), rating=rng.randint(1, 5), comment='Generated review')
+            for course_id in course_ids for _ in range(options['reviews_per_course'])
+        ), batch_size)
+
+        # bulk_create skips the signals that keep Enrollment.progress current.
+        started = time.monotonic()
+        reconcile(batch_size=batch_size)
+        self.stdout.write(f'Enrollment progress reconciled in {time.monotonic() - started:.1f}s')
+        # ... and the ones behind course rating stats and the search index.
+        started = time.monotonic()
+        rebuild_rating_stats(batch_size=batch_size)
+        search.rebuild()
+        catalog.bump(course_ids)
+        self.stdout.write(f'Rating stats and search index rebuilt in {time.monotonic() - started:.1f}s')
+
+        self.stdout.write(self.style.SUCCESS('Load dataset seeded successfully!'))
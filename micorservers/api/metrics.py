@@ -0,0 +1,161 @@
+"""
+In-process request metrics exported in the Prometheus text format.
+
+Every request adds a handful of integer/float updates under a lock; the
+expensive work (quantiles, formatting) only happens when ``/api/metrics/`` is
+scraped. Each server process aggregates its own numbers.
+"""
+import bisect
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class RouteStats:
+    __slots__ = ('count', 'statuses', 'buckets', 'latency', 'queries', 'db_time', 'response_bytes')
+
+    def __init__(self):
+        self.count = 0
+        self.statuses = {}
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.latency = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.response_bytes = 0
+
+    def quantile(self, q):
+        """Estimate a latency quantile by interpolating inside the histogram bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, in_bucket in enumerate(self.buckets):
+            if in_bucket and seen + in_bucket >= rank:
+                lower = BUCKETS[index - 1] if index else 0.0
+                upper = BUCKETS[index] if index < len(BUCKETS) else BUCKETS[-1]
+                return lower + (upper - lower) * (rank - seen) / in_bucket
+            seen += in_bucket
+        return BUCKETS[-1]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def observe(self, method, route, status, duration, queries, db_time, size):
+        status_class = f'{status // 100}xx'
+        with self._lock:
+            stats = self._routes.get((method, route))
+            if stats is None:
+                stats = self._routes[(method, route)] = RouteStats()
+            stats.count += 1
+            stats.statuses[status_class] = stats.statuses.get(status_class, 0) + 1
+            stats.buckets[bisect.bisect_left(BUCKETS, duration)] += 1
+            stats.latency += duration
+            stats.queries += queries
+            stats.db_time += db_time
+            stats.response_bytes += size
+
+    def reset(self):
+        with self._lock:
+            self._routes = {}
+
+    def render(self):
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines = []
+
+            def header(name, kind, text):
+                lines.append(f'# HELP {name} {text}')
+                lines.append(f'# TYPE {name} {kind}')
+
+            header('api_requests_total', 'counter', 'Requests served, by route and status class.')
+            for (method, route), stats in routes:
+                for status_class, count in sorted(stats.statuses.items()):
+                    lines.append(f'api_requests_total{{{_labels(method, route)},status="{status_class}"}} {count}')
+
+            header('api_request_duration_seconds', 'histogram', 'Request latency.')
+            for (method, route), stats in routes:
+                labels = _labels(method, route)
+                cumulative = 0
+                for bound, in_bucket in zip(BUCKETS + ('+Inf',), stats.buckets):
+                    cumulative += in_bucket
+                    lines.append(f'api_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'api_request_duration_seconds_sum{{{labels}}} {stats.latency:.6f}')
+                lines.append(f'api_request_duration_seconds_count{{{labels}}} {stats.count}')
+
+            header('api_request_duration_quantile_seconds', 'gauge', 'Latency quantiles estimated from the histogram.')
+            for (method, route), stats in routes:
+                for q in QUANTILES:
+                    lines.append(
+                        f'api_request_duration_quantile_seconds{{{_labels(method, route)},quantile="{q}"}} {stats.quantile(q):.6f}'
+                    )
+
+            header('api_db_queries_total', 'counter', 'Database queries issued while serving requests.')
+            for (method, route), stats in routes:
+                lines.append(f'api_db_queries_total{{{_labels(method, route)}}} {stats.queries}')
+
+            header('api_db_duration_seconds_total', 'counter', 'Time spent in database queries.')
+            for (method, route), stats in routes:
+                lines.append(f'api_db_duration_seconds_total{{{_labels(method, route)}}} {stats.db_time:.6f}')
+
+            header('api_response_size_bytes_total', 'counter', 'Response body bytes sent.')
+            for (method, route), stats in routes:
+                lines.append(f'api_response_size_bytes_total{{{_labels(method, route)}}} {stats.response_bytes}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(method, route):
+    route = route.replace('\\', '\\\\').replace('"', '\\"')
+    return f'method="{method}",route="{route}"'
+
+
+registry = MetricsRegistry()
+
+
+class QueryCounter:
+    """``execute_wrapper`` hook counting queries and the time spent in them."""
+
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.queries += 1
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'METRICS_ENABLED', True)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        route = '/' + match.route if match and match.route else 'unmatched'
+        if response.streaming:
+            size = int(response.get('Content-Length') or 0)
+        else:
+            size = len(response.content)
+        registry.observe(request.method, route, response.status_code, duration, counter.queries, counter.duration, size)
+        return response
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:05
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_enrollments(apps, schema_editor):
+    # get_or_create used to race, so keep only the oldest row per (user, course).
+    Enrollment = apps.get_model("api", "Enrollment")
+    duplicates = (
+        Enrollment.objects.values("user", "course")
+        .annotate(keep=Min("id"), rows=Count("id"))
+        .filter(rows__gt=1)
+        .values_list("user", "course", "keep")
+    )
+    for user_id, course_id, keep in duplicates:
+        Enrollment.objects.filter(user_id=user_id, course_id=course_id).exclude(
+            id=keep
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_verdictcacheentry"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="chatmessage",
+            index=models.Index(
+                fields=["course", "timestamp"], name="chat_course_timestamp_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="enrollment",
+            index=models.Index(
+                fields=["user", "completed"], name="enrollment_user_completed_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lesson",
+            index=models.Index(
+                fields=["course", "order"], name="lesson_course_order_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="submission",
+            index=models.Index(
+                fields=["user", "-submitted_at"], name="submission_user_recent_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="userprogress",
+            index=models.Index(
+                fields=["user", "completed"], name="progress_user_completed_idx"
+            ),
+        ),
+        migrations.RunPython(remove_duplicate_enrollments, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="enrollment",
+            constraint=models.UniqueConstraint(
+                fields=("user", "course"), name="unique_enrollment_user_course"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0006_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="testsubmission",
+            name="results",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_rating_stats(apps, schema_editor):
+    Course = apps.get_model("api", "Course")
+    CourseReview = apps.get_model("api", "CourseReview")
+    CourseRatingStats = apps.get_model("api", "CourseRatingStats")
+    stars = {f"stars_{n}": Count("id", filter=Q(rating=n)) for n in range(1, 6)}
+    rows = (
+        CourseReview.objects.values("course_id")
+        .annotate(count=Count("id"), total=Sum("rating"), **stars)
+        .order_by()
+    )
+    aggregates = {row.pop("course_id"): row for row in rows}
+    CourseRatingStats.objects.bulk_create(
+        [
+            CourseRatingStats(course_id=course_id, **aggregates.get(course_id, {}))
+            for course_id in Course.objects.values_list("pk", flat=True)
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_testsubmission_results"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CourseRatingStats",
+            fields=[
+                (
+                    "course",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="rating_stats",
+                        serialize=False,
+                        to="api.course",
+                    ),
+                ),
+                ("count", models.PositiveIntegerField(default=0)),
+                ("total", models.PositiveIntegerField(default=0)),
+                ("stars_1", models.PositiveIntegerField(default=0)),
+                ("stars_2", models.PositiveIntegerField(default=0)),
+                ("stars_3", models.PositiveIntegerField(default=0)),
+                ("stars_4", models.PositiveIntegerField(default=0)),
+                ("stars_5", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_rating_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,94 @@
+from django.db import migrations
+
+# A snapshot of api/search.py as of this migration, so later changes to the
+# live module cannot alter what the migration does.
+TABLE = "api_course_search"
+
+
+def _lessons_text(cursor, course_ids):
+    texts = {course_id: [] for course_id in course_ids}
+    placeholders = ", ".join(["%s"] * len(course_ids))
+    cursor.execute(
+        f'SELECT course_id, title, content FROM api_lesson WHERE course_id IN ({placeholders}) ORDER BY course_id, "order"',
+        list(course_ids),
+    )
+    for course_id, title, content in cursor.fetchall():
+        texts[course_id].append(f"{title}\n{content}")
+    return {course_id: "\n\n".join(parts) for course_id, parts in texts.items()}
+
+
+def _index_courses(cursor, vendor, course_ids):
+    placeholders = ", ".join(["%s"] * len(course_ids))
+    cursor.execute(
+        f"SELECT c.id, c.title, c.description, c.language, u.username "
+        f"FROM api_course c JOIN auth_user u ON u.id = c.instructor_id WHERE c.id IN ({placeholders})",
+        course_ids,
+    )
+    courses = cursor.fetchall()
+    lessons = _lessons_text(cursor, [row[0] for row in courses])
+    for course_id, title, description, language, instructor in courses:
+        if vendor == "sqlite":
+            cursor.execute(
+                f"INSERT INTO {TABLE} (rowid, title, description, language, instructor, lessons) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                [course_id, title, description, language, instructor, lessons[course_id]],
+            )
+        else:
+            cursor.execute(
+                f"INSERT INTO {TABLE} (course_id, language, body, document) VALUES (%s, %s, %s, "
+                "setweight(to_tsvector('english', %s), 'A') || "
+                "setweight(to_tsvector('english', %s), 'B') || "
+                "setweight(to_tsvector('english', %s), 'C') || "
+                "setweight(to_tsvector('simple', %s), 'D'))",
+                [
+                    course_id,
+                    language,
+                    f"{description}\n\n{lessons[course_id]}",
+                    title,
+                    description,
+                    lessons[course_id],
+                    f"{language} {instructor}",
+                ],
+            )
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {TABLE} USING fts5("
+            "title, description, language, instructor, lessons, "
+            "tokenize = 'porter unicode61')"
+        )
+    elif vendor == "postgresql":
+        schema_editor.execute(
+            f"CREATE TABLE {TABLE} ("
+            "course_id bigint PRIMARY KEY REFERENCES api_course (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "language varchar(64) NOT NULL, "
+            "body text NOT NULL, "
+            "document tsvector NOT NULL)"
+        )
+        schema_editor.execute(f"CREATE INDEX {TABLE}_document_gin ON {TABLE} USING gin (document)")
+    else:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT id FROM api_course ORDER BY id")
+        course_ids = [row[0] for row in cursor.fetchall()]
+        for start in range(0, len(course_ids), 500):
+            _index_courses(cursor, vendor, course_ids[start : start + 500])
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ("sqlite", "postgresql"):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0008_courseratingstats"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
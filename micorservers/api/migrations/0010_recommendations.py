@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_course_search_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CourseSimilarity",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="CourseTrend",
+            fields=[
+                (
+                    "course",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="trend",
+                        serialize=False,
+                        to="api.course",
+                    ),
+                ),
+                ("enrollments", models.PositiveIntegerField(default=0)),
+                ("submissions", models.PositiveIntegerField(default=0)),
+                ("score", models.FloatField(db_index=True, default=0.0)),
+                ("computed_at", models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="userprogress",
+            index=models.Index(
+                fields=["user", "-last_accessed"], name="progress_user_recent_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="coursesimilarity",
+            name="course",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="similar_courses",
+                to="api.course",
+            ),
+        ),
+        migrations.AddField(
+            model_name="coursesimilarity",
+            name="similar",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="api.course",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="coursesimilarity",
+            index=models.Index(
+                fields=["course", "-score"], name="similarity_course_score_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="coursesimilarity",
+            constraint=models.UniqueConstraint(
+                fields=("course", "similar"), name="unique_course_similarity"
+            ),
+        ),
+    ]
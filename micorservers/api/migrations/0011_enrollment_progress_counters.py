@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:20
+
+from django.db import migrations, models
+from django.db.models import Case, Count, FloatField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Cast, Coalesce, Greatest, Least, Round
+from django.db.models.lookups import GreaterThanOrEqual, LessThanOrEqual
+
+
+def backfill_progress(apps, schema_editor):
+    Course = apps.get_model("api", "Course")
+    Enrollment = apps.get_model("api", "Enrollment")
+    UserProgress = apps.get_model("api", "UserProgress")
+    lessons = (
+        Course.objects.filter(pk=OuterRef("pk"))
+        .annotate(n=Count("lessons"))
+        .values("n")
+    )
+    Course.objects.update(lesson_count=Subquery(lessons[:1]))
+    done = (
+        UserProgress.objects.filter(
+            user_id=OuterRef("user_id"),
+            lesson__course_id=OuterRef("course_id"),
+            completed=True,
+        )
+        .order_by()
+        .values("user_id")
+        .annotate(n=Count("lesson_id", distinct=True))
+        .values("n")
+    )
+    completed = Coalesce(Subquery(done[:1]), Value(0))
+    total = Subquery(
+        Course.objects.filter(pk=OuterRef("course_id")).values("lesson_count")[:1]
+    )
+    Enrollment.objects.update(
+        completed_lessons=completed,
+        progress=Least(
+            Value(100.0),
+            Round(Cast(completed, FloatField()) * 100.0 / Greatest(total, Value(1)), 2),
+        ),
+        completed=Case(
+            When(LessThanOrEqual(total, Value(0)), then=Value(False)),
+            When(GreaterThanOrEqual(completed, total), then=Value(True)),
+            default=Value(False),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0010_recommendations"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="course",
+            name="lesson_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="enrollment",
+            name="completed_lessons",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_progress, migrations.RunPython.noop),
+    ]
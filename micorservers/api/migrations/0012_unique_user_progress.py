@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:24
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def merge_duplicate_progress(apps, schema_editor):
+    # Keep the newest row per (user, lesson), completed if any duplicate was.
+    UserProgress = apps.get_model("api", "UserProgress")
+    duplicates = (
+        UserProgress.objects.values("user", "lesson")
+        .annotate(keep=Max("id"), rows=Count("id"))
+        .filter(rows__gt=1)
+        .values_list("user", "lesson", "keep")
+    )
+    for user_id, lesson_id, keep in duplicates:
+        rows = UserProgress.objects.filter(user_id=user_id, lesson_id=lesson_id)
+        if rows.filter(completed=True).exists():
+            rows.filter(id=keep).update(completed=True)
+        rows.exclude(id=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0011_enrollment_progress_counters"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_progress, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="userprogress",
+            constraint=models.UniqueConstraint(
+                fields=("user", "lesson"), name="unique_progress_user_lesson"
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0012_unique_user_progress"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="chatmessage",
+            index=models.Index(fields=["course", "id"], name="chat_course_id_idx"),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0014_pdfingestjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SubmissionSignature",
+            fields=[
+                (
+                    "submission",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="signature",
+                        serialize=False,
+                        to="api.submission",
+                    ),
+                ),
+                ("signature", models.BinaryField()),
+                ("shingles", models.PositiveIntegerField(default=0)),
+                (
+                    "challenge",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="api.challenge",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="SubmissionBucket",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("bucket", models.BigIntegerField()),
+                (
+                    "challenge",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="api.challenge",
+                    ),
+                ),
+                (
+                    "submission",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="api.submission",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["challenge", "bucket"],
+                        name="bucket_challenge_bucket_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:36
+
+import api.fields
+from django.db import migrations, models
+from django.db.models.functions import Length
+
+
+def compress_content(apps, schema_editor):
+    Lesson = apps.get_model("api", "Lesson")
+    above = Lesson._meta.get_field("content").compress_above
+    lessons = Lesson.objects.annotate(size=Length("content")).filter(size__gt=above)
+    batch = []
+    for lesson in lessons.only("pk", "content").iterator(chunk_size=500):
+        batch.append(lesson)
+        if len(batch) >= 500:
+            Lesson.objects.bulk_update(batch, ["content"])
+            batch = []
+    Lesson.objects.bulk_update(batch, ["content"])
+
+
+def decompress_content(apps, schema_editor):
+    Lesson = apps.get_model("api", "Lesson")
+    stored = Lesson.objects.filter(
+        content__startswith=api.fields.COMPRESSED_PREFIX
+    ).only("pk", "content")
+    for lesson in stored.iterator(chunk_size=500):
+        Lesson.objects.filter(pk=lesson.pk).update(
+            content=models.Value(lesson.content, output_field=models.TextField())
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0015_plagiarism_index"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="lesson",
+            name="content",
+            field=api.fields.CompressedTextField(),
+        ),
+        migrations.RunPython(compress_content, decompress_content),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0016_lesson_content_compression"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="lesson",
+            name="module",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="lessons",
+                to="api.module",
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:05
+
+from django.db import migrations, models
+
+
+def backfill_updated_at(apps, schema_editor):
+    ChatMessage = apps.get_model("api", "ChatMessage")
+    ChatMessage.objects.update(updated_at=models.F("timestamp"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0017_lesson_module"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatmessage",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
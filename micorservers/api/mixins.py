@@ -0,0 +1,141 @@
+from django.db import transaction
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from . import catalog
+
+_plans = {}
+
+
+def _walk(serializer, prefix, select, prefetch, in_prefetch):
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+        path = prefix + field.source.replace('.', '__')
+        if isinstance(field, serializers.ListSerializer):
+            prefetch.add(path)
+            _walk(field.child, path + '__', select, prefetch, True)
+        elif isinstance(field, serializers.BaseSerializer):
+            (prefetch if in_prefetch else select).add(path)
+            _walk(field, path + '__', select, prefetch, in_prefetch)
+        elif isinstance(field, serializers.ManyRelatedField):
+            prefetch.add(path)
+
+
+def get_queryset_plan(serializer_class):
+    """
+    Return ``(select_related, prefetch_related)`` lookups covering every
+    relation a serializer renders: nested single objects are joined, nested
+    lists and many-to-many fields are prefetched. Plans are cached per class.
+    """
+    plan = _plans.get(serializer_class)
+    if plan is None:
+        select, prefetch = set(), set()
+        _walk(serializer_class(), '', select, prefetch, False)
+        plan = _plans[serializer_class] = (sorted(select), sorted(prefetch))
+    return plan
+
+
+def unrendered_fields(serializer, model):
+    """
+    Concrete non-relation fields of ``model`` the serializer does not output,
+    e.g. those dropped by ``?fields=``. Empty when a field reads the whole
+    object (``source='*'``), since it may touch any attribute.
+    """
+    rendered = set()
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*':
+            return []
+        rendered.add(field.source.split('.')[0])
+    return [
+        field.name for field in model._meta.concrete_fields
+        if not field.primary_key and not field.is_relation and field.name not in rendered
+    ]
+
+
+class QuerysetOptimizerMixin:
+    """
+    Apply the serializer's ``select_related``/``prefetch_related`` plan to the
+    view's queryset, and on reads ``defer`` the columns a sparse ``?fields=``
+    request leaves out (such as lesson bodies in a table of contents).
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        select, prefetch = get_queryset_plan(self.get_serializer_class())
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        if self.request.method in ('GET', 'HEAD') and self.request.query_params.get('fields'):
+            deferred = unrendered_fields(self.get_serializer(), queryset.model)
+            if deferred:
+                queryset = queryset.defer(*deferred)
+        return queryset
+
+
+class CatalogCacheMixin:
+    """
+    Serve ``GET`` from the versioned catalog cache (see ``api/catalog.py``),
+    answering a matching ``If-None-Match`` with 304. ``catalog_scopes``
+    returns the scopes whose versions the response depends on.
+    """
+
+    def catalog_scopes(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        key, etag = catalog.request_tag(request, self.catalog_scopes())
+        response = catalog.not_modified(request, etag)
+        if response is not None:
+            return response
+        payload = catalog.load(key)
+        if payload is not None:
+            return catalog.finish(Response(payload), etag)
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            catalog.store(key, response.data)
+            catalog.finish(response, etag)
+        return response
+
+
+class BulkCreateMixin:
+    """
+    ``POST`` a JSON list to create every item with one ``bulk_create`` in a
+    transaction (see ``BulkListSerializer``). Set ``bulk_unique_fields`` and
+    ``bulk_update_fields`` to upsert instead, and ``bulk_owner_field`` to
+    assign the requesting user to every item.
+    """
+    bulk_max_items = 1000
+    bulk_batch_size = 500
+    bulk_owner_field = None
+    bulk_unique_fields = None
+    bulk_update_fields = None
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['bulk'] = {
+            'batch_size': self.bulk_batch_size,
+            'unique_fields': self.bulk_unique_fields,
+            'update_fields': self.bulk_update_fields,
+        }
+        return context
+
+    def post(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            return Response({'error': 'Expected a list of objects'}, status=400)
+        if len(items) > self.bulk_max_items:
+            return Response({'error': f'At most {self.bulk_max_items} items per request'}, status=400)
+        if self.bulk_owner_field:
+            items = [dict(item, **{self.bulk_owner_field: request.user.pk}) for item in items]
+        serializer = self.get_serializer(data=items, many=True)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            self.perform_bulk_create(serializer)
+        return Response(serializer.data, status=201)
+
+    def perform_bulk_create(self, serializer):
+        serializer.save()
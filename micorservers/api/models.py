@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+from .fields import CompressedTextField
+
 # Create your models here.
 
 class Course(models.Model):
@@ -8,23 +10,70 @@ class Course(models.Model):
     description = models.TextField()
     instructor = models.ForeignKey(User, on_delete=models.CASCADE)
     language = models.CharField(max_length=64, default='English')
+    lesson_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
 class Lesson(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='lessons')
+    module = models.ForeignKey('Module', on_delete=models.SET_NULL, null=True, blank=True, related_name='lessons')
     title = models.CharField(max_length=255)
-    content = models.TextField()
+    content = CompressedTextField()
     order = models.PositiveIntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Fields whose changes move the lesson between courses or alter the search index.
+    TRACKED_FIELDS = ('course_id', 'title', 'content')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['course', 'order'], name='lesson_course_order_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded values so saves can tell what changed without querying.
+        instance._loaded_values = instance.tracked_values()
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # post_save receivers have compared against the old values; start over from what was saved.
+        self._loaded_values = {**getattr(self, '_loaded_values', {}), **self.tracked_values(kwargs.get('update_fields'))}
+
+    def tracked_values(self, update_fields=None):
+        """Tracked values held in memory, limited to ``update_fields`` when given."""
+        return {
+            field: self.__dict__[field] for field in self.TRACKED_FIELDS
+            if field in self.__dict__
+            and (update_fields is None or field in update_fields or field.removesuffix('_id') in update_fields)
+        }
+
+    def changed_fields(self, update_fields=None):
+        """Tracked fields changed since the instance was loaded (or last saved)."""
+        loaded = self._loaded_values
+        return {
+            field for field, value in self.tracked_values(update_fields).items()
+            if field not in loaded or loaded[field] != value
+        }
+
 class Enrollment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
     enrolled_at = models.DateTimeField(auto_now_add=True)
     progress = models.FloatField(default=0.0)
     completed = models.BooleanField(default=False)
+    completed_lessons = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'course'], name='unique_enrollment_user_course'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'completed'], name='enrollment_user_completed_idx'),
+        ]
 
 class Challenge(models.Model):
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='challenges')
@@ -43,6 +92,11 @@ class Submission(models.Model):
     is_correct = models.BooleanField(default=False)
     feedback = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-submitted_at'], name='submission_user_recent_idx'),
+        ]
+
 class MCQ(models.Model):
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='mcqs')
     question = models.TextField()
@@ -60,6 +114,26 @@ class UserProgress(models.Model):
     completed = models.BooleanField(default=False)
     last_accessed = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'lesson'], name='unique_progress_user_lesson'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'completed'], name='progress_user_completed_idx'),
+            models.Index(fields=['user', '-last_accessed'], name='progress_user_recent_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded state so saves can adjust Enrollment.progress incrementally.
+        if not instance.get_deferred_fields() & {'user_id', 'lesson_id', 'completed'}:
+            instance._loaded_state = instance.progress_state()
+        return instance
+
+    def progress_state(self):
+        return (self.user_id, self.lesson_id, self.completed)
+
 class CourseReview(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='reviews')
@@ -68,6 +142,36 @@ class CourseReview(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded rating so saves can move it between courses and histogram buckets.
+        if not instance.get_deferred_fields() & {'course_id', 'rating'}:
+            instance._loaded_rating = instance.rating_state()
+        return instance
+
+    def rating_state(self):
+        return (self.course_id, self.rating)
+
+class CourseRatingStats(models.Model):
+    """Review aggregates for a course, kept up to date incrementally by ``CourseReview`` signals."""
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, primary_key=True, related_name='rating_stats')
+    count = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+
+    @property
+    def average(self):
+        return round(self.total / self.count, 2) if self.count else 0.0
+
+    @property
+    def histogram(self):
+        return {str(stars): getattr(self, f'stars_{stars}') for stars in range(1, 6)}
+
 class Test(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='tests')
     title = models.CharField(max_length=255)
@@ -81,6 +185,7 @@ class TestSubmission(models.Model):
     answers = models.JSONField(default=dict)
     score = models.FloatField(default=0.0)
     submitted_at = models.DateTimeField(auto_now_add=True)
+    results = models.JSONField(default=dict, blank=True)
     is_graded = models.BooleanField(default=False)
 
 class Module(models.Model):
@@ -99,3 +204,107 @@ class ChatMessage(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     message = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['course', 'timestamp'], name='chat_course_timestamp_idx'),
+            models.Index(fields=['course', 'id'], name='chat_course_id_idx'),
+        ]
+
+class GradingJob(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    submission = models.OneToOneField(Submission, on_delete=models.CASCADE, related_name='grading_job')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=128, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+class PDFIngestJob(models.Model):
+    """A spooled PDF upload waiting to be split into lessons of ``course`` or notes on ``lesson``."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, null=True, blank=True)
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, null=True, blank=True)
+    filename = models.CharField(max_length=255)
+    path = models.CharField(max_length=1024)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    pages_total = models.PositiveIntegerField(default=0)
+    pages_done = models.PositiveIntegerField(default=0)
+    created = models.JSONField(default=list, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=128, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+class SubmissionSignature(models.Model):
+    """MinHash signature of a submission's code (packed unsigned 32-bit values, see api/plagiarism.py)."""
+    submission = models.OneToOneField(Submission, on_delete=models.CASCADE, primary_key=True, related_name='signature')
+    challenge = models.ForeignKey(Challenge, on_delete=models.CASCADE, related_name='+')
+    signature = models.BinaryField()
+    shingles = models.PositiveIntegerField(default=0)
+
+class SubmissionBucket(models.Model):
+    """One LSH band of a signature; submissions sharing a bucket are near-duplicate candidates."""
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='+')
+    challenge = models.ForeignKey(Challenge, on_delete=models.CASCADE, related_name='+')
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['challenge', 'bucket'], name='bucket_challenge_bucket_idx'),
+        ]
+
+class VerdictCacheEntry(models.Model):
+    key = models.CharField(max_length=64, unique=True)
+    payload = models.JSONField()
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+class CourseTrend(models.Model):
+    """Recent activity of a course over a sliding window, recomputed by ``compute_recommendations``."""
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, primary_key=True, related_name='trend')
+    enrollments = models.PositiveIntegerField(default=0)
+    submissions = models.PositiveIntegerField(default=0)
+    score = models.FloatField(default=0.0, db_index=True)
+    computed_at = models.DateTimeField()
+
+class CourseSimilarity(models.Model):
+    """Top co-enrollment neighbours of a course, recomputed by ``compute_recommendations``."""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='similar_courses')
+    similar = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'similar'], name='unique_course_similarity'),
+        ]
+        indexes = [
+            models.Index(fields=['course', '-score'], name='similarity_course_score_idx'),
+        ]
@@ -0,0 +1,72 @@
+"""
+Course outline: the ``Module`` -> ``Lesson`` -> ``Challenge``/``MCQ`` tree
+behind ``CourseOutlineView``.
+
+The tree is read with one query per level (five in all, whatever the course
+size), using ``values()`` rows and leaving out lesson bodies, expected outputs
+and MCQ answers. It is cached per course under the course's catalog version
+(see ``api/catalog.py``), so any edit to the course or its parts retires it.
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+from . import catalog
+from .models import MCQ, Challenge, Course, Lesson, Module
+
+DEFAULTS = {
+    'CACHE': 'default',
+    'TTL': 60 * 60,
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'OUTLINE_CACHE', {}))
+    return config
+
+
+def _key(course_id):
+    version, = catalog.versions([catalog.course_scope(course_id)])
+    return f'outline:{course_id}:{version}'
+
+
+def build(course_id):
+    """The outline of the course as plain data, or None if it does not exist."""
+    course = (
+        Course.objects.filter(pk=course_id)
+        .values('id', 'title', 'description', 'language', 'instructor_id', 'lesson_count').first()
+    )
+    if course is None:
+        return None
+    modules = list(Module.objects.filter(course_id=course_id).order_by('order', 'id').values('id', 'title', 'order'))
+    lessons = list(
+        Lesson.objects.filter(course_id=course_id).order_by('order', 'id').values('id', 'module_id', 'title', 'order')
+    )
+    for lesson in lessons:
+        lesson['challenges'], lesson['mcqs'] = [], []
+    by_lesson = {lesson['id']: lesson for lesson in lessons}
+    for challenge in Challenge.objects.filter(lesson__course_id=course_id).order_by('order', 'id').values('id', 'lesson_id', 'title', 'order'):
+        by_lesson[challenge.pop('lesson_id')]['challenges'].append(challenge)
+    for mcq in MCQ.objects.filter(lesson__course_id=course_id).order_by('id').values('id', 'lesson_id', 'question', 'options'):
+        by_lesson[mcq.pop('lesson_id')]['mcqs'].append(mcq)
+
+    by_module = {module['id']: dict(module, lessons=[]) for module in modules}
+    unassigned = []
+    for lesson in lessons:
+        module = by_module.get(lesson.pop('module_id'))
+        (module['lessons'] if module else unassigned).append(lesson)
+    course['instructor'] = course.pop('instructor_id')
+    return {'course': course, 'modules': list(by_module.values()), 'lessons': unassigned}
+
+
+def cached(course_id):
+    config = get_config()
+    cache = caches[config['CACHE']]
+    key = _key(course_id)
+    payload = cache.get(key)
+    if payload is None:
+        payload = build(course_id)
+        if payload is not None:
+            cache.set(key, payload, config['TTL'])
+    return payload
+
@@ -0,0 +1,27 @@
+from rest_framework.pagination import CursorPagination
+
+UNIQUE_KEYS = {'id', '-id', 'pk', '-pk'}
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination over a monotonically ordered key.
+
+    Views pick their key with an ``ordering`` attribute (the same attribute
+    ``OrderingFilter`` uses as its default); ``-id`` is used otherwise.
+    Non-unique keys (``order``, ``created_at``...) get ``id`` appended as a
+    tiebreaker so rows sharing a value keep a stable order across pages and
+    are neither skipped nor repeated.
+    No COUNT query is issued, so a page costs the same at any offset.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = '-id'
+
+    def get_ordering(self, request, queryset, view):
+        self.ordering = getattr(view, 'ordering', None) or self.ordering
+        ordering = super().get_ordering(request, queryset, view)
+        if not UNIQUE_KEYS & set(ordering):
+            ordering += ('-id' if ordering[0].startswith('-') else 'id',)
+        return ordering
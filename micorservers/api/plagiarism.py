@@ -0,0 +1,219 @@
+"""
+Near-duplicate detection over ``Submission.code`` with MinHash and LSH.
+
+Code is reduced to a token stream in which identifiers, numbers and strings
+are replaced by placeholders (so renaming variables does not hide a copy) and
+cut into shingles of ``SHINGLE_SIZE`` tokens. Each submission keeps a
+``PERMUTATIONS``-value MinHash signature packed into a ``BinaryField``, split
+into ``BANDS`` LSH buckets stored in an indexed table. Finding similar
+submissions reads the buckets of one challenge that collide with the target
+and ranks only those candidates by estimated Jaccard similarity.
+
+Changing the settings requires ``rebuild_plagiarism_index``.
+"""
+import hashlib
+import io
+import keyword
+import random
+import re
+import tokenize
+import zlib
+from array import array
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Submission, SubmissionBucket, SubmissionSignature
+
+try:
+    import numpy as np
+except ImportError:  # optional; signatures are identical either way
+    np = None
+
+DEFAULTS = {
+    'SHINGLE_SIZE': 5,
+    'PERMUTATIONS': 128,
+    'BANDS': 32,
+    'SEED': 1,
+    'MAX_CANDIDATES': 500,
+}
+PRIME = (1 << 61) - 1
+EMPTY = 0xFFFFFFFF
+GENERIC_TOKEN = re.compile(r'[A-Za-z_]\w*|\d+(?:\.\d+)?|"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|\S')
+_permutations = {}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'PLAGIARISM', {}))
+    return config
+
+
+# Normalization
+
+def _python_tokens(code):
+    skip = {tokenize.COMMENT, tokenize.NL, tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT, tokenize.ENCODING, tokenize.ENDMARKER}
+    for token in tokenize.generate_tokens(io.StringIO(code).readline):
+        if token.type in skip:
+            continue
+        if token.type == tokenize.NAME:
+            yield token.string if keyword.iskeyword(token.string) else 'V'
+        elif token.type == tokenize.NUMBER:
+            yield 'N'
+        elif token.type == tokenize.STRING:
+            yield 'S'
+        else:
+            yield token.string
+
+
+def _generic_tokens(code):
+    for token in GENERIC_TOKEN.findall(code):
+        if token[0] in '"\'':
+            yield 'S'
+        elif token[0].isdigit():
+            yield 'N'
+        elif token[0].isalpha() or token[0] == '_':
+            yield token if keyword.iskeyword(token) else 'V'
+        else:
+            yield token
+
+
+def normalize_tokens(code, language='python'):
+    if (language or 'python').lower() in ('python', 'python3', 'py'):
+        try:
+            return list(_python_tokens(code))
+        except (tokenize.TokenError, IndentationError, SyntaxError):
+            pass
+    return list(_generic_tokens(code))
+
+
+def shingles(tokens, size):
+    if len(tokens) < size:
+        return {zlib.crc32(' '.join(tokens).encode())} if tokens else set()
+    return {zlib.crc32(' '.join(tokens[i:i + size]).encode()) for i in range(len(tokens) - size + 1)}
+
+
+# MinHash / LSH
+
+def _coefficients(count, seed):
+    key = (count, seed)
+    if key not in _permutations:
+        rng = random.Random(seed)
+        _permutations[key] = [(rng.randrange(1, 1 << 31), rng.randrange(0, 1 << 32)) for _ in range(count)]
+    return _permutations[key]
+
+
+def minhash(hashes, permutations, seed):
+    """``array('I')`` of ``permutations`` minimum hash values of the 32-bit shingle hashes."""
+    coefficients = _coefficients(permutations, seed)
+    if not hashes:
+        return array('I', [EMPTY] * permutations)
+    if np is not None:
+        values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+        a = np.array([a for a, _ in coefficients], dtype=np.uint64)
+        b = np.array([b for _, b in coefficients], dtype=np.uint64)
+        mins = ((np.outer(values, a) + b) % PRIME & EMPTY).min(axis=0)
+        return array('I', mins.astype(np.uint32).tobytes())
+    return array('I', [min((a * x + b) % PRIME & EMPTY for x in hashes) for a, b in coefficients])
+
+
+def band_buckets(signature, bands):
+    """One signed 64-bit key per band; the band number is hashed in so keys never collide across bands."""
+    rows = len(signature) // bands
+    keys = []
+    for band in range(bands):
+        digest = hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(), digest_size=8, person=band.to_bytes(2, 'big'))
+        keys.append(int.from_bytes(digest.digest(), 'big', signed=True))
+    return keys
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity: the fraction of equal signature positions."""
+    if np is not None:
+        return float((np.frombuffer(first, dtype=np.uint32) == np.frombuffer(second, dtype=np.uint32)).mean())
+    return sum(x == y for x, y in zip(first, second)) / len(first)
+
+
+def _unpack(data):
+    signature = array('I')
+    signature.frombytes(bytes(data))
+    return signature
+
+
+def signature_for(code, language):
+    config = get_config()
+    hashes = shingles(normalize_tokens(code or '', language), config['SHINGLE_SIZE'])
+    return minhash(hashes, config['PERMUTATIONS'], config['SEED']), len(hashes)
+
+
+# Index maintenance
+
+def index_submissions(submissions):
+    """(Re)index the given submissions (needs ``id``, ``challenge_id``, ``code`` and ``language``)."""
+    config = get_config()
+    signatures, buckets = [], []
+    for submission in submissions:
+        signature, count = signature_for(submission.code, submission.language)
+        signatures.append(SubmissionSignature(
+            submission_id=submission.pk, challenge_id=submission.challenge_id,
+            signature=signature.tobytes(), shingles=count,
+        ))
+        if count:
+            buckets.extend(
+                SubmissionBucket(submission_id=submission.pk, challenge_id=submission.challenge_id, bucket=bucket)
+                for bucket in band_buckets(signature, config['BANDS'])
+            )
+    ids = [row.submission_id for row in signatures]
+    with transaction.atomic():
+        SubmissionBucket.objects.filter(submission_id__in=ids).delete()
+        SubmissionSignature.objects.filter(submission_id__in=ids).delete()
+        SubmissionSignature.objects.bulk_create(signatures)
+        SubmissionBucket.objects.bulk_create(buckets, batch_size=2000)
+    return len(signatures)
+
+
+def rebuild(batch_size=1000, challenge_id=None):
+    submissions = Submission.objects.order_by('pk').only('id', 'challenge_id', 'code', 'language')
+    if challenge_id is not None:
+        submissions = submissions.filter(challenge_id=challenge_id)
+    count = 0
+    batch = []
+    for submission in submissions.iterator(chunk_size=batch_size):
+        batch.append(submission)
+        if len(batch) >= batch_size:
+            count += index_submissions(batch)
+            batch = []
+    return count + (index_submissions(batch) if batch else 0)
+
+
+# Queries
+
+def similar_submissions(submission, k=10, min_similarity=0.0):
+    """
+    Return ``[(submission_id, similarity), ...]`` best first for submissions of
+    the same challenge that share at least one LSH bucket with ``submission``.
+    """
+    config = get_config()
+    row = SubmissionSignature.objects.filter(submission_id=submission.pk).values_list('signature', flat=True).first()
+    if row is None:
+        index_submissions([submission])
+        row = SubmissionSignature.objects.filter(submission_id=submission.pk).values_list('signature', flat=True).get()
+    signature = _unpack(row)
+    if all(value == EMPTY for value in signature):
+        return []
+    candidates = (
+        SubmissionBucket.objects
+        .filter(challenge_id=submission.challenge_id, bucket__in=band_buckets(signature, config['BANDS']))
+        .exclude(submission_id=submission.pk)
+        .values('submission_id').annotate(collisions=Count('id')).order_by('-collisions')
+        .values_list('submission_id', flat=True)[:config['MAX_CANDIDATES']]
+    )
+    scored = [
+        (candidate_id, round(similarity(signature, _unpack(data)), 4))
+        for candidate_id, data in SubmissionSignature.objects.filter(submission_id__in=list(candidates))
+        .values_list('submission_id', 'signature')
+    ]
+    scored = [item for item in scored if item[1] >= min_similarity]
+    scored.sort(key=lambda item: (-item[1], item[0]))
+    return scored[:k]
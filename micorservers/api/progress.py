@@ -0,0 +1,132 @@
+"""
+Incremental ``Enrollment.progress``.
+
+Every enrollment keeps ``completed_lessons`` and every course its
+``lesson_count``; completing or un-completing a lesson is a single UPDATE of
+the matching enrollment that also derives ``progress`` (percent) and
+``completed`` from the two counters. ``reconcile`` recomputes everything from
+``UserProgress`` for rows written behind the signals' back.
+"""
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Cast, Coalesce, Greatest, Least, Round
+from django.db.models.lookups import GreaterThanOrEqual, LessThanOrEqual
+
+from . import catalog
+from .models import Course, Enrollment, UserProgress
+
+
+def _course_lessons():
+    return Subquery(Course.objects.filter(pk=OuterRef('course_id')).values('lesson_count')[:1])
+
+
+def _derived(completed, lessons):
+    """UPDATE values for an enrollment with ``completed`` of ``lessons`` lessons done (both expressions)."""
+    return {
+        'completed_lessons': completed,
+        'progress': Least(Value(100.0), Round(Cast(completed, FloatField()) * 100.0 / Greatest(lessons, Value(1)), 2)),
+        'completed': Case(
+            When(LessThanOrEqual(lessons, Value(0)), then=Value(False)),
+            When(GreaterThanOrEqual(completed, lessons), then=Value(True)),
+            default=Value(False),
+        ),
+    }
+
+
+def _apply(user_id, lesson_id, delta):
+    completed = Greatest(F('completed_lessons') + delta, Value(0))
+    Enrollment.objects.filter(user_id=user_id, course__lessons__id=lesson_id).update(
+        **_derived(completed, _course_lessons())
+    )
+
+
+def change_progress(old, progress):
+    """
+    Account for a saved ``UserProgress``. ``old`` is the ``(user_id, lesson_id,
+    completed)`` the row was loaded with, or None for a new row.
+    """
+    new = progress.progress_state()
+    if old == new:
+        return
+    with transaction.atomic():
+        if old and old[2]:
+            _apply(old[0], old[1], -1)
+        if progress.completed:
+            _apply(progress.user_id, progress.lesson_id, 1)
+
+
+def remove_progress(progress):
+    if progress.completed:
+        _apply(progress.user_id, progress.lesson_id, -1)
+
+
+def change_lesson_count(course_id, delta):
+    """A lesson was added to or removed from the course: rescale its enrollments."""
+    with transaction.atomic():
+        Course.objects.filter(pk=course_id).update(lesson_count=Greatest(F('lesson_count') + delta, Value(0)))
+        Enrollment.objects.filter(course_id=course_id).update(**_derived(F('completed_lessons'), _course_lessons()))
+
+
+def move_lesson(lesson_id, old_course_id, new_course_id):
+    """A lesson moved between courses: fix both lesson counts and the enrollments of those who completed it."""
+    with transaction.atomic():
+        change_lesson_count(old_course_id, -1)
+        change_lesson_count(new_course_id, 1)
+        completed_by = UserProgress.objects.filter(lesson_id=lesson_id, completed=True).values('user_id')
+        refresh_enrollments(Enrollment.objects.filter(course_id__in=[old_course_id, new_course_id], user_id__in=completed_by))
+
+
+def _completed_lessons():
+    done = (
+        UserProgress.objects.filter(user_id=OuterRef('user_id'), lesson__course_id=OuterRef('course_id'), completed=True)
+        .order_by().values('user_id').annotate(n=Count('lesson_id', distinct=True)).values('n')
+    )
+    return Coalesce(Subquery(done[:1]), Value(0))
+
+
+def refresh_enrollments(enrollments):
+    """Recompute ``completed_lessons``/``progress``/``completed`` of the given enrollments from ``UserProgress``."""
+    return enrollments.update(**_derived(_completed_lessons(), _course_lessons()))
+
+
+def _derived_values(completed, lessons):
+    """Python twin of ``_derived`` for bulk reconciliation."""
+    return completed, min(100.0, round(completed * 100.0 / max(lessons, 1), 2)), 0 < lessons <= completed
+
+
+def reconcile(batch_size=5000):
+    """
+    Recount lessons per course and completed lessons per enrollment, writing
+    only the enrollments that drifted; returns the number of rows fixed.
+    """
+    lesson_counts, drifted = {}, []
+    for course in Course.objects.order_by('pk').only('pk', 'lesson_count').annotate(n=Count('lessons')):
+        lesson_counts[course.pk] = course.n
+        if course.lesson_count != course.n:
+            course.lesson_count = course.n
+            drifted.append(course)
+    Course.objects.bulk_update(drifted, ['lesson_count'], batch_size=batch_size)
+    if drifted:
+        # bulk_update sends no signals; retire the cached catalog pages of the recounted courses.
+        catalog.bump([course.pk for course in drifted])
+    done = {
+        (user_id, course_id): n
+        for user_id, course_id, n in UserProgress.objects.filter(completed=True).order_by()
+        .values_list('user_id', 'lesson__course_id').annotate(n=Count('lesson_id', distinct=True))
+    }
+    fields = ['completed_lessons', 'progress', 'completed']
+    fixed = 0
+    stale = []
+    enrollments = Enrollment.objects.order_by('pk').only('pk', 'user_id', 'course_id', *fields)
+    for enrollment in enrollments.iterator(chunk_size=batch_size):
+        values = _derived_values(done.get((enrollment.user_id, enrollment.course_id), 0),
+                                 lesson_counts.get(enrollment.course_id, 0))
+        if values != tuple(getattr(enrollment, field) for field in fields):
+            enrollment.completed_lessons, enrollment.progress, enrollment.completed = values
+            stale.append(enrollment)
+        if len(stale) >= batch_size:
+            Enrollment.objects.bulk_update(stale, fields, batch_size=batch_size)
+            fixed += len(stale)
+            stale = []
+    Enrollment.objects.bulk_update(stale, fields, batch_size=batch_size)
+    return fixed + len(stale)
@@ -0,0 +1,56 @@
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from . import catalog
+from .models import Course, CourseRatingStats, CourseReview
+
+STARS = range(1, 6)
+
+
+def _apply(course_id, rating, delta):
+    changes = {'count': F('count') + delta, 'total': F('total') + delta * rating}
+    if rating in STARS:
+        changes[f'stars_{rating}'] = F(f'stars_{rating}') + delta
+    if not CourseRatingStats.objects.filter(course_id=course_id).update(**changes) and delta > 0:
+        # A missing row on removal means the course itself is being deleted.
+        CourseRatingStats.objects.get_or_create(course_id=course_id)
+        CourseRatingStats.objects.filter(course_id=course_id).update(**changes)
+    catalog.bump([course_id])
+
+
+def record_review(review):
+    _apply(review.course_id, review.rating, 1)
+
+
+def remove_review(course_id, rating):
+    _apply(course_id, rating, -1)
+
+
+def change_review(old_course_id, old_rating, review):
+    if (old_course_id, old_rating) == review.rating_state():
+        return
+    with transaction.atomic():
+        remove_review(old_course_id, old_rating)
+        record_review(review)
+
+
+def aggregate_reviews(reviews):
+    """One GROUP BY over reviews returning ``{course_id: {count, total, stars_1..stars_5}}``."""
+    stars = {f'stars_{n}': Count('id', filter=Q(rating=n)) for n in STARS}
+    rows = reviews.order_by().values('course_id').annotate(count=Count('id'), total=Sum('rating'), **stars)
+    return {row.pop('course_id'): row for row in rows}
+
+
+def rebuild_rating_stats(batch_size=1000):
+    """Recompute every course's stats from scratch; returns the number of courses processed."""
+    aggregates = aggregate_reviews(CourseReview.objects.all())
+    course_ids = list(Course.objects.values_list('pk', flat=True))
+    with transaction.atomic():
+        CourseRatingStats.objects.all().delete()
+        CourseRatingStats.objects.bulk_create(
+            [CourseRatingStats(course_id=course_id, **aggregates.get(course_id, {})) for course_id in course_ids],
+            batch_size=batch_size,
+        )
+        # Bulk writes send no signals; retire the cached catalog pages ourselves.
+        catalog.bump(course_ids)
+    return len(course_ids)
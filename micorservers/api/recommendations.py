@@ -0,0 +1,180 @@
+"""
+Offline recommendation tables behind ``home_overview``.
+
+``compute_recommendations`` periodically rebuilds two small tables:
+
+* ``CourseTrend``: per-course enrollment and submission rates over a sliding
+  window, so "trending" is a single ORDER BY on an indexed score.
+* ``CourseSimilarity``: the top neighbours of every course by cosine
+  similarity of their enrollment vectors (item-item co-enrollment), computed
+  with a sparse user x course matrix when NumPy/SciPy are installed and with a
+  pair counter otherwise.
+
+The request path only reads these tables; it never aggregates raw activity.
+Until ``compute_recommendations`` has filled ``CourseTrend`` (a fresh install,
+or no activity in the window) the newest courses stand in for trending ones.
+"""
+import itertools
+import math
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .models import Course, CourseSimilarity, CourseTrend, Enrollment, Submission
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # optional; the pure-Python path gives the same result on small datasets
+    np = sparse = None
+
+DEFAULTS = {
+    'TRENDING_WINDOW_DAYS': 7,
+    'ENROLLMENT_WEIGHT': 3.0,
+    'SUBMISSION_WEIGHT': 1.0,
+    'SIMILAR_PER_COURSE': 20,
+    'MIN_CO_ENROLLMENTS': 2,
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'RECOMMENDATIONS', {}))
+    return config
+
+
+# Trending
+
+def compute_trending(window_days=None, now=None, batch_size=1000):
+    """Replace ``CourseTrend`` with activity per day over the last ``window_days``; returns the row count."""
+    config = get_config()
+    window_days = window_days or config['TRENDING_WINDOW_DAYS']
+    now = now or timezone.now()
+    since = now - timedelta(days=window_days)
+
+    enrollments = dict(
+        Enrollment.objects.filter(enrolled_at__gte=since).order_by()
+        .values_list('course_id').annotate(n=Count('id'))
+    )
+    submissions = dict(
+        Submission.objects.filter(submitted_at__gte=since).order_by()
+        .values_list('challenge__lesson__course_id').annotate(n=Count('id'))
+    )
+    trends = []
+    for course_id in enrollments.keys() | submissions.keys():
+        enrolled, submitted = enrollments.get(course_id, 0), submissions.get(course_id, 0)
+        score = (enrolled * config['ENROLLMENT_WEIGHT'] + submitted * config['SUBMISSION_WEIGHT']) / window_days
+        trends.append(CourseTrend(course_id=course_id, enrollments=enrolled, submissions=submitted,
+                                  score=score, computed_at=now))
+    with transaction.atomic():
+        CourseTrend.objects.all().delete()
+        CourseTrend.objects.bulk_create(trends, batch_size=batch_size)
+    return len(trends)
+
+
+# Item-item similarity
+
+def _similar_sparse(pairs, top_k, min_common):
+    users = np.fromiter((user_id for user_id, _ in pairs), dtype=np.int64, count=len(pairs))
+    courses = np.fromiter((course_id for _, course_id in pairs), dtype=np.int64, count=len(pairs))
+    _, rows = np.unique(users, return_inverse=True)
+    course_ids, cols = np.unique(courses, return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.float32), (rows, cols)),
+        shape=(rows.max() + 1, len(course_ids)),
+    )
+    matrix.data[:] = 1  # duplicate (user, course) rows count once
+    co = (matrix.T @ matrix).tocsr()
+    norms = np.sqrt(co.diagonal())
+    co.setdiag(0)
+    co.eliminate_zeros()
+
+    neighbours = {}
+    for index, course_id in enumerate(course_ids):
+        start, end = co.indptr[index], co.indptr[index + 1]
+        others, common = co.indices[start:end], co.data[start:end]
+        keep = common >= min_common
+        others, common = others[keep], common[keep]
+        if not len(others):
+            continue
+        scores = common / (norms[index] * norms[others])
+        best = np.argsort(-scores, kind='stable')[:top_k]
+        neighbours[int(course_id)] = [(int(course_ids[others[i]]), float(scores[i])) for i in best]
+    return neighbours
+
+
+def _similar_python(pairs, top_k, min_common):
+    by_user = defaultdict(set)
+    for user_id, course_id in pairs:
+        by_user[user_id].add(course_id)
+    sizes = Counter()
+    common = Counter()
+    for courses in by_user.values():
+        sizes.update(courses)
+        common.update(itertools.permutations(sorted(courses), 2))
+
+    candidates = defaultdict(list)
+    for (course_id, other_id), shared in common.items():
+        if shared >= min_common:
+            candidates[course_id].append((other_id, shared / math.sqrt(sizes[course_id] * sizes[other_id])))
+    return {
+        course_id: sorted(others, key=lambda item: -item[1])[:top_k]
+        for course_id, others in candidates.items()
+    }
+
+
+def similar_courses(top_k=None, min_common=None):
+    """Return ``{course_id: [(similar_course_id, cosine), ...]}`` best first."""
+    config = get_config()
+    top_k = top_k or config['SIMILAR_PER_COURSE']
+    min_common = min_common or config['MIN_CO_ENROLLMENTS']
+    pairs = list(Enrollment.objects.order_by().values_list('user_id', 'course_id').iterator(chunk_size=10000))
+    if not pairs:
+        return {}
+    if sparse is not None:
+        return _similar_sparse(pairs, top_k, min_common)
+    return _similar_python(pairs, top_k, min_common)
+
+
+def compute_similarities(top_k=None, min_common=None, batch_size=5000):
+    """Replace ``CourseSimilarity`` with freshly computed neighbours; returns the row count."""
+    rows = [
+        CourseSimilarity(course_id=course_id, similar_id=similar_id, score=score)
+        for course_id, others in similar_courses(top_k, min_common).items()
+        for similar_id, score in others
+    ]
+    with transaction.atomic():
+        CourseSimilarity.objects.all().delete()
+        CourseSimilarity.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+# Request path
+
+def trending_course_ids(limit, exclude=()):
+    course_ids = list(
+        CourseTrend.objects.exclude(course_id__in=exclude).order_by('-score', 'course_id')
+        .values_list('course_id', flat=True)[:limit]
+    )
+    if not course_ids and not CourseTrend.objects.exists():
+        course_ids = list(Course.objects.exclude(pk__in=exclude).order_by('-id').values_list('id', flat=True)[:limit])
+    return course_ids
+
+
+def recommended_course_ids(enrolled, limit):
+    """Courses most similar to the ones in ``enrolled`` that the user has not taken, topped up with trending ones."""
+    enrolled = list(enrolled)
+    course_ids = []
+    if enrolled:
+        course_ids = list(
+            CourseSimilarity.objects.filter(course_id__in=enrolled).exclude(similar_id__in=enrolled)
+            .values('similar_id').annotate(total=Sum('score')).order_by('-total', 'similar_id')
+            .values_list('similar_id', flat=True)[:limit]
+        )
+    if len(course_ids) < limit:
+        course_ids += trending_course_ids(limit - len(course_ids), exclude=enrolled + course_ids)
+    return course_ids
@@ -0,0 +1,241 @@
+"""
+Pool of pre-forked sandbox workers used to execute submitted code.
+
+Each worker is a long-lived ``api/sandbox_worker.py`` process. A run checks a
+worker out of the pool, sends it one job and puts it back, so the interpreter
+start-up cost is paid once per worker instead of once per request. Workers are
+started on demand, up to ``WORKERS``, so a web process only keeps as many as
+it has had concurrent runs. See ``sandbox_worker`` for how runs are isolated.
+"""
+import atexit
+import json
+import os
+import queue
+import select
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sandbox_worker.py')
+
+SUPPORTED_LANGUAGES = {'python', 'python3', 'py'}
+
+DEFAULTS = {
+    'WORKERS': os.cpu_count() or 2,
+    # Refuse to run code unless the child can be isolated (namespaces, chroot, no privileges).
+    'ISOLATION': True,
+    'USER_ID': 65534,
+    'GROUP_ID': 65534,
+    # Extra read-only paths visible inside the jail besides Python and the system libraries.
+    'EXPOSE_PATHS': [],
+    'CPU_SECONDS': 2,
+    'WALL_SECONDS': 5,
+    'MEMORY_MB': 256,
+    'MAX_OUTPUT': 64 * 1024,
+    'CASE_SECONDS': 2,
+    'BATCH_SECONDS': 30,
+    'STOP_ON_FAILURE': False,
+}
+
+
+class SandboxError(Exception):
+    pass
+
+
+def normalize_output(text):
+    return '\n'.join(line.rstrip() for line in (text or '').strip().splitlines())
+
+
+def judge_cases(result, cases, stop_on_failure):
+    """
+    Turn the worker's per-case runs into verdicts by comparing their output
+    with the expected ``cases`` here, outside the sandbox.
+    """
+    verdicts = []
+    for run, case in zip(result.pop('cases'), cases):
+        verdict = run['status']
+        if verdict == 'ok':
+            matches = normalize_output(run['stdout']) == normalize_output(case.get('output', ''))
+            verdict = 'passed' if matches else 'wrong_answer'
+        entry = {'case': run['case'], 'verdict': verdict, 'time': run['time']}
+        if verdict != 'passed':
+            entry['stderr'] = run['stderr']
+        verdicts.append(entry)
+        if verdict != 'passed' and stop_on_failure:
+            break
+    result['cases'] = verdicts
+    result['time'] = round(sum(entry['time'] for entry in verdicts), 4)
+    return result
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'SANDBOX', {}))
+    return config
+
+
+def worker_options(config):
+    return {
+        'isolation': config['ISOLATION'],
+        'uid': config['USER_ID'],
+        'gid': config['GROUP_ID'],
+        'expose': list(config['EXPOSE_PATHS']),
+    }
+
+
+class _Worker:
+    def __init__(self, options):
+        self.process = subprocess.Popen(
+            [sys.executable, '-I', '-S', WORKER_SCRIPT, json.dumps(options)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=tempfile.gettempdir(),
+            env={'PATH': '/usr/bin:/bin', 'PYTHONHASHSEED': '0'},
+            start_new_session=True,
+        )
+        self._buffer = b''
+
+    def request(self, job, timeout):
+        try:
+            self.process.stdin.write(json.dumps(job).encode() + b'\n')
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as exc:
+            raise SandboxError('Sandbox worker is not accepting jobs') from exc
+        fd = self.process.stdout.fileno()
+        deadline = time.monotonic() + timeout
+        while b'\n' not in self._buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                raise SandboxError('Sandbox worker did not respond in time')
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise SandboxError('Sandbox worker exited')
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b'\n', 1)
+        return json.loads(line)
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+
+
+class SandboxPool:
+    def __init__(self, size=None, config=None):
+        self.config = config or get_config()
+        self.size = size or self.config['WORKERS']
+        self.options = worker_options(self.config)
+        self._idle = queue.Queue()
+        self._started = 0
+        self._lock = threading.Lock()
+
+    @property
+    def started(self):
+        return self._started
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._started < self.size:
+                self._started += 1
+                return _Worker(self.options)
+        return self._idle.get()
+
+    @property
+    def limits(self):
+        return {
+            'cpu_seconds': self.config['CPU_SECONDS'],
+            'wall_seconds': self.config['WALL_SECONDS'],
+            'memory_mb': self.config['MEMORY_MB'],
+            'max_output': self.config['MAX_OUTPUT'],
+            'case_seconds': self.config['CASE_SECONDS'],
+            'batch_seconds': self.config['BATCH_SECONDS'],
+        }
+
+    def submit(self, job, timeout):
+        worker = self._checkout()
+        try:
+            return worker.request(job, timeout)
+        except SandboxError:
+            worker.close()
+            worker = _Worker(self.options)
+            raise
+        finally:
+            self._idle.put(worker)
+
+    def run(self, code, stdin='', language='python'):
+        if (language or 'python').lower() not in SUPPORTED_LANGUAGES:
+            return {'status': 'unsupported', 'stdout': '', 'stderr': f'Language {language!r} is not supported', 'time': 0}
+        limits = self.limits
+        job = {'code': code, 'stdin': stdin or '', 'limits': limits}
+        try:
+            return self.submit(job, limits['wall_seconds'] + 5)
+        except SandboxError as exc:
+            return {'status': 'unavailable', 'stdout': '', 'stderr': str(exc), 'time': 0}
+
+    def run_batch(self, code, cases, language='python', stop_on_failure=None):
+        """
+        Run every test case through one sandboxed session and return per-case
+        verdicts. Only the inputs are sent to the worker; a wrong answer is
+        recognised here, so with ``stop_on_failure`` the worker may already
+        have run the cases after it, whose results are dropped.
+        """
+        if (language or 'python').lower() not in SUPPORTED_LANGUAGES:
+            message = f'Language {language!r} is not supported'
+            return {'status': 'unsupported', 'stderr': message, 'time': 0, 'cases': [
+                {'case': index, 'verdict': 'unsupported', 'time': 0, 'stderr': message}
+                for index in range(1, len(cases) + 1)
+            ]}
+        if stop_on_failure is None:
+            stop_on_failure = self.config['STOP_ON_FAILURE']
+        limits = self.limits
+        job = {
+            'code': code,
+            'cases': [case.get('input', '') or '' for case in cases],
+            'stop_on_failure': stop_on_failure,
+            'limits': limits,
+        }
+        try:
+            result = self.submit(job, limits['batch_seconds'] + 5)
+        except SandboxError as exc:
+            return {'status': 'unavailable', 'stderr': str(exc), 'time': 0, 'cases': []}
+        return judge_cases(result, cases, stop_on_failure)
+
+    def shutdown(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide pool, starting it on first use (and after fork)."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = SandboxPool()
+            _pool_pid = os.getpid()
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def run_code(code, stdin='', language='python'):
+    return get_pool().run(code, stdin=stdin, language=language)
+
+
+def run_test_cases(code, cases, language='python', stop_on_failure=None):
+    return get_pool().run_batch(code, cases, language=language, stop_on_failure=stop_on_failure)
@@ -0,0 +1,378 @@
+"""
+Sandbox worker process.
+
+Spawned by ``api.sandbox`` and kept alive across runs. It deliberately avoids
+importing Django so that it starts quickly and has a small footprint. Jobs are
+read as JSON lines from stdin; every job is executed in a forked child with
+resource limits applied and the result is written back as one JSON line on
+stdout.
+
+Before running any code the child isolates itself (Linux only): it enters new
+network and mount namespaces (plus a user namespace when the worker is not
+root), so it has no network interfaces besides a downed loopback, chroots into
+a tmpfs exposing only read-only binds of the Python installation and system
+libraries, and gives up its privileges (``nobody`` when started as root, all
+capabilities otherwise) with ``no_new_privs`` set. If any step fails the job
+is refused with ``unavailable`` rather than run unisolated; isolation can only
+be switched off explicitly (``SANDBOX['ISOLATION'] = False``) for development.
+
+The isolated child is only a supervisor: the submitted code runs in a fresh
+fork of it for every run or test case, so globals, imported modules and
+monkeypatches never carry over from one case to the next. The supervisor
+enforces the time limit from outside (the code cannot catch it) and maps how
+the fork died to a verdict: CPU exhaustion is a ``timeout``, any other
+``SIGKILL`` is the OOM killer (``memory_limit``), other signals are an
+``error``. A supervisor that dies itself is reported as ``unavailable``.
+
+A job carrying ``cases`` is a batch: the code is compiled once and the
+supervisor streams back one JSON line per case so that partial results
+survive a killed session. A batch holds only the case inputs: expected
+outputs never enter this process (``api.sandbox`` compares them), so submitted
+code has nothing to find by walking frames or scanning memory.
+"""
+import ctypes
+import io
+import json
+import os
+import resource
+import select
+import signal
+import sys
+import tempfile
+import time
+import traceback
+
+# Warm the interpreter with the modules submissions use most, so forked
+# children get them for free.
+import bisect, collections, functools, heapq, itertools, math, re, string  # noqa: E401,F401
+
+CLONE_NEWNS = 0x00020000
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWNET = 0x40000000
+MS_RDONLY, MS_NOSUID, MS_NODEV, MS_REMOUNT, MS_BIND, MS_REC, MS_PRIVATE = 1, 2, 4, 32, 4096, 16384, 1 << 18
+PR_SET_NO_NEW_PRIVS = 38
+# Exit status of a child that could not isolate itself and ran nothing.
+EXIT_UNISOLATED = 3
+SYSTEM_PATHS = ('/usr', '/lib', '/lib64', '/lib32', '/bin')
+
+OPTIONS = {'isolation': True, 'uid': 65534, 'gid': 65534, 'expose': []}
+_jail_root = None
+
+
+class IsolationError(Exception):
+    pass
+
+
+def _libc_call(libc, name, *args):
+    if getattr(libc, name)(*args) != 0:
+        errno = ctypes.get_errno()
+        raise IsolationError(f'{name} failed: {os.strerror(errno)}')
+
+
+def _exposed_paths():
+    paths = []
+    for path in [*SYSTEM_PATHS, sys.prefix, sys.base_prefix, sys.exec_prefix, *OPTIONS['expose']]:
+        if os.path.lexists(path) and not any(path == seen or path.startswith(seen.rstrip('/') + '/') for seen in paths):
+            paths.append(path)
+    return paths
+
+
+def _enter_namespaces(libc):
+    uid, gid = os.geteuid(), os.getegid()
+    if uid == 0:
+        _libc_call(libc, 'unshare', CLONE_NEWNS | CLONE_NEWNET)
+        return
+    _libc_call(libc, 'unshare', CLONE_NEWUSER | CLONE_NEWNS | CLONE_NEWNET)
+    # Map only our own ids: the namespace grants capabilities over the new
+    # mount/network namespaces, never over anything the worker could not reach.
+    for name, value in (('setgroups', 'deny'), ('uid_map', f'{uid} {uid} 1'), ('gid_map', f'{gid} {gid} 1')):
+        with open(f'/proc/self/{name}', 'w') as fh:
+            fh.write(value)
+
+
+def _jail(libc, root):
+    """chroot into a fresh tmpfs holding read-only binds of the exposed paths."""
+    _libc_call(libc, 'mount', None, b'/', None, MS_REC | MS_PRIVATE, None)
+    _libc_call(libc, 'mount', b'tmpfs', root.encode(), b'tmpfs', MS_NOSUID | MS_NODEV, b'size=1m,mode=0755')
+    for path in _exposed_paths():
+        target = root + path
+        if os.path.islink(path):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.symlink(os.readlink(path), target)
+            continue
+        os.makedirs(target, exist_ok=True)
+        _libc_call(libc, 'mount', path.encode(), target.encode(), None, MS_BIND | MS_REC, None)
+        _libc_call(libc, 'mount', None, target.encode(), None, MS_REMOUNT | MS_BIND | MS_RDONLY | MS_NOSUID | MS_NODEV, None)
+    os.mkdir(root + '/tmp')
+    os.chroot(root)
+    os.chdir('/tmp')
+
+
+class _CapHeader(ctypes.Structure):
+    _fields_ = [('version', ctypes.c_uint32), ('pid', ctypes.c_int)]
+
+
+class _CapData(ctypes.Structure):
+    _fields_ = [('effective', ctypes.c_uint32), ('permitted', ctypes.c_uint32), ('inheritable', ctypes.c_uint32)]
+
+
+def _drop_privileges(libc):
+    if os.geteuid() == 0:
+        os.setgroups([])
+        os.setresgid(OPTIONS['gid'], OPTIONS['gid'], OPTIONS['gid'])
+        os.setresuid(OPTIONS['uid'], OPTIONS['uid'], OPTIONS['uid'])
+    else:
+        # Capabilities held in our own user namespace (needed for the mounts above).
+        _libc_call(libc, 'capset', ctypes.byref(_CapHeader(0x20080522, 0)), (_CapData * 2)())
+    _libc_call(libc, 'prctl', PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0)
+    if os.geteuid() == 0 or os.getuid() == 0:
+        raise IsolationError('Could not drop root privileges')
+
+
+def isolate():
+    """Move the current (child) process into the sandbox; raises IsolationError if that is not possible."""
+    if not OPTIONS['isolation']:
+        return
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        _enter_namespaces(libc)
+        _jail(libc, _jail_root)
+        _drop_privileges(libc)
+    except (OSError, AttributeError) as exc:
+        raise IsolationError(str(exc)) from exc
+
+
+def _apply_limits(limits, cpu):
+    memory = int(limits['memory_mb']) * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+
+
+def _execute(code, stdin, max_output):
+    stdout, stderr = io.StringIO(), io.StringIO()
+    sys.stdin, sys.stdout, sys.stderr = io.StringIO(stdin), stdout, stderr
+    status = 'ok'
+    started = time.perf_counter()
+    try:
+        exec(code, {'__name__': '__main__'})
+    except SystemExit as exc:
+        if exc.code not in (None, 0):
+            status = 'error'
+    except MemoryError:
+        status = 'memory_limit'
+    except BaseException:
+        status = 'error'
+        exc_type, exc, tb = sys.exc_info()
+        # Drop the sandbox's own frame from the traceback shown to the user.
+        traceback.print_exception(exc_type, exc, tb.tb_next, file=stderr)
+    elapsed = time.perf_counter() - started
+    sys.stdin, sys.stdout, sys.stderr = sys.__stdin__, sys.__stdout__, sys.__stderr__
+    return {
+        'status': status,
+        'stdout': stdout.getvalue()[:max_output],
+        'stderr': stderr.getvalue()[:max_output],
+        'time': round(elapsed, 4),
+    }
+
+
+def _read_until(fd, deadline):
+    """Read until EOF; returns ``(data, finished)`` where ``finished`` is False on timeout."""
+    chunks = []
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return b''.join(chunks), False
+        ready, _, _ = select.select([fd], [], [], remaining)
+        if not ready:
+            return b''.join(chunks), False
+        chunk = os.read(fd, 65536)
+        if not chunk:
+            return b''.join(chunks), True
+        chunks.append(chunk)
+
+
+def _killed(wait_status, usage, cpu):
+    """``(status, message)`` for a process that died without reporting, or None."""
+    if os.WIFEXITED(wait_status):
+        return 'error', f'Process exited with status {os.WEXITSTATUS(wait_status)} before reporting a result'
+    sig = os.WTERMSIG(wait_status)
+    # The hard RLIMIT_CPU limit is enforced with SIGKILL; any other SIGKILL comes from the OOM killer.
+    if sig == signal.SIGXCPU or (sig == signal.SIGKILL and usage.ru_utime + usage.ru_stime >= cpu):
+        return 'timeout', 'CPU time limit exceeded'
+    if sig == signal.SIGKILL:
+        return 'memory_limit', 'Killed after running out of memory'
+    return 'error', f'Killed by signal {signal.Signals(sig).name}'
+
+
+def _run_isolated(code, stdin, limits, cpu, wall):
+    """
+    Run ``code`` in a fresh fork of this (already isolated) process, so no
+    state survives between cases, and enforce the ``cpu`` and ``wall`` second
+    limits from outside it.
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            # Only the result pipe stays open, so the code cannot write to the supervisor's pipe.
+            os.closerange(3, write_fd)
+            os.closerange(write_fd + 1, os.sysconf('SC_OPEN_MAX'))
+            _apply_limits(limits, cpu)
+            try:
+                payload = json.dumps(_execute(code, stdin, limits['max_output'])).encode()
+            except MemoryError:
+                payload = b'{"status": "memory_limit", "stdout": "", "stderr": "", "time": 0}'
+            _write_all(write_fd, payload)
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+    started = time.monotonic()
+    data, finished = _read_until(read_fd, started + wall)
+    os.close(read_fd)
+    if not finished:
+        os.kill(pid, signal.SIGKILL)
+    _, wait_status, usage = os.wait4(pid, 0)
+    if not finished:
+        return {'status': 'timeout', 'stdout': '', 'stderr': 'Time limit exceeded', 'time': wall}
+    if os.WIFEXITED(wait_status) and os.WEXITSTATUS(wait_status) == 0 and data:
+        try:
+            return json.loads(data)
+        except ValueError:
+            pass
+    status, message = _killed(wait_status, usage, cpu)
+    return {'status': status, 'stdout': '', 'stderr': message, 'time': round(time.monotonic() - started, 4)}
+
+
+def _write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def _run_cases(job, pipe):
+    limits = job['limits']
+    try:
+        code = compile(job['code'], '<submission>', 'exec')
+    except SyntaxError:
+        stderr = traceback.format_exc(limit=0)
+        for index in range(len(job['cases'])):
+            line = {'case': index + 1, 'status': 'error', 'stdout': '', 'stderr': stderr, 'time': 0}
+            pipe.write(json.dumps(line).encode() + b'\n')
+        return
+    for index, stdin in enumerate(job['cases'], start=1):
+        seconds = int(limits['case_seconds'])
+        result = _run_isolated(code, stdin, limits, seconds, seconds)
+        pipe.write(json.dumps(dict(result, case=index)).encode() + b'\n')
+        pipe.flush()
+        # Wrong answers are only known to api.sandbox; they stop the batch there.
+        if result['status'] != 'ok' and job.get('stop_on_failure'):
+            return
+
+
+def _run_single(job, pipe):
+    limits = job['limits']
+    try:
+        code = compile(job['code'], '<submission>', 'exec')
+    except SyntaxError:
+        result = {'status': 'error', 'stdout': '', 'stderr': traceback.format_exc(limit=0), 'time': 0}
+    else:
+        result = _run_isolated(code, job.get('stdin', ''), limits, int(limits['cpu_seconds']), limits['wall_seconds'])
+    pipe.write(json.dumps(result).encode())
+
+
+def _child(job, write_fd):
+    """Isolate, then supervise one fresh grandchild per run or test case."""
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    try:
+        isolate()
+    except IsolationError as exc:
+        os.write(write_fd, f'Sandbox isolation failed: {exc}'.encode())
+        os._exit(EXIT_UNISOLATED)
+    resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    with os.fdopen(write_fd, 'wb') as pipe:
+        if 'cases' in job:
+            _run_cases(job, pipe)
+        else:
+            _run_single(job, pipe)
+    os._exit(0)
+
+
+def _batch_result(job, data, finished, wait_status):
+    results = []
+    for line in data.splitlines():
+        try:
+            results.append(json.loads(line))
+        except ValueError:
+            break
+    if not finished:
+        status, message = 'timeout', 'Wall time limit exceeded'
+    elif os.WIFEXITED(wait_status) and os.WEXITSTATUS(wait_status) == EXIT_UNISOLATED:
+        return {'status': 'unavailable', 'stderr': data.decode(errors='replace'), 'cases': [], 'time': 0}
+    elif not os.WIFEXITED(wait_status) or os.WEXITSTATUS(wait_status) != 0:
+        # Submitted code never runs in this process, so its death is an infrastructure fault.
+        status, message = 'unavailable', 'Sandbox process exited unexpectedly'
+    else:
+        status, message = 'ok', ''
+    stopped = bool(results) and results[-1]['status'] != 'ok' and job.get('stop_on_failure')
+    if status == 'timeout' and not stopped and len(results) < len(job['cases']):
+        results.append({'case': len(results) + 1, 'status': status, 'stdout': '', 'stderr': message, 'time': 0})
+    return {
+        'status': status,
+        'stderr': message,
+        'cases': results,
+        'time': round(sum(result['time'] for result in results), 4),
+    }
+
+
+def run_job(job):
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            _child(job, write_fd)
+        finally:
+            os._exit(1)
+    os.close(write_fd)
+    batch = 'cases' in job
+    wall = job['limits']['batch_seconds' if batch else 'wall_seconds']
+    # A second of headroom so the supervisor's own per-run limit fires first.
+    data, finished = _read_until(read_fd, time.monotonic() + float(wall) + 1)
+    os.close(read_fd)
+    if not finished:
+        os.kill(pid, signal.SIGKILL)
+    _, wait_status = os.waitpid(pid, 0)
+    if batch:
+        return _batch_result(job, data, finished, wait_status)
+    if not finished:
+        return {'status': 'timeout', 'stdout': '', 'stderr': 'Wall time limit exceeded', 'time': job['limits']['wall_seconds']}
+    if os.WIFEXITED(wait_status) and os.WEXITSTATUS(wait_status) == EXIT_UNISOLATED:
+        return {'status': 'unavailable', 'stdout': '', 'stderr': data.decode(errors='replace'), 'time': 0}
+    if os.WIFEXITED(wait_status) and os.WEXITSTATUS(wait_status) == 0 and data:
+        return json.loads(data)
+    return {'status': 'unavailable', 'stdout': '', 'stderr': 'Sandbox process exited unexpectedly', 'time': 0}
+
+
+def main():
+    global _jail_root
+    if len(sys.argv) > 1:
+        OPTIONS.update(json.loads(sys.argv[1]))
+    # Mount point of each child's private tmpfs root; stays empty outside the children.
+    _jail_root = tempfile.mkdtemp(prefix='sandbox-root-')
+    try:
+        for line in sys.stdin:
+            if not line.strip():
+                continue
+            result = run_job(json.loads(line))
+            sys.stdout.write(json.dumps(result) + '\n')
+            sys.stdout.flush()
+    finally:
+        os.rmdir(_jail_root)
+
+
+if __name__ == '__main__':
+    main()
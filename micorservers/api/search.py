@@ -0,0 +1,171 @@
+"""
+Inverted index over courses and their lessons.
+
+SQLite uses an FTS5 virtual table and PostgreSQL a ``tsvector`` column with a
+GIN index; both live in ``api_course_search`` (created by migration 0009),
+keyed by course id. Other databases have no index and ``is_available()``
+returns False, in which case callers fall back to ``icontains`` filtering.
+
+Snippets are HTML: the database highlights matches with private-use
+characters, the text is escaped, and only then are they turned into
+``<mark>`` tags, so markup in course content is never passed through.
+"""
+import re
+import threading
+
+from django.db import connection, transaction
+from django.utils.html import escape
+
+from .fields import decompress_text
+
+TABLE = 'api_course_search'
+HIGHLIGHT_START = '\ue000'
+HIGHLIGHT_END = '\ue001'
+_pending = threading.local()
+
+
+def is_available_for(using):
+    return using.vendor in ('sqlite', 'postgresql')
+
+
+def is_available():
+    return is_available_for(connection)
+
+
+def _lessons_text(cursor, course_ids):
+    texts = {course_id: [] for course_id in course_ids}
+    placeholders = ', '.join(['%s'] * len(course_ids))
+    cursor.execute(
+        f'SELECT course_id, title, content FROM api_lesson WHERE course_id IN ({placeholders}) ORDER BY course_id, "order"',
+        list(course_ids),
+    )
+    for course_id, title, content in cursor.fetchall():
+        texts[course_id].append(f'{title}\n{decompress_text(content)}')
+    return {course_id: '\n\n'.join(parts) for course_id, parts in texts.items()}
+
+
+def index_courses(course_ids, using=connection):
+    """(Re)build the index entries of the given courses from the current rows."""
+    course_ids = list(course_ids)
+    if not course_ids or not is_available_for(using):
+        return
+    with using.cursor() as cursor:
+        placeholders = ', '.join(['%s'] * len(course_ids))
+        cursor.execute(
+            f'SELECT c.id, c.title, c.description, c.language, u.username '
+            f'FROM api_course c JOIN auth_user u ON u.id = c.instructor_id WHERE c.id IN ({placeholders})',
+            course_ids,
+        )
+        courses = cursor.fetchall()
+        lessons = _lessons_text(cursor, [row[0] for row in courses])
+        remove_courses(course_ids, using=using)
+        for course_id, title, description, language, instructor in courses:
+            if using.vendor == 'sqlite':
+                cursor.execute(
+                    f'INSERT INTO {TABLE} (rowid, title, description, language, instructor, lessons) '
+                    'VALUES (%s, %s, %s, %s, %s, %s)',
+                    [course_id, title, description, language, instructor, lessons[course_id]],
+                )
+            else:
+                cursor.execute(
+                    f'INSERT INTO {TABLE} (course_id, language, body, document) VALUES (%s, %s, %s, '
+                    "setweight(to_tsvector('english', %s), 'A') || "
+                    "setweight(to_tsvector('english', %s), 'B') || "
+                    "setweight(to_tsvector('english', %s), 'C') || "
+                    "setweight(to_tsvector('simple', %s), 'D'))",
+                    [course_id, language, f'{description}\n\n{lessons[course_id]}',
+                     title, description, lessons[course_id], f'{language} {instructor}'],
+                )
+
+
+def _pending_ids(using):
+    return _pending.__dict__.setdefault(using.alias, set())
+
+
+def index_on_commit(course_ids, using=connection):
+    """
+    Reindex the courses once the current transaction commits, each course
+    once however many writes in the transaction touched it.
+
+    Every call registers a callback, but the first one to run drains the
+    pending set and the others find it empty. Ids left behind by a rolled
+    back transaction are reindexed with the next commit, which is harmless:
+    an entry is always rebuilt from the current rows.
+    """
+    _pending_ids(using).update(course_ids)
+    transaction.on_commit(lambda: _flush_pending(using), using=using.alias)
+
+
+def _flush_pending(using):
+    pending = _pending_ids(using)
+    if pending:
+        course_ids = sorted(pending)
+        pending.clear()
+        index_courses(course_ids, using=using)
+
+
+def highlight(snippet):
+    """HTML for a snippet marked with ``HIGHLIGHT_START``/``HIGHLIGHT_END``."""
+    return escape(snippet).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>')
+
+
+def remove_courses(course_ids, using=connection):
+    course_ids = list(course_ids)
+    if not course_ids or not is_available_for(using):
+        return
+    column = 'rowid' if using.vendor == 'sqlite' else 'course_id'
+    placeholders = ', '.join(['%s'] * len(course_ids))
+    with using.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE {column} IN ({placeholders})', course_ids)
+
+
+def rebuild(batch_size=500, using=connection):
+    with using.cursor() as cursor:
+        cursor.execute('SELECT id FROM api_course ORDER BY id')
+        course_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute(f'DELETE FROM {TABLE}')
+    for start in range(0, len(course_ids), batch_size):
+        index_courses(course_ids[start:start + batch_size], using=using)
+    return len(course_ids)
+
+
+def _terms(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def search_courses(query, language=None, limit=20, offset=0):
+    """
+    Return ``[(course_id, rank, snippet_html), ...]`` best match first. Every word
+    of the query must match, and the last word also matches as a prefix so
+    results update while the user is typing.
+    """
+    terms = _terms(query)
+    if not terms:
+        return []
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            match = ' '.join(f'"{term}"' for term in terms[:-1]) + f' "{terms[-1]}"*'
+            sql = (
+                f'SELECT rowid, bm25({TABLE}, 10.0, 3.0, 1.0, 1.0, 2.0) AS rank, '
+                f"snippet({TABLE}, -1, %s, %s, '…', 16) FROM {TABLE} WHERE {TABLE} MATCH %s"
+            )
+            params = [HIGHLIGHT_START, HIGHLIGHT_END, match.strip()]
+            if language:
+                sql += ' AND lower(language) = lower(%s)'
+                params.append(language)
+            cursor.execute(sql + ' ORDER BY rank LIMIT %s OFFSET %s', params + [limit, offset])
+            # bm25() is lower-is-better; flip it so callers always get higher-is-better.
+            return [(course_id, -rank, highlight(snippet)) for course_id, rank, snippet in cursor.fetchall()]
+
+        tsquery = ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+        sql = (
+            f"SELECT s.course_id, ts_rank_cd(s.document, q) AS rank, "
+            f"ts_headline('english', s.body, q, %s) "
+            f"FROM {TABLE} s, to_tsquery('english', %s) q WHERE s.document @@ q"
+        )
+        params = [f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxWords=24, MinWords=8', tsquery]
+        if language:
+            sql += ' AND lower(s.language) = lower(%s)'
+            params.append(language)
+        cursor.execute(sql + ' ORDER BY rank DESC LIMIT %s OFFSET %s', params + [limit, offset])
+        return [(course_id, rank, highlight(snippet)) for course_id, rank, snippet in cursor.fetchall()]
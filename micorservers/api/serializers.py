@@ -1,12 +1,89 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Course, Lesson, Enrollment, Challenge, Submission, MCQ, LearningPath, UserProgress, CourseReview, Test, TestSubmission, Module, Note, ChatMessage
+from .models import Course, Lesson, Enrollment, Challenge, Submission, MCQ, LearningPath, UserProgress, CourseReview, CourseRatingStats, Test, TestSubmission, Module, Note, ChatMessage
+
+class SparseFieldsMixin:
+    """Limit the serialized fields to a comma-separated ``?fields=`` list on read requests."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return
+        requested = request.query_params.get('fields')
+        if not requested:
+            return
+        allowed = {name.strip() for name in requested.split(',')}
+        for name in set(self.fields) - allowed:
+            self.fields.pop(name)
+
+class BulkPrimaryKeyField(serializers.IntegerField):
+    """Related primary key written straight to ``<field>_id``; existence is checked per batch."""
+
+    def __init__(self, queryset, **kwargs):
+        self.queryset = queryset
+        super().__init__(**kwargs)
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    ``many=True`` writes that check foreign keys with one query per relation
+    (instead of one per item) and persist with a single ``bulk_create``. With
+    ``unique_fields`` in the ``bulk`` context the batch is an upsert and the
+    last item wins for duplicate keys.
+    """
+
+    def validate(self, attrs):
+        for field in self.child.fields.values():
+            if not isinstance(field, BulkPrimaryKeyField):
+                continue
+            ids = {item[field.source] for item in attrs if item.get(field.source) is not None}
+            missing = ids - set(field.queryset.filter(pk__in=ids).values_list('pk', flat=True))
+            if missing:
+                raise serializers.ValidationError({field.field_name: f'Unknown ids: {sorted(missing)}'})
+        return attrs
+
+    def create(self, validated_data):
+        options = self.context.get('bulk', {})
+        model = self.child.Meta.model
+        unique_fields = options.get('unique_fields')
+        if unique_fields:
+            attnames = [model._meta.get_field(name).attname for name in unique_fields]
+            validated_data = list({tuple(item.get(name) for name in attnames): item for item in validated_data}.values())
+            return model.objects.bulk_create(
+                [model(**item) for item in validated_data], batch_size=options.get('batch_size'),
+                update_conflicts=True, unique_fields=unique_fields, update_fields=options['update_fields'],
+            )
+        return model.objects.bulk_create([model(**item) for item in validated_data], batch_size=options.get('batch_size'))
+
+
+class BulkSerializerMixin:
+    """Child side of ``BulkListSerializer`` (set it as the ``Meta.list_serializer_class``)."""
+
+    def _bulk_writing(self):
+        return isinstance(self.parent, BulkListSerializer) and hasattr(self.parent, 'initial_data')
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self._bulk_writing():
+            for name, field in fields.items():
+                if isinstance(field, serializers.PrimaryKeyRelatedField) and not field.read_only:
+                    fields[name] = BulkPrimaryKeyField(
+                        queryset=field.queryset, source=f'{name}_id', required=field.required, allow_null=field.allow_null,
+                    )
+        return fields
+
+    def get_validators(self):
+        # Upserts resolve unique conflicts in the database; per-item unique checks would cost a query each.
+        if self._bulk_writing() and self.context.get('bulk', {}).get('unique_fields'):
+            return []
+        return super().get_validators()
 
 # Example serializer
 class ExampleSerializer(serializers.Serializer):
     message = serializers.CharField(max_length=200)
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     displayName = serializers.SerializerMethodField()
     class Meta:
         model = User
@@ -15,77 +92,90 @@ class UserSerializer(serializers.ModelSerializer):
     def get_displayName(self, obj):
         return obj.get_full_name() or obj.username
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseRatingStatsSerializer(serializers.ModelSerializer):
+    average = serializers.ReadOnlyField()
+    histogram = serializers.ReadOnlyField()
+    class Meta:
+        model = CourseRatingStats
+        fields = ['count', 'average', 'histogram']
+
+class CourseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     instructor = UserSerializer(read_only=True)
+    ratings = CourseRatingStatsSerializer(source='rating_stats', read_only=True)
     class Meta:
         model = Course
         fields = '__all__'
 
-class LessonSerializer(serializers.ModelSerializer):
+class LessonSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Lesson
         fields = '__all__'
 
-class EnrollmentSerializer(serializers.ModelSerializer):
+class EnrollmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Enrollment
         fields = '__all__'
+        read_only_fields = ['progress', 'completed']
 
-class ChallengeSerializer(serializers.ModelSerializer):
+class ChallengeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Challenge
         fields = '__all__'
 
-class SubmissionSerializer(serializers.ModelSerializer):
+class SubmissionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Submission
         fields = '__all__'
 
-class MCQSerializer(serializers.ModelSerializer):
+class MCQSerializer(BulkSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = MCQ
         fields = '__all__'
+        list_serializer_class = BulkListSerializer
 
-class LearningPathSerializer(serializers.ModelSerializer):
+class LearningPathSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = LearningPath
         fields = '__all__'
 
-class UserProgressSerializer(serializers.ModelSerializer):
+class UserProgressSerializer(BulkSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = UserProgress
         fields = '__all__'
+        list_serializer_class = BulkListSerializer
 
-class CourseReviewSerializer(serializers.ModelSerializer):
+class CourseReviewSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     class Meta:
         model = CourseReview
         fields = '__all__'
+        extra_kwargs = {'rating': {'min_value': 1, 'max_value': 5}}
 
-class TestSerializer(serializers.ModelSerializer):
+class TestSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     mcqs = MCQSerializer(many=True, read_only=True)
     class Meta:
         model = Test
         fields = '__all__'
 
-class TestSubmissionSerializer(serializers.ModelSerializer):
+class TestSubmissionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     test = TestSerializer(read_only=True)
     class Meta:
         model = TestSubmission
         fields = '__all__'
 
-class ModuleSerializer(serializers.ModelSerializer):
+class ModuleSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Module
         fields = '__all__'
 
-class NoteSerializer(serializers.ModelSerializer):
+class NoteSerializer(BulkSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Note
         fields = '__all__'
+        list_serializer_class = BulkListSerializer
 
-class ChatMessageSerializer(serializers.ModelSerializer):
+class ChatMessageSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     class Meta:
         model = ChatMessage
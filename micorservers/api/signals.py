@@ -0,0 +1,180 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.db import transaction
+from django.dispatch import receiver
+
+from . import catalog, chat, dashboard, plagiarism, progress, ratings, search
+from .grading import invalidate_answer_keys
+from .models import (
+    MCQ, Challenge, ChatMessage, Course, CourseRatingStats, CourseReview, Enrollment, Lesson, Module, Submission, Test,
+    UserProgress
+)
+
+
+def _tests_using(mcq_id):
+    return list(Test.mcqs.through.objects.filter(mcq_id=mcq_id).values_list('test_id', flat=True))
+
+
+@receiver(m2m_changed, sender=Test.mcqs.through)
+def test_questions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_answer_keys([instance.pk])
+    elif reverse and action in ('post_add', 'post_remove'):
+        invalidate_answer_keys(pk_set)
+    elif reverse and action == 'pre_clear':
+        # After the clear the MCQ no longer knows its tests.
+        invalidate_answer_keys(_tests_using(instance.pk))
+
+
+@receiver(post_save, sender=MCQ)
+@receiver(pre_delete, sender=MCQ)
+def mcq_changed(sender, instance, **kwargs):
+    invalidate_answer_keys(_tests_using(instance.pk))
+
+
+@receiver(post_save, sender=Course)
+def course_created(sender, instance, created, **kwargs):
+    if created:
+        CourseRatingStats.objects.get_or_create(course=instance)
+
+
+# Rating stats
+
+@receiver(pre_save, sender=CourseReview)
+def review_saving(sender, instance, **kwargs):
+    if instance.pk and not hasattr(instance, '_loaded_rating'):
+        # Saved from an instance that was not loaded from the database: read the old rating.
+        instance._loaded_rating = (
+            CourseReview.objects.filter(pk=instance.pk).values_list('course_id', 'rating').first()
+        )
+
+
+@receiver(post_save, sender=CourseReview)
+def review_saved(sender, instance, created, **kwargs):
+    loaded = getattr(instance, '_loaded_rating', None)
+    if created or loaded is None:
+        ratings.record_review(instance)
+    else:
+        ratings.change_review(*loaded, instance)
+    instance._loaded_rating = instance.rating_state()
+
+
+@receiver(post_delete, sender=CourseReview)
+def review_deleted(sender, instance, **kwargs):
+    ratings.remove_review(instance.course_id, instance.rating)
+
+
+# Search index
+
+@receiver(post_save, sender=Course)
+def index_course(sender, instance, **kwargs):
+    search.index_on_commit([instance.pk])
+
+
+@receiver(post_delete, sender=Course)
+def unindex_course(sender, instance, **kwargs):
+    search.remove_courses([instance.pk])
+
+
+@receiver(pre_save, sender=Lesson)
+def lesson_saving(sender, instance, **kwargs):
+    if not hasattr(instance, '_loaded_values'):
+        # Not loaded from the database (new, or built by hand): read what is stored, if anything.
+        stored = Lesson.objects.filter(pk=instance.pk).values(*Lesson.TRACKED_FIELDS).first() if instance.pk else None
+        instance._loaded_values = stored or {}
+
+
+@receiver(post_save, sender=Lesson)
+def index_lesson_course(sender, instance, created, update_fields=None, **kwargs):
+    if created or instance.changed_fields(update_fields):
+        search.index_on_commit({instance.course_id, instance._loaded_values.get('course_id', instance.course_id)})
+
+
+@receiver(post_delete, sender=Lesson)
+def unindex_lesson(sender, instance, **kwargs):
+    search.index_on_commit([instance.course_id])
+
+
+# Catalog cache
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def course_changed(sender, instance, **kwargs):
+    catalog.bump([instance.pk])
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def course_part_changed(sender, instance, **kwargs):
+    # A lesson moved to another course changes the one it left too.
+    catalog.bump([instance.course_id, getattr(instance, '_loaded_values', {}).get('course_id')])
+
+
+@receiver(post_save, sender=Challenge)
+@receiver(post_delete, sender=Challenge)
+@receiver(post_save, sender=MCQ)
+@receiver(post_delete, sender=MCQ)
+def lesson_part_changed(sender, instance, **kwargs):
+    catalog.bump_for_lessons([instance.lesson_id])
+
+
+# Dashboard cache
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+@receiver(post_save, sender=UserProgress)
+@receiver(post_delete, sender=UserProgress)
+def learning_activity_changed(sender, instance, **kwargs):
+    dashboard.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=Submission)
+def submission_created(sender, instance, created, **kwargs):
+    if created:
+        dashboard.invalidate(instance.user_id)
+        plagiarism.index_submissions([instance])
+
+
+# Enrollment progress
+
+@receiver(post_save, sender=Lesson)
+def lesson_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        progress.change_lesson_count(instance.course_id, 1)
+    elif 'course_id' in instance.changed_fields(update_fields):
+        progress.move_lesson(instance.pk, instance._loaded_values['course_id'], instance.course_id)
+
+
+@receiver(post_delete, sender=Lesson)
+def lesson_deleted(sender, instance, **kwargs):
+    progress.change_lesson_count(instance.course_id, -1)
+
+
+@receiver(post_save, sender=UserProgress)
+def user_progress_saved(sender, instance, created, **kwargs):
+    if created or hasattr(instance, '_loaded_state'):
+        progress.change_progress(None if created else instance._loaded_state, instance)
+    else:
+        # Saved from an instance that was not loaded from the database: old state unknown.
+        progress.refresh_enrollments(Enrollment.objects.filter(user_id=instance.user_id, course__lessons__id=instance.lesson_id))
+    instance._loaded_state = instance.progress_state()
+
+
+@receiver(post_delete, sender=UserProgress)
+def user_progress_deleted(sender, instance, **kwargs):
+    progress.remove_progress(instance)
+
+
+@receiver(post_save, sender=Enrollment)
+def enrollment_created(sender, instance, created, **kwargs):
+    if created:
+        progress.refresh_enrollments(Enrollment.objects.filter(pk=instance.pk))
+
+
+# Chat fan-out
+
+@receiver(post_save, sender=ChatMessage)
+def chat_message_created(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: chat.publish_message(instance))
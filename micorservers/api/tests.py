@@ -1,3 +1,1295 @@
-from django.test import TestCase
+import asyncio
+import bisect
+import gzip
+import json
+import os
+import runpy
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from types import SimpleNamespace
+from unittest import SkipTest, mock
+
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings as django_settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from .models import (
+    Course, Lesson, Enrollment, Challenge, Submission, MCQ, LearningPath, UserProgress, CourseReview, Test, TestSubmission,
+    Module, Note, ChatMessage, GradingJob, CourseRatingStats, CourseTrend, PDFIngestJob, SubmissionBucket, SubmissionSignature
+)
+from . import chat, grading, ingest, metrics, plagiarism, progress, ratings, recommendations, sandbox, sandbox_worker, search
+from .pagination import KeysetPagination
+from .views import CourseLessonsView, CourseListView, LessonListView, TestSubmissionBulkGradeView
+
+
+def count_queries(action):
+    """Call ``action`` and return its result with the number of queries it issued."""
+    with CaptureQueriesContext(connection) as queries:
+        result = action()
+    return result, len(queries)
+
+
+class ListQueryCountTests(APITestCase):
+    """List endpoints must issue the same number of queries however many rows they return."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='pass', is_staff=True)
+        self.client.force_authenticate(self.user)
+        self.course = None
+        self.lesson = None
+        self.rows = 0
+
+    def seed(self, count):
+        for _ in range(count):
+            self.rows += 1
+            n = self.rows
+            user = User.objects.create_user(username=f'user{n}')
+            course = Course.objects.create(title=f'Course {n}', description='d', instructor=user)
+            self.course = self.course or course
+            lesson = Lesson.objects.create(course=self.course, title=f'Lesson {n}', content='c', order=n)
+            self.lesson = self.lesson or lesson
+            Enrollment.objects.create(user=user, course=course)
+            challenge = Challenge.objects.create(lesson=lesson, title='c', description='d', expected_output='', order=n)
+            Submission.objects.create(user=self.user, challenge=challenge, code='print(1)', language='python')
+            mcq = MCQ.objects.create(lesson=self.lesson, question='q', options=['a', 'b'], answer='a')
+            path = LearningPath.objects.create(user=user)
+            path.courses.add(course)
+            UserProgress.objects.create(user=user, lesson=lesson)
+            CourseReview.objects.create(user=user, course=course, rating=5)
+            test = Test.objects.create(course=course, title='t')
+            test.mcqs.add(mcq)
+            TestSubmission.objects.create(user=user, test=test)
+            Module.objects.create(course=course, title='m', order=n)
+            Note.objects.create(user=user, lesson=lesson, content='n')
+            ChatMessage.objects.create(course=course, user=user, message='hi')
+
+    def urls(self):
+        return [
+            reverse('user-list'),
+            reverse('course-list'),
+            reverse('course-search'),
+            reverse('course-challenges', args=[self.course.pk]),
+            reverse('course-lessons', args=[self.course.pk]),
+            reverse('lesson-list'),
+            reverse('lesson-mcqs', args=[self.lesson.pk]),
+            reverse('enrollment-list'),
+            reverse('challenge-list'),
+            reverse('submission-list'),
+            reverse('user-submissions'),
+            reverse('mcq-list'),
+            reverse('learningpath-list'),
+            reverse('userprogress-list'),
+            reverse('course-review-list-create', args=[self.course.pk]),
+            reverse('test-list-create', args=[self.course.pk]),
+            reverse('testsubmission-list-create', args=[1]),
+            reverse('module-list'),
+            reverse('note-list'),
+            reverse('chatmessage-list'),
+        ]
+
+    def get(self, url):
+        cache.clear()  # measure the database path, not the catalog cache
+        response, queries = count_queries(lambda: self.client.get(url))
+        self.assertEqual(response.status_code, 200, url)
+        return queries
+
+    def test_list_endpoints_use_constant_queries(self):
+        self.seed(1)
+        baseline = {url: self.get(url) for url in self.urls()}
+        self.seed(5)
+        for url, expected in baseline.items():
+            with self.subTest(url=url):
+                self.assertEqual(self.get(url), expected)
+
+
+class MetricsTests(APITestCase):
+    """The middleware records every request per route; the endpoint renders them in the Prometheus text format."""
+
+    def setUp(self):
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+        self.admin = User.objects.create_user(username='admin', is_staff=True)
+        self.course = Course.objects.create(title='Course', description='d', instructor=self.admin)
+        self.route = '/api/courses/<int:course_id>/lessons/'
+
+    def stats(self, method, route):
+        return metrics.registry._routes[(method, route)]
+
+    def test_records_latency_queries_and_size(self):
+        url = reverse('course-lessons', args=[self.course.pk])
+        cache.clear()
+        response, queries = count_queries(lambda: self.client.get(url))
+        self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        stats = self.stats('GET', self.route)
+        self.assertEqual((stats.count, stats.statuses), (2, {'2xx': 1, '3xx': 1}))
+        self.assertEqual(stats.queries, queries)
+        self.assertEqual(stats.response_bytes, len(response.content))
+        self.assertEqual(sum(stats.buckets), 2)
+        self.assertGreater(stats.latency, 0)
+        self.client.get('/api/no-such-route/')
+        self.assertEqual(self.stats('GET', 'unmatched').statuses, {'4xx': 1})
+
+    def test_exposition_format(self):
+        url = reverse('course-lessons', args=[self.course.pk])
+        for _ in range(3):
+            self.client.get(url)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        lines = response.content.decode().splitlines()
+        labels = f'method="GET",route="{self.route}"'
+        self.assertIn(f'api_requests_total{{{labels},status="2xx"}} 3', lines)
+        self.assertIn(f'api_request_duration_seconds_bucket{{{labels},le="+Inf"}} 3', lines)
+        self.assertIn(f'api_request_duration_seconds_count{{{labels}}} 3', lines)
+        buckets = [int(line.rsplit(' ', 1)[1]) for line in lines if line.startswith(f'api_request_duration_seconds_bucket{{{labels}')]
+        self.assertEqual((len(buckets), buckets), (len(metrics.BUCKETS) + 1, sorted(buckets)))
+        for name in ('api_requests_total', 'api_request_duration_seconds', 'api_db_queries_total', 'api_response_size_bytes_total'):
+            self.assertIn(f'# TYPE {name} ' + ('histogram' if name == 'api_request_duration_seconds' else 'counter'), lines)
+        # Label values are escaped.
+        metrics.registry.observe('GET', 'a"b\\c', 200, 0.01, 0, 0.0, 0)
+        self.assertIn('route="a\\"b\\\\c"', metrics.registry.render())
+
+    def test_quantiles(self):
+        stats = metrics.RouteStats()
+        self.assertEqual(stats.quantile(0.5), 0.0)
+        for duration in [0.003] * 90 + [0.3] * 10:
+            stats.count += 1
+            stats.buckets[bisect.bisect_left(metrics.BUCKETS, duration)] += 1
+        self.assertLessEqual(stats.quantile(0.5), 0.005)
+        self.assertTrue(0.25 < stats.quantile(0.95) <= 0.5)
+
+
+class BulkWriteQueryCountTests(APITestCase):
+    """Bulk endpoints must issue the same number of queries however many items they write."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='pass')
+        self.client.force_authenticate(self.user)
+        course = Course.objects.create(title='Course', description='d', instructor=self.user)
+        self.lessons = [Lesson.objects.create(course=course, title=f'Lesson {n}', content='c', order=n) for n in range(20)]
+        self.enrollment = Enrollment.objects.create(user=self.user, course=course)
+
+    def post(self, name, items):
+        response, queries = count_queries(lambda: self.client.post(reverse(name), items, format='json'))
+        self.assertEqual(response.status_code, 201, response.data)
+        return queries
+
+    def test_bulk_endpoints_use_constant_queries(self):
+        cases = {
+            'userprogress-bulk-upsert': lambda lesson: {'lesson': lesson.pk, 'completed': True},
+            'note-bulk-create': lambda lesson: {'lesson': lesson.pk, 'content': 'n'},
+            'mcq-bulk-create': lambda lesson: {'lesson': lesson.pk, 'question': 'q', 'options': ['a'], 'answer': 'a'},
+        }
+        for name, item in cases.items():
+            with self.subTest(name=name):
+                few = self.post(name, [item(lesson) for lesson in self.lessons[:2]])
+                self.assertEqual(self.post(name, [item(lesson) for lesson in self.lessons]), few)
+
+    def test_progress_upsert_updates_rows_and_enrollment(self):
+        self.post('userprogress-bulk-upsert', [{'lesson': lesson.pk, 'completed': False} for lesson in self.lessons])
+        self.post('userprogress-bulk-upsert', [{'lesson': lesson.pk, 'completed': True} for lesson in self.lessons[:5]])
+        self.assertEqual(UserProgress.objects.filter(user=self.user).count(), 20)
+        self.assertEqual(UserProgress.objects.filter(user=self.user, completed=True).count(), 5)
+        self.enrollment.refresh_from_db()
+        self.assertEqual((self.enrollment.completed_lessons, self.enrollment.progress), (5, 25.0))
+
+
+class PaginationTests(APITestCase):
+    """Cursor pages cover every row exactly once, even when the ordering key is shared."""
+
+    def test_ties_on_ordering_key(self):
+        instructor = User.objects.create_user(username='instructor')
+        course = Course.objects.create(title='Course', description='d', instructor=instructor)
+        lessons = Lesson.objects.bulk_create(
+            Lesson(course=course, title=f'Lesson {index}', content='c', order=1) for index in range(7)
+        )
+        url, seen = reverse('course-lessons', args=[course.pk]) + '?page_size=2', []
+        while url:
+            page = self.client.get(url).data
+            seen += [lesson['id'] for lesson in page['results']]
+            url = page['next']
+        self.assertEqual(seen, sorted(lesson.pk for lesson in lessons))
+
+    def test_unique_tiebreaker(self):
+        request = Request(APIRequestFactory().get('/'))
+        for view, ordering in [
+            (CourseLessonsView(), ('order', 'id')),
+            (CourseListView(), ('-created_at', '-id')),
+            (LessonListView(), ('-id',)),
+        ]:
+            with self.subTest(view=type(view).__name__):
+                self.assertEqual(KeysetPagination().get_ordering(request, Lesson.objects.all(), view), ordering)
+
+
+class CourseExportTests(APITestCase):
+    """Exports stream every row of the course in a fixed number of queries."""
+
+    def setUp(self):
+        self.instructor = User.objects.create_user(username='instructor')
+        self.client.force_authenticate(self.instructor)
+        self.course = Course.objects.create(title='Course', description='d', instructor=self.instructor)
+        lesson = Lesson.objects.create(course=self.course, title='Lesson', content='c', order=1)
+        self.challenge = Challenge.objects.create(lesson=lesson, title='c', description='d', expected_output='', order=1)
+
+    def export(self, fmt):
+        def read():
+            response = self.client.get(reverse('course-export', args=[self.course.pk, 'submissions', fmt]))
+            self.assertEqual(response.status_code, 200)
+            return b''.join(response.streaming_content).decode()
+
+        body, queries = count_queries(read)
+        return body.splitlines(), queries
+
+    def test_submissions_export(self):
+        for _ in range(3):
+            Submission.objects.create(user=self.instructor, challenge=self.challenge, code='x', language='python')
+        lines, few = self.export('csv')
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[0].startswith('id,user,username,'))
+        for _ in range(20):
+            Submission.objects.create(user=self.instructor, challenge=self.challenge, code='x', language='python')
+        lines, many = self.export('ndjson')
+        self.assertEqual((len(lines), many), (23, few))
+
+    def test_requires_instructor(self):
+        self.client.force_authenticate(User.objects.create_user(username='student'))
+        response = self.client.get(reverse('course-export', args=[self.course.pk, 'progress', 'csv']))
+        self.assertEqual(response.status_code, 403)
+
+
+class LessonContentTests(APITestCase):
+    """Large lesson bodies are stored compressed and served compressed with validators."""
+
+    def setUp(self):
+        user = User.objects.create_user(username='instructor')
+        course = Course.objects.create(title='Course', description='d', instructor=user)
+        self.text = 'Python variables hold references to objects. ' * 500
+        self.lesson = Lesson.objects.create(course=course, title='Lesson', content=self.text, order=1)
+
+    def test_content_round_trip(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT content FROM api_lesson WHERE id = %s', [self.lesson.pk])
+            self.assertLess(len(cursor.fetchone()[0]), len(self.text) // 10)
+        self.assertEqual(Lesson.objects.get(pk=self.lesson.pk).content, self.text)
+
+    def test_body_endpoint(self):
+        url = reverse('lesson-content', args=[self.lesson.pk])
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content).decode(), self.text)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        # The identity body is different bytes, so it has its own strong ETag.
+        identity = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((identity.status_code, identity.content.decode()), (200, self.text))
+        self.assertNotEqual(identity['ETag'], etag)
+
+
+class CourseOutlineTests(APITestCase):
+    """The outline is built in a fixed number of queries and rebuilt after edits."""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='instructor')
+        self.course = Course.objects.create(title='Course', description='d', instructor=user)
+        self.module = Module.objects.create(course=self.course, title='m', order=1)
+        self.url = reverse('course-outline', args=[self.course.pk])
+
+    def add_lessons(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            for n in range(count):
+                lesson = Lesson.objects.create(course=self.course, module=self.module, title='l', content='c', order=n)
+                Challenge.objects.create(lesson=lesson, title='c', description='d', expected_output='', order=n)
+                MCQ.objects.create(lesson=lesson, question='q', options=['a', 'b'], answer='a')
+
+    def outline(self):
+        response, queries = count_queries(lambda: self.client.get(self.url))
+        self.assertEqual(response.status_code, 200)
+        return response.data, queries
+
+    def test_constant_queries_and_invalidation(self):
+        self.add_lessons(2)
+        data, few = self.outline()
+        self.assertEqual(len(data['modules'][0]['lessons']), 2)
+        self.assertNotIn('answer', data['modules'][0]['lessons'][0]['mcqs'][0])
+        self.assertEqual(self.outline()[1], 0)
+        self.add_lessons(10)
+        data, many = self.outline()
+        self.assertEqual((len(data['modules'][0]['lessons']), many), (12, few))
+        with self.captureOnCommitCallbacks(execute=True):
+            Challenge.objects.filter(lesson__course=self.course).first().delete()
+        data, _ = self.outline()
+        self.assertEqual(sum(len(lesson['challenges']) for lesson in data['modules'][0]['lessons']), 11)
+
+
+class CatalogCacheTests(APITestCase):
+    """Catalog reads are served from cache until a write bumps the course's version."""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='instructor')
+        self.course = Course.objects.create(title='Course', description='d', instructor=user)
+
+    def get(self, url, **headers):
+        return count_queries(lambda: self.client.get(url, **headers))
+
+    def test_versioned_reads(self):
+        url = reverse('course-lessons', args=[self.course.pk])
+        first, _ = self.get(url)
+        self.assertIn('max-age', first['Cache-Control'])
+        self.assertEqual(self.get(url)[1], 0)
+        response, queries = self.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual((response.status_code, queries), (304, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            Lesson.objects.create(course=self.course, title='New', content='c', order=1)
+        response, _ = self.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertEqual([lesson['title'] for lesson in response.data['results']], ['New'])
+        self.assertIn('Accept', response['Vary'])
+
+    def test_bulk_maintenance_invalidates(self):
+        url = reverse('course-detail', args=[self.course.pk])
+        etag = self.client.get(url)['ETag']
+        Course.objects.filter(pk=self.course.pk).update(lesson_count=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            progress.reconcile()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        CourseReview.objects.bulk_create([CourseReview(course=self.course, user=self.course.instructor, rating=5)])
+        with self.captureOnCommitCallbacks(execute=True):
+            ratings.rebuild_rating_stats()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.data['ratings']['count']), (200, 1))
+
+
+class ProgressCounterTests(APITestCase):
+    """Lesson counts and enrollment progress follow lessons and progress rows as they change."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='student')
+        self.python = Course.objects.create(title='Python', description='d', instructor=self.user)
+        self.rust = Course.objects.create(title='Rust', description='d', instructor=self.user)
+        self.lessons = [Lesson.objects.create(course=self.python, title=f'L{n}', content='c', order=n) for n in range(4)]
+        Lesson.objects.create(course=self.rust, title='R0', content='c', order=0)
+        for course in (self.python, self.rust):
+            Enrollment.objects.create(user=self.user, course=course)
+
+    def state(self, course):
+        course.refresh_from_db()
+        enrollment = Enrollment.objects.get(user=self.user, course=course)
+        return course.lesson_count, enrollment.completed_lessons, enrollment.progress, enrollment.completed
+
+    def test_progress_and_lesson_changes(self):
+        for lesson in self.lessons[:2]:
+            UserProgress.objects.create(user=self.user, lesson=lesson, completed=True)
+        self.assertEqual(self.state(self.python), (4, 2, 50.0, False))
+        row = UserProgress.objects.get(lesson=self.lessons[0])
+        row.completed = False
+        row.save()
+        self.assertEqual(self.state(self.python), (4, 1, 25.0, False))
+        self.lessons[3].delete()
+        self.lessons[2].delete()
+        self.assertEqual(self.state(self.python), (2, 1, 50.0, False))
+        row.completed = True
+        row.save()
+        self.assertEqual(self.state(self.python), (2, 2, 100.0, True))
+
+    def test_moving_a_lesson(self):
+        UserProgress.objects.create(user=self.user, lesson=self.lessons[0], completed=True)
+        lesson = Lesson.objects.get(pk=self.lessons[0].pk)
+        lesson.course = self.rust
+        lesson.save()
+        self.assertEqual(self.state(self.python), (3, 0, 0.0, False))
+        self.assertEqual(self.state(self.rust), (2, 1, 50.0, False))
+        # So does a partially loaded instance saved with update_fields.
+        lesson = Lesson.objects.only('id', 'course').get(pk=lesson.pk)
+        lesson.course_id = self.python.pk
+        lesson.save(update_fields=['course'])
+        self.assertEqual((self.state(self.python), self.state(self.rust)), ((4, 1, 25.0, False), (1, 0, 0.0, False)))
+
+
+class SearchTests(APITestCase):
+    """Ranked course search and the index maintenance behind it."""
+
+    def setUp(self):
+        if not search.is_available():
+            self.skipTest('No search index on this database')
+        self.instructor = User.objects.create_user(username='instructor')
+
+    def course(self, title, lesson='', **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            course = Course.objects.create(title=title, description='d', instructor=self.instructor, **fields)
+            if lesson:
+                Lesson.objects.create(course=course, title='Lesson', content=lesson, order=1)
+        return course
+
+    def titles(self, **params):
+        response = self.client.get(reverse('course-search'), params)
+        self.assertEqual(response.status_code, 200)
+        return [course['title'] for course in response.data['results']]
+
+    def test_ranking(self):
+        self.course('Cooking basics', lesson='We also touch on recursion once.')
+        self.course('Recursion in depth', lesson='Recursion, recursive functions and recursion limits.')
+        self.course('Gardening')
+        self.assertEqual(self.titles(search='recursion'), ['Recursion in depth', 'Cooking basics'])
+        self.assertEqual(self.titles(search='recur'), ['Recursion in depth', 'Cooking basics'])
+        self.assertEqual(self.titles(search='recursion depth'), ['Recursion in depth'])
+
+    def test_limit_validation(self):
+        self.course('Python')
+        for limit in ('0', '-4', '101', 'x'):
+            with self.subTest(limit=limit):
+                self.assertEqual(self.client.get(reverse('course-search'), {'search': 'python', 'limit': limit}).status_code, 400)
+        self.assertEqual(self.titles(search='python', limit=1), ['Python'])
+
+    def test_reindexes_once_and_only_on_relevant_changes(self):
+        course = self.course('Python', lesson='Loops')
+        lesson = Lesson.objects.get(course=course)
+        with mock.patch.object(search, 'index_courses', wraps=search.index_courses) as index:
+            with self.captureOnCommitCallbacks(execute=True):
+                lesson.order = 2
+                lesson.save()
+            self.assertEqual(index.call_count, 0)
+            with self.captureOnCommitCallbacks(execute=True):
+                lesson.content = 'Generators'
+                lesson.save()
+                lesson.title = 'Iteration'
+                lesson.save()
+            self.assertEqual(index.call_count, 1)
+        self.assertEqual(self.titles(search='generators'), ['Python'])
+        self.assertEqual(self.titles(search='loops'), [])
+
+    def test_snippet_escapes_markup(self):
+        self.course('Intro', lesson='<img src=x onerror=alert(1)> recursion & "quotes"')
+        response = self.client.get(reverse('course-search'), {'search': 'recursion'})
+        snippet = response.data['results'][0]['snippet']
+        self.assertIn('<mark>recursion</mark>', snippet.lower())
+        self.assertIn('&lt;img src=x onerror=alert(1)&gt;', snippet)
+        self.assertNotIn('<img', snippet)
+
+    def test_rolled_back_writes_are_not_indexed(self):
+        course = self.course('Python', lesson='Loops')
+        lesson = Lesson.objects.get(course=course)
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    lesson.content = 'Generators'
+                    lesson.save()
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+            Course.objects.create(title='Rust', description='d', instructor=self.instructor)
+        self.assertEqual(self.titles(search='loops'), ['Python'])
+        self.assertEqual(self.titles(search='generators'), [])
+        self.assertEqual(self.titles(search='rust'), ['Rust'])
+
+
+class RatingStatsTests(APITestCase):
+    """Course rating stats follow every review write, whichever path makes it."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='student')
+        self.client.force_authenticate(self.user)
+        self.course = Course.objects.create(title='Course', description='d', instructor=self.user)
+        self.other = Course.objects.create(title='Other', description='d', instructor=self.user)
+
+    def stats(self, course):
+        stats = CourseRatingStats.objects.get(course=course)
+        return stats.count, stats.total, {stars: n for stars, n in stats.histogram.items() if n}
+
+    def test_review_views(self):
+        response = self.client.post(reverse('course-review-list-create', args=[self.course.pk]), {'course': self.course.pk, 'rating': 4})
+        url = reverse('course-review-detail', args=[response.data['id']])
+        self.assertEqual(self.stats(self.course), (1, 4, {'4': 1}))
+        self.client.patch(url, {'rating': 2})
+        self.assertEqual(self.stats(self.course), (1, 2, {'2': 1}))
+        self.client.patch(url, {'course': self.other.pk})
+        self.assertEqual((self.stats(self.course), self.stats(self.other)), ((0, 0, {}), (1, 2, {'2': 1})))
+        self.client.delete(url)
+        self.assertEqual(self.stats(self.other), (0, 0, {}))
+
+    def test_model_writes_and_cascades(self):
+        reviewer = User.objects.create_user(username='reviewer')
+        CourseReview.objects.create(course=self.course, user=self.user, rating=5)
+        review = CourseReview.objects.create(course=self.course, user=reviewer, rating=3)
+        review = CourseReview.objects.only('rating').get(pk=review.pk)
+        review.rating = 1
+        review.save()
+        self.assertEqual(self.stats(self.course), (2, 6, {'1': 1, '5': 1}))
+        reviewer.delete()
+        self.assertEqual(self.stats(self.course), (1, 5, {'5': 1}))
+        self.course.delete()
+        self.assertFalse(CourseRatingStats.objects.filter(course_id=self.course.pk).exists())
+
+    def test_load_seed_rebuilds_stats_and_search(self):
+        call_command(
+            'seed_demo', mode='load', users=3, courses=2, lessons_per_course=1, submissions_per_user=0,
+            chat_messages_per_course=0, reviews_per_course=4, stdout=StringIO(),
+        )
+        for course in Course.objects.filter(title__startswith='Course '):
+            reviews = CourseReview.objects.filter(course=course)
+            self.assertEqual(self.stats(course)[:2], (reviews.count(), sum(reviews.values_list('rating', flat=True))))
+        if search.is_available():
+            self.assertEqual(len(search.search_courses('generated')), 2)
+
+
+class DashboardCacheTests(APITestCase):
+    """Landing page payloads are cached per user and dropped after that user's learning activity commits."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='student')
+        self.other = User.objects.create_user(username='other')
+        self.client.force_authenticate(self.user)
+        course = Course.objects.create(title='Course', description='d', instructor=self.other)
+        self.lessons = [Lesson.objects.create(course=course, title=f'l{n}', content='c', order=n) for n in range(2)]
+        self.enrollment = Enrollment.objects.create(user=self.user, course=course)
+
+    def get(self, name):
+        response, queries = count_queries(lambda: self.client.get(reverse(name)))
+        self.assertEqual(response.status_code, 200)
+        return response.data, queries
+
+    def test_cache_hit(self):
+        for name in ('user-stats', 'home-overview'):
+            with self.subTest(name=name):
+                first, queries = self.get(name)
+                self.assertGreater(queries, 0)
+                self.assertEqual(self.get(name), (first, 0))
+
+    def test_fresh_payload_after_activity(self):
+        self.assertEqual(self.get('user-stats')[0]['completed_lessons'], 0)
+        self.assertIsNone(self.get('home-overview')[0]['most_recent'])
+        with self.captureOnCommitCallbacks(execute=True):
+            UserProgress.objects.create(user=self.user, lesson=self.lessons[0], completed=True)
+        self.assertEqual(self.get('user-stats')[0]['completed_lessons'], 1)
+        overview = self.get('home-overview')[0]
+        self.assertEqual((overview['most_recent']['lesson']['id'], overview['most_recent']['progress']), (self.lessons[0].pk, 50.0))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('userprogress-bulk-upsert'), [{'lesson': self.lessons[1].pk, 'completed': True}], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.get('user-stats')[0], {'completed_courses': 1, 'completed_lessons': 2})
+
+    def test_only_committed_writes_of_the_user_invalidate(self):
+        stats, _ = self.get('user-stats')
+        with self.captureOnCommitCallbacks(execute=True):
+            UserProgress.objects.create(user=self.other, lesson=self.lessons[0], completed=True)
+        self.assertEqual(self.get('user-stats'), (stats, 0))
+        with self.captureOnCommitCallbacks(execute=False):
+            UserProgress.objects.create(user=self.user, lesson=self.lessons[0], completed=True)
+        # Not committed yet: another request must not see (or cache) the new state.
+        self.assertEqual(self.get('user-stats'), (stats, 0))
+
+
+class RecommendationTests(APITestCase):
+    """Trending and co-enrollment tables are ranked offline and read by home_overview."""
+
+    def setUp(self):
+        cache.clear()
+        self.instructor = User.objects.create_user(username='instructor')
+        self.courses = {
+            name: Course.objects.create(title=name, description='d', instructor=self.instructor) for name in 'ABCD'
+        }
+        self.users = [User.objects.create_user(username=f'user{n}') for n in range(4)]
+
+    def enroll(self, user, *names):
+        for name in names:
+            Enrollment.objects.create(user=user, course=self.courses[name])
+
+    def ids(self, *names):
+        return [self.courses[name].pk for name in names]
+
+    def test_trending_ranking(self):
+        self.enroll(self.users[0], 'A')
+        lesson = Lesson.objects.create(course=self.courses['B'], title='l', content='c', order=1)
+        challenge = Challenge.objects.create(lesson=lesson, title='c', description='d', expected_output='', order=1)
+        for user in self.users:
+            Submission.objects.create(user=user, challenge=challenge, code='x', language='python')
+        self.enroll(self.users[1], 'C')
+        Enrollment.objects.filter(course=self.courses['C']).update(enrolled_at=timezone.now() - timedelta(days=30))
+        self.assertEqual(recommendations.compute_trending(window_days=7), 2)
+        self.assertEqual(recommendations.trending_course_ids(10), self.ids('B', 'A'))
+        trend = CourseTrend.objects.get(course=self.courses['A'])
+        self.assertEqual((trend.enrollments, trend.submissions, trend.score), (1, 0, 3 / 7))
+        self.assertEqual(recommendations.trending_course_ids(10, exclude=self.ids('B')), self.ids('A'))
+
+    def test_similarity(self):
+        for user in self.users[:3]:
+            self.enroll(user, 'A', 'B')
+        for user in self.users[:2]:
+            self.enroll(user, 'C')
+        self.enroll(self.users[3], 'A', 'D')
+        similar = recommendations.similar_courses(min_common=2)
+        a, b, c, _ = self.ids('A', 'B', 'C', 'D')
+        self.assertEqual([course_id for course_id, _ in similar[a]], [b, c])
+        self.assertAlmostEqual(similar[a][0][1], 3 / (4 * 3) ** 0.5, places=5)
+        self.assertAlmostEqual(similar[a][1][1], 2 / (4 * 2) ** 0.5, places=5)
+        self.assertNotIn(self.courses['D'].pk, similar)
+        if recommendations.sparse is not None:
+            with mock.patch.object(recommendations, 'sparse', None):
+                fallback = recommendations.similar_courses(min_common=2)
+            self.assertEqual(fallback.keys(), similar.keys())
+            for course_id, others in similar.items():
+                self.assertEqual([other for other, _ in fallback[course_id]], [other for other, _ in others])
+
+    def test_home_overview(self):
+        for user in self.users[:3]:
+            self.enroll(user, 'A', 'B')
+        for user in self.users[:2]:
+            self.enroll(user, 'C')
+        self.enroll(self.users[3], 'A', 'D')
+        recommendations.compute_trending()
+        recommendations.compute_similarities(min_common=2)
+        self.client.force_authenticate(self.users[3])
+        data = self.client.get(reverse('home-overview')).data
+        # B and C are co-enrolled with A; trending courses top the list up, never repeating an enrolled one.
+        self.assertEqual([course['id'] for course in data['recommended']][:2], self.ids('B', 'C'))
+        self.assertTrue(set(self.ids('A', 'D')).isdisjoint(course['id'] for course in data['recommended']))
+        self.assertEqual([course['id'] for course in data['trending']], self.ids('A', 'B', 'C', 'D'))
+
+    def test_empty_tables_fall_back_to_newest_courses(self):
+        self.enroll(self.users[0], 'D')
+        self.client.force_authenticate(self.users[0])
+        data = self.client.get(reverse('home-overview')).data
+        self.assertEqual([course['id'] for course in data['trending']], self.ids('D', 'C', 'B', 'A'))
+        self.assertEqual([course['id'] for course in data['recommended']], self.ids('C', 'B', 'A'))
+        self.assertEqual(data['trending'][0]['progress'], 0.0)
+
+
+class ChatSyncTests(APITestCase):
+    """Incremental chat sync returns what changed after the cursor and a 304 when nothing did."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='student')
+        self.client.force_authenticate(self.user)
+        self.course = Course.objects.create(title='Course', description='d', instructor=self.user)
+        self.messages = [ChatMessage.objects.create(course=self.course, user=self.user, message=f'm{n}') for n in range(3)]
+
+    def sync(self, etag=None, **params):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(reverse('chatmessage-list'), {'course': self.course.pk, **params}, **headers)
+
+    def test_cursor_and_limits(self):
+        data = self.sync(after=0, limit=2).data
+        self.assertEqual([message['message'] for message in data['messages']], ['m0', 'm1'])
+        self.assertEqual((data['cursor'], data['has_more']), (self.messages[1].pk, True))
+        data = self.sync(after=data['cursor']).data
+        self.assertEqual(([message['message'] for message in data['messages']], data['has_more']), (['m2'], False))
+        for limit in ('0', '-1'):
+            response = self.sync(after=0, limit=limit)
+            self.assertEqual((response.status_code, len(response.data['messages'])), (200, 1))
+        self.assertEqual(self.sync(after='x').status_code, 400)
+
+    def test_etag_tracks_new_and_edited_messages(self):
+        etag = self.sync(after=0)['ETag']
+        self.assertEqual(self.sync(etag, after=0).status_code, 304)
+        self.client.patch(reverse('chatmessage-detail', args=[self.messages[0].pk]), {'message': 'edited'})
+        response = self.sync(etag, after=0)
+        self.assertEqual((response.status_code, response.data['messages'][0]['message']), (200, 'edited'))
+        etag = response['ETag']
+        ChatMessage.objects.create(course=self.course, user=self.user, message='m3')
+        self.assertEqual(self.sync(etag, after=0).status_code, 200)
+
+
+@override_settings(CHAT=dict(chat.DEFAULTS, BATCH_INTERVAL=0.05, QUEUE_SIZE=2))
+class ChatSocketTests(TransactionTestCase):
+    """Course chat over the raw ASGI WebSocket protocol: who may join, backfill, fan-out and batching."""
+
+    def setUp(self):
+        broker = mock.patch.object(chat, '_broker', None)
+        broker.start()
+        self.addCleanup(broker.stop)
+        self.instructor = User.objects.create_user(username='instructor')
+        self.student = User.objects.create_user(username='student')
+        self.outsider = User.objects.create_user(username='outsider')
+        self.course = Course.objects.create(title='Course', description='d', instructor=self.instructor)
+        Enrollment.objects.create(user=self.student, course=self.course)
+        self.tokens = {user: Token.objects.create(user=user).key for user in (self.instructor, self.student, self.outsider)}
+        self.client.force_login(self.student)
+        self.session = self.client.cookies[django_settings.SESSION_COOKIE_NAME].value
+
+    async def connect(self, user=None, course_id=None, headers=()):
+        scope = {
+            'type': 'websocket',
+            'path': f'/ws/courses/{course_id or self.course.pk}/chat/',
+            'query_string': f'token={self.tokens[user]}'.encode() if user else b'',
+            'headers': list(headers),
+        }
+        socket = ApplicationCommunicator(chat.websocket_application, scope)
+        await socket.send_input({'type': 'websocket.connect'})
+        return socket, await socket.receive_output(1)
+
+    async def join(self, user):
+        socket, event = await self.connect(user)
+        self.assertEqual(event, {'type': 'websocket.accept'})
+        history = json.loads((await socket.receive_output(1))['text'])
+        self.assertEqual(history['type'], 'history')
+        return socket, history['messages']
+
+    async def frame(self, socket):
+        return json.loads((await socket.receive_output(1))['text'])
+
+    async def leave(self, socket):
+        await socket.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await socket.wait(1)
+
+    async def test_only_members_join(self):
+        for user in (self.instructor, self.student):
+            socket, _ = await self.join(user)
+            await self.leave(socket)
+        cases = [
+            ({'user': self.outsider}, chat.CLOSE_FORBIDDEN),
+            ({}, chat.CLOSE_FORBIDDEN),
+            ({'user': self.student, 'course_id': 999}, chat.CLOSE_NOT_FOUND),
+        ]
+        for kwargs, code in cases:
+            with self.subTest(**kwargs):
+                _, event = await self.connect(**kwargs)
+                self.assertEqual(event, {'type': 'websocket.close', 'code': code})
+
+    async def test_session_cookie_needs_same_origin(self):
+        cookie = (b'cookie', f'{django_settings.SESSION_COOKIE_NAME}={self.session}'.encode())
+        host = (b'host', b'testserver')
+        for origin, expected in ((None, 'websocket.close'), (b'http://evil.example', 'websocket.close'),
+                                 (b'http://testserver', 'websocket.accept')):
+            with self.subTest(origin=origin):
+                headers = [cookie, host] + ([(b'origin', origin)] if origin else [])
+                socket, event = await self.connect(headers=headers)
+                self.assertEqual(event['type'], expected)
+                if expected == 'websocket.accept':
+                    await socket.receive_output(1)
+                    await self.leave(socket)
+
+    async def test_backfill_and_fan_out(self):
+        await sync_to_async(ChatMessage.objects.create)(course=self.course, user=self.instructor, message='welcome')
+        first, history = await self.join(self.student)
+        second, _ = await self.join(self.instructor)
+        self.assertEqual([message['message'] for message in history], ['welcome'])
+        await first.send_input({'type': 'websocket.receive', 'text': json.dumps({'message': 'hello'})})
+        for socket in (first, second):
+            frame = await self.frame(socket)
+            self.assertEqual(frame['type'], 'messages')
+            self.assertEqual([(m['username'], m['message']) for m in frame['messages']], [('student', 'hello')])
+        await first.send_input({'type': 'websocket.receive', 'text': json.dumps({'message': ' '})})
+        self.assertEqual(await self.frame(first), {'type': 'error', 'error': 'invalid message'})
+        await self.leave(first)
+        await self.leave(second)
+        self.assertEqual(await sync_to_async(ChatMessage.objects.count)(), 2)
+
+    async def test_batches_and_skips_backfilled_messages(self):
+        message = await sync_to_async(ChatMessage.objects.create)(course=self.course, user=self.instructor, message='old')
+        socket, _ = await self.join(self.student)
+        broker = chat.get_broker()
+        room = chat.room_name(self.course.pk)
+        broker.publish(room, {'id': message.pk, 'message': 'old'})
+        broker.publish(room, {'id': message.pk + 1, 'message': 'a'})
+        await asyncio.sleep(0)
+        broker.publish(room, {'id': message.pk + 2, 'message': 'b'})
+        frame = await self.frame(socket)
+        self.assertEqual([m['message'] for m in frame['messages']], ['a', 'b'])
+        await self.leave(socket)
+
+    async def test_lagging_socket_is_closed(self):
+        socket, _ = await self.join(self.student)
+        for n in range(5):
+            chat.get_broker().publish(chat.room_name(self.course.pk), {'id': 100 + n, 'message': str(n)})
+        self.assertEqual(await socket.receive_output(1), {'type': 'websocket.close', 'code': chat.CLOSE_LAGGING})
+        await self.leave(socket)
+
+    def test_redis_broker_requires_package(self):
+        try:
+            import redis  # noqa: F401
+        except ImportError:
+            with self.assertRaises(ImproperlyConfigured):
+                chat.RedisBroker(chat.get_config())
+        else:
+            self.skipTest('redis is installed')
+
+
+def make_pdf(pages):
+    """A minimal PDF with one line of Helvetica text per page."""
+    count = len(pages)
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>']
+    kids = ' '.join(f'{3 + 2 * n} 0 R' for n in range(count))
+    objects.append(f'<< /Type /Pages /Kids [{kids}] /Count {count} >>'.encode())
+    font = 3 + 2 * count
+    for n, text in enumerate(pages):
+        objects.append(
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * n} 0 R '
+            f'/Resources << /Font << /F1 {font} 0 R >> >> >>'.encode()
+        )
+        stream = f'BT /F1 12 Tf 72 720 Td ({text}) Tj ET'.encode()
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+    objects.append(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>')
+    out, offsets = bytearray(b'%PDF-1.4\n'), []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+class PDFIngestTests(APITestCase):
+    """PDF uploads are size-checked while streaming and split into lessons by the worker."""
+
+    def setUp(self):
+        self.instructor = User.objects.create_user(username='instructor')
+        self.client.force_authenticate(self.instructor)
+        self.course = Course.objects.create(title='Course', description='d', instructor=self.instructor)
+        spool = tempfile.TemporaryDirectory()
+        self.addCleanup(spool.cleanup)
+        settings = self.settings(PDF_INGEST=dict(ingest.get_config(), SPOOL_DIR=spool.name, MAX_UPLOAD_MB=0.05, CHUNK_CHARS=20))
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def upload(self, data, **fields):
+        upload = SimpleUploadedFile('notes.pdf', data, content_type='application/pdf')
+        return self.client.post(reverse('pdf-upload'), {'file': upload, 'course': self.course.pk, **fields}, format='multipart')
+
+    def test_upload_validation(self):
+        self.assertEqual(self.upload(b'%PDF-' + b'x' * 60 * 1024).status_code, 413)
+        self.assertEqual(self.upload(b'%PDF-' + b'x' * 200 * 1024).status_code, 413)
+        self.assertEqual(self.upload(b'plain text').status_code, 400)
+        self.assertEqual(self.upload(make_pdf(['a']), course='abc').status_code, 400)
+        self.assertEqual(PDFIngestJob.objects.count(), 0)
+
+    def test_upload_and_ingest(self):
+        response = self.upload(make_pdf(['Variables and types', 'Loops', 'Functions and recursion']))
+        self.assertEqual(response.status_code, 202)
+        job = ingest.claim_next_job('worker')
+        job = ingest.process_job(job, pool=SimpleNamespace(map=map))
+        self.assertEqual(job.status, PDFIngestJob.DONE)
+        lessons = Lesson.objects.filter(course=self.course).order_by('order')
+        self.assertEqual([lesson.title for lesson in lessons], ['notes (pages 1-2)', 'notes (pages 3-3)'])
+        self.assertIn('Loops', lessons[0].content)
+        status = self.client.get(response.data['status_url']).data
+        self.assertEqual((status['status'], status['pages_done'], status['pages_total']), (PDFIngestJob.DONE, 3, 3))
+        self.assertFalse(os.path.exists(job.path))
+
+    def test_stale_jobs_fail_after_max_attempts(self):
+        self.assertEqual(self.upload(make_pdf(['a'])).status_code, 202)
+        for attempt in (1, 2):
+            job = ingest.claim_next_job('worker')
+            self.assertEqual(job.attempts, attempt)
+            PDFIngestJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=1))
+            self.assertEqual(ingest.requeue_stale_jobs(60, max_attempts=2), (1, 0) if attempt == 1 else (0, 1))
+        job.refresh_from_db()
+        self.assertEqual(job.status, PDFIngestJob.FAILED)
+        self.assertFalse(os.path.exists(job.path))
+        self.assertIsNone(ingest.claim_next_job('worker'))
+
+
+class PlagiarismTests(APITestCase):
+    """Copies survive renaming and reformatting; unrelated code and other challenges are not matched."""
+
+    original = (
+        'def total(numbers):\n'
+        '    result = 0\n'
+        '    for number in numbers:\n'
+        '        if number % 2 == 0:\n'
+        '            result += number * 3\n'
+        '    return result\n'
+        'print(total([1, 2, 3, 4]))\n'
+    )
+    disguised = (
+        '# my own work\n'
+        'def add_up(xs):\n'
+        '    acc = 0\n'
+        '    for x in xs:\n'
+        '        if x % 2 == 0:\n'
+        '            acc += x * 7\n'
+        '\n'
+        '    return acc\n'
+        'print(add_up([5, 6, 7, 8]))\n'
+    )
+    unrelated = (
+        'class Stack:\n'
+        '    def __init__(self):\n'
+        '        self.items = []\n'
+        '    def push(self, item):\n'
+        '        self.items.append(item)\n'
+        'while True:\n'
+        '    break\n'
+    )
+
+    def setUp(self):
+        self.instructor = User.objects.create_user(username='instructor')
+        self.student = User.objects.create_user(username='student')
+        course = Course.objects.create(title='Course', description='d', instructor=self.instructor)
+        lesson = Lesson.objects.create(course=course, title='Lesson', content='c', order=1)
+        self.challenge = Challenge.objects.create(lesson=lesson, title='c', description='d', expected_output='', order=1)
+        self.other = Challenge.objects.create(lesson=lesson, title='c2', description='d', expected_output='', order=2)
+
+    def submit(self, code, challenge=None):
+        return Submission.objects.create(user=self.student, challenge=challenge or self.challenge, code=code, language='python')
+
+    def similar(self, submission, **params):
+        return self.client.get(reverse('submission-similar', args=[submission.pk]), params)
+
+    def test_normalization(self):
+        self.assertEqual(plagiarism.normalize_tokens(self.original), plagiarism.normalize_tokens(self.disguised))
+        self.assertNotEqual(plagiarism.normalize_tokens(self.original), plagiarism.normalize_tokens(self.unrelated))
+
+    def test_disguised_copy_is_found(self):
+        target = self.submit(self.original)
+        copy = self.submit(self.disguised)
+        edited = self.submit(self.original.replace('    return result\n', '    print(result)\n    return result\n'))
+        self.submit(self.unrelated)
+        self.submit(self.original, challenge=self.other)
+        self.client.force_authenticate(self.instructor)
+        response = self.similar(target)
+        self.assertEqual(response.status_code, 200)
+        matches = [(match['submission'], match['similarity']) for match in response.data['similar']]
+        self.assertEqual([match_id for match_id, _ in matches], [copy.pk, edited.pk])
+        self.assertEqual(matches[0][1], 1.0)
+        self.assertGreater(matches[1][1], 0.5)
+        self.assertEqual([match['submission'] for match in self.similar(target, min_similarity=1).data['similar']], [copy.pk])
+        self.assertEqual(self.similar(target, k='many').status_code, 400)
+
+    def test_instructor_only(self):
+        target = self.submit(self.original)
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.similar(target).status_code, 403)
+
+    def test_rebuild_command(self):
+        target = self.submit(self.original)
+        copy = self.submit(self.disguised)
+        SubmissionSignature.objects.all().delete()
+        SubmissionBucket.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_plagiarism_index', '--challenge', str(self.challenge.pk), stdout=out)
+        self.assertIn('Indexed 2 submissions', out.getvalue())
+        self.assertEqual([match_id for match_id, _ in plagiarism.similar_submissions(target)], [copy.pk])
+
+
+class AnswerKeyGradingTests(APITestCase):
+    """MCQ tests are scored against a cached answer key that follows edits to the questions."""
+
+    def setUp(self):
+        cache.clear()
+        self.instructor = User.objects.create_user(username='instructor')
+        self.student = User.objects.create_user(username='student')
+        course = Course.objects.create(title='Course', description='d', instructor=self.instructor)
+        lesson = Lesson.objects.create(course=course, title='Lesson', content='c', order=1)
+        self.mcqs = [MCQ.objects.create(lesson=lesson, question=f'q{n}', options=['a', 'b'], answer='a') for n in range(3)]
+        self.test = Test.objects.create(course=course, title='t')
+        self.test.mcqs.add(*self.mcqs[:2])
+
+    def answers(self, *choices):
+        return {str(mcq.pk): choice for mcq, choice in zip(self.mcqs, choices)}
+
+    def submit(self, answers):
+        self.client.force_authenticate(self.student)
+        response = self.client.post(reverse('testsubmission-list-create', args=[self.test.pk]), {'answers': answers}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def bulk(self, payload):
+        self.client.force_authenticate(self.instructor)
+        return self.client.post(reverse('testsubmission-bulk-grade', args=[self.test.pk]), payload, format='json')
+
+    def test_score_answers(self):
+        key = {'1': 'a', '2': 'b'}
+        self.assertEqual(grading.score_answers(key, {'1': 'a', '2': 'a'}), (50, {'1': True, '2': False}))
+        self.assertEqual(grading.score_answers(key, {'1': 'a', '2': 'b', '9': 'x'}), (100, {'1': True, '2': True}))
+        self.assertEqual(grading.score_answers(key, ['a', 'b']), (0, {'1': False, '2': False}))
+        self.assertEqual(grading.score_answers({}, {'1': 'a'}), (0, {}))
+
+    def test_submission_is_graded_from_the_key(self):
+        data = self.submit(self.answers('a', 'b'))
+        self.assertEqual((data['score'], data['is_graded']), (50, True))
+        self.assertEqual(data['results'], {str(self.mcqs[0].pk): True, str(self.mcqs[1].pk): False})
+        self.assertEqual(count_queries(lambda: grading.get_answer_key(self.test.pk))[1], 0)
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.client.post(reverse('testsubmission-list-create', args=[999]), {}, format='json').status_code, 404)
+
+    def test_key_follows_question_edits(self):
+        self.assertEqual(self.submit(self.answers('a', 'b'))['score'], 50)
+        self.mcqs[1].answer = 'b'
+        self.mcqs[1].save()
+        self.assertEqual(self.submit(self.answers('a', 'b'))['score'], 100)
+        self.test.mcqs.add(self.mcqs[2])
+        self.assertAlmostEqual(self.submit(self.answers('a', 'b'))['score'], 200 / 3)
+        self.mcqs[2].tests.remove(self.test)
+        self.assertEqual(self.submit(self.answers('a', 'b'))['score'], 100)
+        self.mcqs[0].delete()
+        self.assertEqual(self.submit(self.answers('a', 'b'))['score'], 100)
+        self.test.mcqs.clear()
+        self.assertEqual(self.submit(self.answers('a', 'b'))['score'], 0)
+
+    def test_bulk_grade_and_regrade(self):
+        response = self.bulk({'submissions': [
+            {'user': self.student.pk, 'answers': self.answers('a', 'a')},
+            {'user': self.instructor.pk, 'answers': self.answers('a', 'b')},
+        ]})
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual([item['score'] for item in response.data['submissions']], [100, 50])
+        self.mcqs[1].answer = 'b'
+        self.mcqs[1].save()
+        with mock.patch.object(TestSubmissionBulkGradeView, 'batch_size', 1):
+            response = self.bulk({'regrade': True})
+        self.assertEqual(response.data, {'regraded': 2})
+        scores = dict(TestSubmission.objects.values_list('user_id', 'score'))
+        self.assertEqual(scores, {self.student.pk: 50, self.instructor.pk: 100})
+
+    def test_bulk_grade_validation(self):
+        for user in (True, False, 999, str(self.student.pk), None):
+            with self.subTest(user=user):
+                response = self.bulk({'submissions': [{'user': user, 'answers': {}}]})
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.bulk({'submissions': 'all'}).status_code, 400)
+        self.assertEqual(TestSubmission.objects.count(), 0)
+        self.client.force_authenticate(self.student)
+        response = self.client.post(reverse('testsubmission-bulk-grade', args=[self.test.pk]), {'regrade': True}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class GradingTests(APITestCase):
+    """Jobs are claimed once and retried on sandbox failures; only code-determined verdicts are reused."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='student')
+        course = Course.objects.create(title='Course', description='d', instructor=self.user)
+        lesson = Lesson.objects.create(course=course, title='Lesson', content='c', order=1)
+        self.challenge = Challenge.objects.create(
+            lesson=lesson, title='c', description='d', expected_output='',
+            test_cases=[{'input': '1', 'output': '1'}, {'input': '2', 'output': '2'}], order=1,
+        )
+
+    def enqueue(self, code='print(input())'):
+        return grading.enqueue_submission(user=self.user, challenge=self.challenge, code=code, language='python')
+
+    def run_job(self, job, status='ok'):
+        cases = [{'case': 1, 'verdict': 'passed', 'time': 0.01}, {'case': 2, 'verdict': 'passed', 'time': 0.01}]
+        result = {'status': status, 'stderr': 'Sandbox process exited unexpectedly', 'time': 0.02, 'cases': cases}
+        with mock.patch.object(grading, 'run_test_cases', return_value=result):
+            return grading.process_job(job, max_attempts=2)
+
+    def test_claims_are_exclusive(self):
+        first, second = self.enqueue()[1], self.enqueue('print(1)')[1]
+        self.assertEqual(grading.claim_next_job('a').pk, first.pk)
+        self.assertEqual(grading.claim_next_job('b').pk, second.pk)
+        self.assertIsNone(grading.claim_next_job('c'))
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.worker, first.attempts), (GradingJob.RUNNING, 'a', 1))
+
+    def test_stale_jobs_are_requeued(self):
+        self.enqueue()
+        job = grading.claim_next_job('a')
+        self.assertEqual(grading.requeue_stale_jobs(60), (0, 0))
+        GradingJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(grading.requeue_stale_jobs(60, max_attempts=2), (1, 0))
+        job = grading.claim_next_job('b')
+        self.assertEqual(job.attempts, 2)
+        # A job that keeps killing its worker is failed once it runs out of attempts.
+        GradingJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(grading.requeue_stale_jobs(60, max_attempts=2), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual(job.status, GradingJob.FAILED)
+        self.assertIn('stopped responding', job.error)
+        self.assertIsNone(grading.claim_next_job('c'))
+
+    def test_sandbox_failure_requeues_job(self):
+        submission, _ = self.enqueue()
+        job = self.run_job(grading.claim_next_job('a'), status='unavailable')
+        self.assertEqual(job.status, GradingJob.QUEUED)
+        self.assertIn('SandboxError', job.error)
+        submission.refresh_from_db()
+        self.assertEqual((submission.is_correct, submission.feedback), (False, 'Pending evaluation'))
+        self.assertEqual(self.run_job(grading.claim_next_job('a'), status='unavailable').status, GradingJob.FAILED)
+
+    def test_status_endpoint(self):
+        self.client.force_authenticate(self.user)
+        submission, _ = self.enqueue()
+        url = reverse('submission-status', args=[submission.pk])
+        self.assertEqual(self.client.get(url).data['status'], GradingJob.QUEUED)
+        self.run_job(grading.claim_next_job('a'))
+        response = self.client.get(url, {'wait': 5})
+        self.assertEqual((response.data['status'], response.data['is_correct']), (GradingJob.DONE, True))
+        self.client.force_authenticate(User.objects.create_user(username='other'))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def grade(self, *verdicts, status='ok', stop_on_failure=None):
+        """Grade a fresh submission with the sandbox reporting ``verdicts``; returns how often it ran."""
+        cases = [{'case': index, 'verdict': verdict, 'time': 0.01} for index, verdict in enumerate(verdicts, start=1)]
+        result = {'status': status, 'stderr': '', 'time': 0.02, 'cases': cases}
+        submission = Submission.objects.create(user=self.user, challenge=self.challenge, code='print(input())', language='python')
+        with mock.patch.object(grading, 'run_test_cases', return_value=result) as run:
+            grading.grade_submission(submission, stop_on_failure=stop_on_failure)
+        return run.call_count
+
+    def test_code_determined_verdicts_are_cached(self):
+        self.assertEqual(self.grade('passed', 'wrong_answer'), 1)
+        self.assertEqual(self.grade('passed', 'wrong_answer'), 0)
+        self.assertEqual(self.grade('passed', 'wrong_answer', stop_on_failure=True), 1)
+
+    def test_load_dependent_verdicts_are_not_cached(self):
+        for verdicts, status in [
+            (('passed', 'timeout'), 'ok'),
+            (('passed', 'memory_limit'), 'ok'),
+            (('passed', 'error'), 'ok'),
+            (('passed',), 'timeout'),
+        ]:
+            with self.subTest(verdicts=verdicts, status=status):
+                self.assertEqual(self.grade(*verdicts, status=status), 1)
+                self.assertEqual(self.grade(*verdicts, status=status), 1)
+
+
+class CacheSettingsTests(SimpleTestCase):
+    """Outside DEBUG the settings refuse a per-process cache that signal invalidation could not reach."""
+
+    def load_settings(self, **environ):
+        keys = ('DJANGO_DEBUG', 'REDIS_URL', 'CACHE_BACKEND', 'CACHE_LOCATION', 'CACHE_ALLOW_LOCAL')
+        clean = {key: value for key, value in os.environ.items() if key not in keys}
+        with mock.patch.dict(os.environ, dict(clean, **environ), clear=True):
+            return runpy.run_path(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'core', 'settings.py'))
+
+    def test_local_cache_refused_outside_debug(self):
+        self.assertTrue(self.load_settings()['DEBUG'])
+        with self.assertRaises(ImproperlyConfigured):
+            self.load_settings(DJANGO_DEBUG='0')
+        allowed = self.load_settings(DJANGO_DEBUG='0', CACHE_ALLOW_LOCAL='1')
+        self.assertTrue(allowed['CACHES']['default']['BACKEND'].endswith('.LocMemCache'))
+
+    def test_shared_cache_from_environment(self):
+        redis = self.load_settings(DJANGO_DEBUG='0', REDIS_URL='redis://cache:6379/1')['CACHES']['default']
+        self.assertEqual(
+            (redis['BACKEND'], redis['LOCATION']),
+            ('django.core.cache.backends.redis.RedisCache', 'redis://cache:6379/1'),
+        )
+        files = self.load_settings(
+            DJANGO_DEBUG='0', CACHE_BACKEND='django.core.cache.backends.filebased.FileBasedCache', CACHE_LOCATION='/tmp/c',
+        )['CACHES']['default']
+        self.assertEqual(files['LOCATION'], '/tmp/c')
+        self.assertNotIn('OPTIONS', files)
+
+
+class SandboxTests(SimpleTestCase):
+    """Submitted code runs isolated, within its limits, on workers started on demand."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        config = dict(
+            sandbox.get_config(), CPU_SECONDS=1, WALL_SECONDS=3, CASE_SECONDS=1, BATCH_SECONDS=10,
+            MEMORY_MB=128, ISOLATION=True,
+        )
+        cls.pool = sandbox.SandboxPool(size=2, config=config)
+        if cls.pool.run('print(1)')['status'] == 'unavailable':
+            cls.pool.shutdown()
+            raise SkipTest('Linux namespaces are not available here')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.shutdown()
+        super().tearDownClass()
+
+    def run_code(self, code, stdin=''):
+        return self.pool.run(code, stdin=stdin)
+
+    def test_runs_code(self):
+        result = self.run_code('print(input()[::-1])', stdin='abc')
+        self.assertEqual((result['status'], result['stdout']), ('ok', 'cba\n'))
+
+    def test_limits(self):
+        self.assertEqual(self.run_code('while True: pass')['status'], 'timeout')
+        self.assertEqual(self.run_code('x = bytearray(512 * 1024 * 1024)')['status'], 'memory_limit')
+        self.assertIn('BlockingIOError', self.run_code('import os\nos.fork()')['stderr'])
+
+    def test_isolation(self):
+        network = self.run_code("import socket\nsocket.create_connection(('1.1.1.1', 80), timeout=1)")
+        self.assertIn('Network is unreachable', network['stderr'])
+        source = self.run_code(f'open({__file__!r}).read()')
+        self.assertIn('FileNotFoundError', source['stderr'])
+        self.assertEqual(self.run_code('import os\nprint(os.getuid())')['stdout'].strip(), '65534')
+        self.assertIn('PermissionError', self.run_code("open('/tmp/x', 'w')")['stderr'])
+
+    def test_time_limit_cannot_be_caught(self):
+        code = 'try:\n    while True: pass\nexcept BaseException:\n    print("caught")\n'
+        self.assertEqual(self.run_code(code)['status'], 'timeout')
+        cases = [{'input': '', 'output': 'caught'}] * 2
+        verdicts = [case['verdict'] for case in self.pool.run_batch(code, cases, stop_on_failure=False)['cases']]
+        self.assertEqual(verdicts, ['timeout', 'timeout'])
+
+    def test_cases_do_not_share_state(self):
+        code = (
+            'import math\n'
+            'print(getattr(math, "seen", "fresh"))\n'
+            'math.seen = "leaked"\n'
+            'print = None\n'
+        )
+        cases = [{'input': '', 'output': 'fresh'}] * 3
+        result = self.pool.run_batch(code, cases, stop_on_failure=False)
+        self.assertEqual([case['verdict'] for case in result['cases']], ['passed'] * 3)
+
+    def test_expected_outputs_stay_outside_the_sandbox(self):
+        code = (
+            'import gc, sys\n'
+            'found = []\n'
+            'frame = sys._getframe()\n'
+            'while frame is not None:\n'
+            '    found += [value for value in frame.f_locals.values() if isinstance(value, (dict, list))]\n'
+            '    frame = frame.f_back\n'
+            'found += gc.get_objects()\n'
+            'for item in found:\n'
+            '    for case in (item if isinstance(item, list) else [item]):\n'
+            '        if isinstance(case, dict) and "output" in case:\n'
+            '            print(case["output"])\n'
+            '            raise SystemExit\n'
+        )
+        cases = [{'input': '', 'output': 'secret answer'}] * 2
+        result = self.pool.run_batch(code, cases, stop_on_failure=False)
+        self.assertEqual([case['verdict'] for case in result['cases']], ['wrong_answer'] * 2)
+
+    def test_signal_deaths_map_to_verdicts(self):
+        cases = [{'input': '', 'output': ''}]
+        segfault = self.pool.run_batch('import os, signal\nos.kill(os.getpid(), signal.SIGSEGV)', cases)
+        self.assertEqual(segfault['cases'][0]['verdict'], 'error')
+        self.assertIn('SIGSEGV', segfault['cases'][0]['stderr'])
+        killed = self.run_code('import os, signal\nos.kill(os.getpid(), signal.SIGKILL)')
+        self.assertEqual(killed['status'], 'memory_limit')
+        looping = self.pool.run_batch('while True: pass', cases)
+        self.assertEqual((looping['status'], looping['cases'][0]['verdict']), ('ok', 'timeout'))
+
+    def test_workers_start_on_demand(self):
+        pool = sandbox.SandboxPool(size=4, config=self.pool.config)
+        try:
+            self.assertEqual(pool.started, 0)
+            pool.run('print(1)')
+            pool.run('print(2)')
+            self.assertEqual(pool.started, 1)
+        finally:
+            pool.shutdown()
+
+    def test_fails_closed_without_isolation(self):
+        root = sandbox_worker._jail_root
+        sandbox_worker._jail_root = '/nonexistent/sandbox-root'
+        try:
+            result = sandbox_worker.run_job({'code': 'print(1)', 'limits': self.pool.limits})
+        finally:
+            sandbox_worker._jail_root = root
+        self.assertEqual(result['status'], 'unavailable')
+        self.assertEqual(result['stdout'], '')
 
-# Create your tests here.
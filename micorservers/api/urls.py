@@ -1,30 +1,31 @@
 from django.urls import path
 from .views import (
-    HealthCheckView,
+    HealthCheckView, MetricsView,
     RegisterView, LoginView, LogoutView,
     UserListView, UserDetailView, UserProfileView, UserStatsView, UserSubmissionsView,
-    CourseListView, CourseDetailView, CourseEnrollView, CourseSearchView, CourseChallengesView, CourseLessonsView,
-    LessonListView, LessonDetailView, LessonMCQsView,
+    CourseListView, CourseDetailView, CourseEnrollView, CourseExportView, CourseOutlineView, CourseSearchView, CourseChallengesView, CourseLessonsView,
+    LessonListView, LessonDetailView, LessonContentView, LessonMCQsView,
     EnrollmentListView, EnrollmentDetailView,
     ChallengeListView, ChallengeDetailView,
-    SubmissionListView, SubmissionDetailView, SubmitCodeView,
-    MCQListView, MCQDetailView,
+    SubmissionListView, SubmissionDetailView, SubmitCodeView, SubmissionStatusView, SimilarSubmissionsView,
+    MCQListView, MCQBulkCreateView, MCQDetailView,
     LearningPathListView, LearningPathDetailView,
-    UserProgressListView, UserProgressDetailView,
-    PDFUploadView,
+    UserProgressListView, UserProgressBulkUpsertView, UserProgressDetailView,
+    PDFUploadView, PDFIngestJobView,
     AIFeedbackView, CodeExecutionView,
     CourseReviewListCreateView, CourseReviewDetailView,
     TestListCreateView, TestDetailView,
-    TestSubmissionListCreateView, TestSubmissionDetailView,
+    TestSubmissionListCreateView, TestSubmissionDetailView, TestSubmissionBulkGradeView,
     CurrentUserView,  
     ModuleListView, ModuleDetailView,  # Add this line
-    NoteListView, NoteDetailView,  # Add this line
+    NoteListView, NoteBulkCreateView, NoteDetailView,  # Add this line
     ChatMessageListView, ChatMessageDetailView,  # Add this line
     home_overview  # Add this line
 )
 
 urlpatterns = [
     path('health/', HealthCheckView.as_view(), name='health-check'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 
     # Auth
     path('auth/register/', RegisterView.as_view(), name='register'),
@@ -43,6 +44,8 @@ urlpatterns = [
     path('courses/', CourseListView.as_view(), name='course-list'),
     path('courses/<int:pk>/', CourseDetailView.as_view(), name='course-detail'),
     path('courses/<int:pk>/enroll/', CourseEnrollView.as_view(), name='course-enroll'),
+    path('courses/<int:pk>/outline/', CourseOutlineView.as_view(), name='course-outline'),
+    path('courses/<int:pk>/export/<slug:kind>.<slug:fmt>', CourseExportView.as_view(), name='course-export'),
     path('courses/search/', CourseSearchView.as_view(), name='course-search'),
     path('courses/<int:course_id>/challenges/', CourseChallengesView.as_view(), name='course-challenges'),
     path('courses/<int:course_id>/lessons/', CourseLessonsView.as_view(), name='course-lessons'),
@@ -50,6 +53,7 @@ urlpatterns = [
     # Lesson endpoints
     path('lessons/', LessonListView.as_view(), name='lesson-list'),
     path('lessons/<int:pk>/', LessonDetailView.as_view(), name='lesson-detail'),
+    path('lessons/<int:pk>/content/', LessonContentView.as_view(), name='lesson-content'),
     path('lessons/<int:lesson_id>/mcqs/', LessonMCQsView.as_view(), name='lesson-mcqs'),
 
     # Enrollment endpoints
@@ -63,10 +67,13 @@ urlpatterns = [
     # Submission endpoints
     path('submissions/', SubmissionListView.as_view(), name='submission-list'),
     path('submissions/<int:pk>/', SubmissionDetailView.as_view(), name='submission-detail'),
+    path('submissions/<int:pk>/status/', SubmissionStatusView.as_view(), name='submission-status'),
+    path('submissions/<int:pk>/similar/', SimilarSubmissionsView.as_view(), name='submission-similar'),
     path('challenges/<int:challenge_id>/submit/', SubmitCodeView.as_view(), name='submit-code'),
 
     # MCQ endpoints
     path('mcqs/', MCQListView.as_view(), name='mcq-list'),
+    path('mcqs/bulk/', MCQBulkCreateView.as_view(), name='mcq-bulk-create'),
     path('mcqs/<int:pk>/', MCQDetailView.as_view(), name='mcq-detail'),
 
     # LearningPath endpoints
@@ -75,10 +82,12 @@ urlpatterns = [
 
     # UserProgress endpoints
     path('progress/', UserProgressListView.as_view(), name='userprogress-list'),
+    path('progress/bulk/', UserProgressBulkUpsertView.as_view(), name='userprogress-bulk-upsert'),
     path('progress/<int:pk>/', UserProgressDetailView.as_view(), name='userprogress-detail'),
 
     # PDF upload
     path('pdf/upload/', PDFUploadView.as_view(), name='pdf-upload'),
+    path('pdf/jobs/<int:pk>/', PDFIngestJobView.as_view(), name='pdf-job-status'),
 
     # AI Feedback & Code Execution
     path('ai/feedback/', AIFeedbackView.as_view(), name='ai-feedback'),
@@ -94,6 +103,7 @@ urlpatterns = [
 
     # Test Submission endpoints
     path('tests/<int:test_id>/submissions/', TestSubmissionListCreateView.as_view(), name='testsubmission-list-create'),
+    path('tests/<int:test_id>/submissions/bulk/', TestSubmissionBulkGradeView.as_view(), name='testsubmission-bulk-grade'),
     path('testsubmissions/<int:pk>/', TestSubmissionDetailView.as_view(), name='testsubmission-detail'),
 
     # Module endpoints
@@ -102,6 +112,7 @@ urlpatterns = [
 
     # Note endpoints
     path('notes/', NoteListView.as_view(), name='note-list'),
+    path('notes/bulk/', NoteBulkCreateView.as_view(), name='note-bulk-create'),
     path('notes/<int:pk>/', NoteDetailView.as_view(), name='note-detail'),
 
     # ChatMessage endpoints
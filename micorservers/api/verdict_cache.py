@@ -0,0 +1,91 @@
+"""
+Content-addressed cache of grading verdicts.
+
+Keys are hashes of the normalized code, the language, whether grading stops
+at the first failing case, and a fingerprint of the challenge's test cases
+and expected output. Editing a
+challenge changes its fingerprint, so stale verdicts are simply never looked
+up again and age out through TTL/LRU eviction.
+"""
+import hashlib
+import itertools
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import VerdictCacheEntry
+
+DEFAULTS = {
+    'TTL': 7 * 24 * 3600,
+    'MAX_ENTRIES': 50000,
+    'CULL_EVERY': 100,
+}
+
+_stores = itertools.count(1)
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'VERDICT_CACHE', {}))
+    return config
+
+
+def normalize_code(code):
+    lines = (code or '').replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return '\n'.join(line.rstrip() for line in lines).strip('\n')
+
+
+def challenge_fingerprint(challenge):
+    data = json.dumps([challenge.test_cases, challenge.expected_output], sort_keys=True)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def _key(*parts):
+    return hashlib.sha256('\0'.join(parts).encode()).hexdigest()
+
+
+def submission_key(challenge, code, language, stop_on_failure):
+    return _key(
+        'submission', (language or 'python').lower(), 'stop' if stop_on_failure else 'all',
+        challenge_fingerprint(challenge), normalize_code(code),
+    )
+
+
+def lookup(key):
+    cutoff = timezone.now() - timedelta(seconds=get_config()['TTL'])
+    entry = VerdictCacheEntry.objects.filter(key=key, created_at__gte=cutoff).values('payload').first()
+    if entry is None:
+        return None
+    VerdictCacheEntry.objects.filter(key=key).update(hits=F('hits') + 1, last_used_at=timezone.now())
+    return entry['payload']
+
+
+def store(key, payload):
+    now = timezone.now()
+    updated = VerdictCacheEntry.objects.filter(key=key).update(payload=payload, created_at=now, last_used_at=now)
+    if not updated:
+        try:
+            with transaction.atomic():
+                VerdictCacheEntry.objects.create(key=key, payload=payload)
+        except IntegrityError:
+            pass
+    config = get_config()
+    if next(_stores) % config['CULL_EVERY'] == 0:
+        cull(config)
+
+
+def cull(config=None):
+    """Drop expired entries, then the least recently used ones above MAX_ENTRIES."""
+    config = config or get_config()
+    cutoff = timezone.now() - timedelta(seconds=config['TTL'])
+    VerdictCacheEntry.objects.filter(created_at__lt=cutoff).delete()
+    boundary = (
+        VerdictCacheEntry.objects.order_by('-last_used_at')
+        .values_list('last_used_at', flat=True)[config['MAX_ENTRIES']:config['MAX_ENTRIES'] + 1]
+    )
+    if boundary:
+        VerdictCacheEntry.objects.filter(last_used_at__lte=boundary[0]).delete()
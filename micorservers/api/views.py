@@ -1,14 +1,19 @@
+import gzip
+import hashlib
+import time
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status, generics, permissions, viewsets, filters
+from rest_framework import status, generics, permissions, filters
 from django.contrib.auth.models import User
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import authenticate, logout
 from rest_framework.authtoken.models import Token
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import NotFound
 from rest_framework.parsers import MultiPartParser
+from rest_framework.utils.urls import replace_query_param
 from .models import (
     Course, Lesson, Enrollment, Challenge, Submission, MCQ, LearningPath, UserProgress, CourseReview, Test, TestSubmission,
-    Module, Note, ChatMessage
+    Module, Note, ChatMessage, GradingJob, PDFIngestJob
 )
 from .serializers import (
     UserSerializer, CourseSerializer, LessonSerializer, EnrollmentSerializer,
@@ -16,13 +21,36 @@ from .serializers import (
     CourseReviewSerializer, TestSerializer, TestSubmissionSerializer,
     ModuleSerializer, NoteSerializer, ChatMessageSerializer
 )
-from django.db.models import Count, Q
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.dateparse import parse_datetime
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from .grading import enqueue_submission, get_answer_key, score_answers
+from . import catalog, dashboard, exports, ingest, metrics, outline, plagiarism, progress, recommendations, search
+from .mixins import BulkCreateMixin, CatalogCacheMixin, QuerysetOptimizerMixin
+from .sandbox import run_code
+
+try:
+    import brotli
+except ImportError:  # optional; lesson bodies fall back to gzip
+    brotli = None
 
 # Health check
 class HealthCheckView(APIView):
     def get(self, request):
         return Response({"status": "ok", "message": "DRF backend running"}, status=status.HTTP_200_OK)
 
+# Request metrics (Prometheus text format)
+class MetricsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+    def get(self, request):
+        return HttpResponse(metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 # AUTH APIs
 class RegisterView(APIView):
     permission_classes = [permissions.AllowAny]
@@ -66,12 +94,12 @@ class CurrentUserView(APIView):
         return Response(serializer.data)
 
 # User CRUD
-class UserListView(generics.ListCreateAPIView):
+class UserListView(QuerysetOptimizerMixin, generics.ListCreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAdminUser]
 
-class UserDetailView(generics.RetrieveUpdateDestroyAPIView):
+class UserDetailView(QuerysetOptimizerMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -87,30 +115,75 @@ class UserProfileView(APIView):
         return Response(serializer.errors, status=400)
 
 # Course CRUD
-class CourseListView(generics.ListCreateAPIView):
+class CourseListView(CatalogCacheMixin, QuerysetOptimizerMixin, generics.ListCreateAPIView):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    ordering = '-created_at'
 
-class CourseDetailView(generics.RetrieveUpdateDestroyAPIView):
+    def catalog_scopes(self):
+        return [catalog.CATALOG]
+
+class CourseDetailView(CatalogCacheMixin, QuerysetOptimizerMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
-class CourseSearchView(generics.ListAPIView):
+    def catalog_scopes(self):
+        return [catalog.course_scope(self.kwargs['pk'])]
+
+class CourseSearchView(QuerysetOptimizerMixin, generics.ListAPIView):
+    """
+    Course search. ``?search=`` runs a ranked full-text query over courses and
+    their lessons (prefix matching on the last word, highlighted ``snippet``)
+    when the database has a search index; otherwise, or when an explicit
+    ``?ordering=`` is requested, it falls back to ``SearchFilter``.
+    """
+    queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [permissions.AllowAny]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['title', 'description', 'language', 'instructor__username']
     ordering_fields = ['created_at', 'title']
+    ordering = '-created_at'
+    max_limit = 100
 
     def get_queryset(self):
-        qs = Course.objects.all()
+        qs = super().get_queryset()
         lang = self.request.query_params.get('language')
         if lang:
             qs = qs.filter(language__iexact=lang)
         return qs
 
+    def list(self, request, *args, **kwargs):
+        term = request.query_params.get('search', '').strip()
+        if not term or 'ordering' in request.query_params or not search.is_available():
+            return super().list(request, *args, **kwargs)
+        try:
+            limit = int(request.query_params.get('limit', 20))
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+        except ValueError:
+            return Response({'error': 'limit and offset must be integers'}, status=400)
+        if not 1 <= limit <= self.max_limit:
+            return Response({'error': f'limit must be between 1 and {self.max_limit}'}, status=400)
+        hits = search.search_courses(term, language=request.query_params.get('language'), limit=limit + 1, offset=offset)
+        has_next = len(hits) > limit
+        hits = hits[:limit]
+        courses = self.get_queryset().in_bulk([course_id for course_id, _, _ in hits])
+        results = []
+        for course_id, rank, snippet in hits:
+            if course_id in courses:
+                data = self.get_serializer(courses[course_id]).data
+                data['rank'] = rank
+                data['snippet'] = snippet
+                results.append(data)
+        url = request.build_absolute_uri()
+        return Response({
+            'next': replace_query_param(url, 'offset', offset + limit) if has_next else None,
+            'previous': replace_query_param(url, 'offset', max(offset - limit, 0)) if offset else None,
+            'results': results,
+        })
+
 class CourseEnrollView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     def post(self, request, pk):
@@ -118,221 +191,571 @@ class CourseEnrollView(APIView):
         enrollment, created = Enrollment.objects.get_or_create(user=request.user, course=course)
         return Response({'enrolled': True, 'enrollment_id': enrollment.id}, status=200)
 
-class CourseChallengesView(APIView):
+class CourseExportView(APIView):
+    """
+    Stream ``submissions``, ``test-results`` or ``progress`` of a course as
+    ``.csv`` or ``.ndjson``. Course instructor or staff only.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk, kind, fmt):
+        if kind not in exports.EXPORTS or fmt not in exports.FORMATS:
+            raise NotFound()
+        course = get_object_or_404(Course.objects.only('id', 'instructor_id'), pk=pk)
+        if not (request.user.is_staff or course.instructor_id == request.user.id):
+            return Response({'error': 'Only the course instructor can export course data'}, status=403)
+        response = StreamingHttpResponse(exports.stream(kind, course.pk, fmt), content_type=exports.FORMATS[fmt])
+        response['Content-Disposition'] = f'attachment; filename="course-{course.pk}-{kind}.{fmt}"'
+        return response
+
+class CourseOutlineView(APIView):
+    """Modules, lessons, challenges and MCQs of a course as one tree (see ``api/outline.py``)."""
     permission_classes = [permissions.AllowAny]
-    def get(self, request, course_id):
-        lessons = Lesson.objects.filter(course_id=course_id)
-        challenges = Challenge.objects.filter(lesson__in=lessons)
-        return Response(ChallengeSerializer(challenges, many=True).data)
 
-class CourseLessonsView(APIView):
+    def get(self, request, pk):
+        key, etag = catalog.request_tag(request, [catalog.course_scope(pk)])
+        response = catalog.not_modified(request, etag)
+        if response is not None:
+            return response
+        payload = outline.cached(pk)
+        if payload is None:
+            raise NotFound()
+        return catalog.finish(Response(payload), etag)
+
+class CourseChallengesView(CatalogCacheMixin, QuerysetOptimizerMixin, generics.ListAPIView):
+    queryset = Challenge.objects.all()
+    serializer_class = ChallengeSerializer
     permission_classes = [permissions.AllowAny]
-    def get(self, request, course_id):
-        lessons = Lesson.objects.filter(course_id=course_id)
-        return Response(LessonSerializer(lessons, many=True).data)
+    ordering = 'id'
+
+    def catalog_scopes(self):
+        return [catalog.course_scope(self.kwargs['course_id'])]
+
+    def get_queryset(self):
+        return super().get_queryset().filter(lesson__course_id=self.kwargs['course_id'])
+
+class CourseLessonsView(CatalogCacheMixin, QuerysetOptimizerMixin, generics.ListAPIView):
+    queryset = Lesson.objects.all()
+    serializer_class = LessonSerializer
+    permission_classes = [permissions.AllowAny]
+    ordering = 'order'
+
+    def catalog_scopes(self):
+        return [catalog.course_scope(self.kwargs['course_id'])]
+
+    def get_queryset(self):
+        return super().get_queryset().filter(course_id=self.kwargs['course_id'])
 
 # Lesson CRUD
-class LessonListView(generics.ListCreateAPIView):
+class LessonListView(QuerysetOptimizerMixin, generics.ListCreateAPIView):
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
-class LessonDetailView(generics.RetrieveUpdateDestroyAPIView):
+class LessonDetailView(QuerysetOptimizerMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
-class LessonMCQsView(APIView):
+class LessonContentView(APIView):
+    """
+    The lesson body alone, as text, compressed for the client and validated
+    with a strong ETag (one per content coding, since the bytes differ) and a
+    Last-Modified derived from ``updated_at``. Conditional requests are
+    answered from one indexed lookup without reading the body.
+    """
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    body_ttl = 24 * 60 * 60
+
+    def get(self, request, pk):
+        updated_at = Lesson.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+        if updated_at is None:
+            raise NotFound()
+        encoding = _content_encoding(request)
+        etag = quote_etag(f'lesson-{pk}-{updated_at.timestamp():.6f}-{encoding or "identity"}')
+        last_modified = http_date(updated_at.timestamp())
+        modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        response = _not_modified(request, etag)
+        if response is None and 'If-None-Match' not in request.headers and modified_since is not None \
+                and int(updated_at.timestamp()) <= modified_since:
+            response = HttpResponse(status=304)
+            response['ETag'] = etag
+        if response is None:
+            # The ETag carries the version and the coding, so an edited lesson never serves a stale body.
+            key = f'lesson-body:{etag}'
+            body = cache.get(key)
+            if body is None:
+                text = Lesson.objects.filter(pk=pk).values_list('content', flat=True).first() or ''
+                body = _encode_body(text.encode(), encoding)
+                cache.set(key, body, self.body_ttl)
+            response = HttpResponse(body, content_type='text/plain; charset=utf-8')
+            response['ETag'] = etag
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['Last-Modified'] = last_modified
+        response['Cache-Control'] = 'public, no-cache'
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
+
+class LessonMCQsView(QuerysetOptimizerMixin, generics.ListAPIView):
+    queryset = MCQ.objects.all()
+    serializer_class = MCQSerializer
     permission_classes = [permissions.AllowAny]
-    def get(self, request, lesson_id):
-        mcqs = MCQ.objects.filter(lesson_id=lesson_id)
-        return Response(MCQSerializer(mcqs, many=True).data)
+    ordering = 'id'
+
+    def get_queryset(self):
+        return super().get_queryset().filter(lesson_id=self.kwargs['lesson_id'])
 
 # Enrollment CRUD
-class EnrollmentListView(generics.ListCreateAPIView):
+class EnrollmentListView(QuerysetOptimizerMixin, generics.ListCreateAPIView):
     queryset = Enrollment.objects.all()
     serializer_class = EnrollmentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    ordering = '-enrolled_at'
 
-class EnrollmentDetailView(generics.RetrieveUpdateDestroyAPIView):
+class EnrollmentDetailView(QuerysetOptimizerMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Enrollment.objects.all()
     serializer_class = EnrollmentSerializer
     permission_classes = [permissions.IsAuthenticated]
 
 # Challenge CRUD
-class ChallengeListView(generics.ListCreateAPIView):
+class ChallengeListView(QuerysetOptimizerMixin, generics.ListCreateAPIView):
     queryset = Challenge.objects.all()
     serializer_class = ChallengeSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
-class ChallengeDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ChallengeDetailView(QuerysetOptimizerMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Challenge.objects.all()
     serializer_class = ChallengeSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
 # Submission CRUD + submit code
-class SubmissionListView(generics.ListCreateAPIView):
+class SubmissionListView(QuerysetOptimizerMixin, generics.ListCreateAPIView):
     queryset = Submission.objects.all()
     serializer_class = SubmissionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    ordering = '-submitted_at'
 
-class SubmissionDetailView(generics.RetrieveUpdateDestroyAPIView):
+class SubmissionDetailView(QuerysetOptimizerMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Submission.objects.all()
     serializer_class = SubmissionSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+class SimilarSubmissionsView(APIView):
+    """
+    Top ``?k=`` (default 10, max 100) submissions to the same challenge most
+    similar to this one, optionally above ``?min_similarity=``. Course
+    instructor or staff only.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    max_k = 100
+
+    def get(self, request, pk):
+        submission = get_object_or_404(
+            Submission.objects.select_related('challenge__lesson__course').only(
+                'id', 'challenge_id', 'code', 'language', 'challenge__lesson__course__instructor_id',
+            ),
+            pk=pk,
+        )
+        if not (request.user.is_staff or submission.challenge.lesson.course.instructor_id == request.user.id):
+            return Response({'error': 'Only the course instructor can compare submissions'}, status=403)
+        try:
+            k = max(1, min(int(request.query_params.get('k', 10)), self.max_k))
+            min_similarity = float(request.query_params.get('min_similarity', 0))
+        except ValueError:
+            return Response({'error': 'k must be an integer and min_similarity a number'}, status=400)
+        matches = plagiarism.similar_submissions(submission, k=k, min_similarity=min_similarity)
+        details = Submission.objects.in_bulk([match_id for match_id, _ in matches])
+        return Response({
+            'submission': submission.pk,
+            'challenge': submission.challenge_id,
+            'similar': [
+                {
+                    'submission': match_id,
+                    'user': details[match_id].user_id,
+                    'similarity': score,
+                    'submitted_at': details[match_id].submitted_at,
+                    'is_correct': details[match_id].is_correct,
+                }
+                for match_id, score in matches if match_id in details
+            ],
+        })
+
 class SubmitCodeView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     def post(self, request, challenge_id):
-        # TODO: Integrate code execution logic here
-        # For now, just create a submission
         challenge = Challenge.objects.get(pk=challenge_id)
-        submission = Submission.objects.create(
+        submission, job = enqueue_submission(
             user=request.user,
             challenge=challenge,
             code=request.data['code'],
             language=request.data.get('language', 'python'),
-            is_correct=False,  # Placeholder
-            feedback="Pending evaluation"
         )
-        return Response(SubmissionSerializer(submission).data, status=201)
+        data = SubmissionSerializer(submission).data
+        data['status'] = job.status if job else GradingJob.DONE
+        data['cached'] = job is None
+        data['status_url'] = request.build_absolute_uri(reverse('submission-status', args=[submission.pk]))
+        return Response(data, status=202 if job else 201)
+
+class SubmissionStatusView(APIView):
+    """Grading status of a submission; pass ``?wait=<seconds>`` to long-poll until it finishes."""
+    permission_classes = [permissions.IsAuthenticated]
+    max_wait = 30
+    poll_interval = 0.5
+
+    def get(self, request, pk):
+        submission = get_object_or_404(Submission.objects.only('id'), pk=pk, user=request.user)
+        try:
+            wait = min(float(request.query_params.get('wait', 0)), self.max_wait)
+        except ValueError:
+            wait = 0
+        deadline = time.monotonic() + wait
+        while True:
+            job = GradingJob.objects.filter(submission_id=submission.pk).values('status', 'attempts', 'error').first()
+            finished = job is None or job['status'] in (GradingJob.DONE, GradingJob.FAILED)
+            if finished or time.monotonic() >= deadline:
+                break
+            time.sleep(self.poll_interval)
+        result = Submission.objects.filter(pk=submission.pk).values('is_correct', 'feedback').get()
+        return Response({
+            'submission': submission.pk,
+            'status': job['status'] if job else GradingJob.DONE,
+            'attempts': job['attempts'] if job else 0,
+            'error': job['error'] if job else '',
+            'is_correct': result['is_correct'],
+            'feedback': result['feedback'],
+        })
 
-class UserSubmissionsView(APIView):
+class UserSubmissionsView(QuerysetOptimizerMixin, generics.ListAPIView):
+    queryset = Submission.objects.all()
+    serializer_class = SubmissionSerializer
     permission_classes = [permissions.IsAuthenticated]
-    def get(self, request):
-        submissions = Submission.objects.filter(user=request.user)
-        return Response(SubmissionSerializer(submissions, many=True).data)
+    ordering = '-submitted_at'
+
+    def get_queryset(self):
+        return super().get_queryset().filter(user=self.request.user)
 
 # MCQ CRUD
-class MCQListView(generics.ListCreateAPIView):
+class MCQListView(QuerysetOptimizerMixin, generics.ListCreateAPIView):
     queryset = MCQ.objects.all()
     serializer_class = MCQSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
-class MCQDetailView(generics.RetrieveUpdateDestroyAPIView):
+class MCQBulkCreateView(BulkCreateMixin, generics.GenericAPIView):
+    queryset = MCQ.objects.all()
+    serializer_class = MCQSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def perform_bulk_create(self, serializer):
+        mcqs = serializer.save()
+        # bulk_create sends no post_save signals.
+        catalog.bump_for_lessons(mcq.lesson_id for mcq in mcqs)
+
+class MCQDetailView(QuerysetOptimizerMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = MCQ.objects.all()
     serializer_class = MCQSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
 # LearningPath CRUD
-class LearningPathListView(generics.ListCreateAPIView):
+class LearningPathListView(QuerysetOptimizerMixin, generics.ListCreateAPIView):
     queryset = LearningPath.objects.all()
     serializer_class = LearningPathSerializer
     permission_classes = [permissions.IsAuthenticated]
+    ordering = '-created_at'
 
-class LearningPathDetailView(generics.RetrieveUpdateDestroyAPIView):
+class LearningPathDetailView(QuerysetOptimizerMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = LearningPath.objects.all()
     serializer_class = LearningPathSerializer
     permission_classes = [permissions.IsAuthenticated]
 
 # UserProgress CRUD
-class UserProgressListView(generics.ListCreateAPIView):
+class UserProgressListView(QuerysetOptimizerMixin, generics.ListCreateAPIView):
     queryset = UserProgress.objects.all()
     serializer_class = UserProgressSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-class UserProgressDetailView(generics.RetrieveUpdateDestroyAPIView):
+class UserProgressBulkUpsertView(BulkCreateMixin, generics.GenericAPIView):
+    """Create or update the requesting user's progress for many lessons, keyed by lesson."""
+    queryset = UserProgress.objects.all()
+    serializer_class = UserProgressSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    bulk_owner_field = 'user'
+    bulk_unique_fields = ['user', 'lesson']
+    bulk_update_fields = ['completed', 'last_accessed']
+
+    def perform_bulk_create(self, serializer):
+        rows = serializer.save()
+        # bulk_create bypasses the signals that keep Enrollment.progress and the dashboard current.
+        lesson_ids = [row.lesson_id for row in rows]
+        progress.refresh_enrollments(Enrollment.objects.filter(user=self.request.user, course__lessons__id__in=lesson_ids))
+        dashboard.invalidate(self.request.user.id)
+
+class UserProgressDetailView(QuerysetOptimizerMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = UserProgress.objects.all()
     serializer_class = UserProgressSerializer
     permission_classes = [permissions.IsAuthenticated]
 
 # Course Review Views
-class CourseReviewListCreateView(generics.ListCreateAPIView):
+class CourseReviewListCreateView(QuerysetOptimizerMixin, generics.ListCreateAPIView):
     queryset = CourseReview.objects.all()
     serializer_class = CourseReviewSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    ordering = '-created_at'
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        # Rating stats are updated by signals; commit them together with the review.
+        with transaction.atomic():
+            serializer.save(user=self.request.user)
 
-class CourseReviewDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CourseReviewDetailView(QuerysetOptimizerMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = CourseReview.objects.all()
     serializer_class = CourseReviewSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
     def perform_update(self, serializer):
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            serializer.save(user=self.request.user)
 
 # Test Views
-class TestListCreateView(generics.ListCreateAPIView):
+class TestListCreateView(QuerysetOptimizerMixin, generics.ListCreateAPIView):
     queryset = Test.objects.all()
     serializer_class = TestSerializer
     permission_classes = [permissions.IsAuthenticated]
+    ordering = '-created_at'
 
-class TestDetailView(generics.RetrieveUpdateDestroyAPIView):
+class TestDetailView(QuerysetOptimizerMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Test.objects.all()
     serializer_class = TestSerializer
     permission_classes = [permissions.IsAuthenticated]
 
 # Test Submission Views
-class TestSubmissionListCreateView(generics.ListCreateAPIView):
+class TestSubmissionListCreateView(QuerysetOptimizerMixin, generics.ListCreateAPIView):
     queryset = TestSubmission.objects.all()
     serializer_class = TestSubmissionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    ordering = '-submitted_at'
 
     def perform_create(self, serializer):
-        # Auto-grade MCQ answers
-        test = Test.objects.get(pk=self.request.data['test'])
-        answers = self.request.data.get('answers', {})
-        score = 0
-        total = test.mcqs.count()
-        for mcq in test.mcqs.all():
-            user_answer = answers.get(str(mcq.id))
-            if user_answer and user_answer == mcq.answer:
-                score += 1
-        percent_score = (score / total) * 100 if total > 0 else 0
-        serializer.save(user=self.request.user, score=percent_score, is_graded=True)
-
-class TestSubmissionDetailView(generics.RetrieveAPIView):
+        # Auto-grade MCQ answers against the cached answer key
+        test_id = self.kwargs['test_id']
+        answer_key = get_answer_key(test_id)
+        if answer_key is None:
+            raise NotFound('Test not found')
+        score, results = score_answers(answer_key, self.request.data.get('answers', {}))
+        serializer.save(user=self.request.user, test_id=test_id, score=score, results=results, is_graded=True)
+
+class TestSubmissionBulkGradeView(APIView):
+    """
+    Grade many submissions for one test in a single request.
+
+    POST ``{"submissions": [{"user": <id>, "answers": {...}}, ...]}`` creates and
+    grades them in one transaction; POST ``{"regrade": true}`` re-scores every
+    existing submission of the test (e.g. after an answer was corrected).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    batch_size = 1000
+
+    def post(self, request, test_id):
+        test = get_object_or_404(Test.objects.select_related('course'), pk=test_id)
+        if not (request.user.is_staff or test.course.instructor_id == request.user.id):
+            return Response({'error': 'Only the course instructor can bulk grade'}, status=403)
+        answer_key = get_answer_key(test_id)
+        if request.data.get('regrade'):
+            return Response({'regraded': self.regrade(test_id, answer_key)})
+
+        items = request.data.get('submissions')
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            return Response({'error': 'submissions must be a list of objects'}, status=400)
+        user_ids = {item.get('user') for item in items}
+        # JSON true/false arrive as bools, which are ints to Python; they are not user ids.
+        ids = [uid for uid in user_ids if isinstance(uid, int) and not isinstance(uid, bool)]
+        known = set(User.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        if user_ids - known:
+            return Response({'error': 'Unknown users', 'users': sorted(map(str, user_ids - known))}, status=400)
+        submissions = []
+        for item in items:
+            score, results = score_answers(answer_key, item.get('answers', {}))
+            submissions.append(TestSubmission(
+                user_id=item['user'], test_id=test_id, answers=item.get('answers', {}),
+                score=score, results=results, is_graded=True,
+            ))
+        with transaction.atomic():
+            TestSubmission.objects.bulk_create(submissions, batch_size=self.batch_size)
+        return Response({
+            'graded': len(submissions),
+            'submissions': [{'user': sub.user_id, 'score': sub.score} for sub in submissions],
+        }, status=201)
+
+    def regrade(self, test_id, answer_key):
+        # Each batch is read in full before it is written, never updated under an open cursor.
+        ids = list(TestSubmission.objects.filter(test_id=test_id).order_by('pk').values_list('pk', flat=True))
+        with transaction.atomic():
+            for start in range(0, len(ids), self.batch_size):
+                batch = list(TestSubmission.objects.filter(pk__in=ids[start:start + self.batch_size]).only('id', 'answers'))
+                for submission in batch:
+                    submission.score, submission.results = score_answers(answer_key, submission.answers)
+                    submission.is_graded = True
+                TestSubmission.objects.bulk_update(batch, ['score', 'results', 'is_graded'])
+        return len(ids)
+
+class TestSubmissionDetailView(QuerysetOptimizerMixin, generics.RetrieveAPIView):
     queryset = TestSubmission.objects.all()
     serializer_class = TestSubmissionSerializer
     permission_classes = [permissions.IsAuthenticated]
 
 # Module CRUD
-class ModuleListView(generics.ListCreateAPIView):
+class ModuleListView(QuerysetOptimizerMixin, generics.ListCreateAPIView):
     queryset = Module.objects.all()
     serializer_class = ModuleSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
-class ModuleDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ModuleDetailView(QuerysetOptimizerMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Module.objects.all()
     serializer_class = ModuleSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
 # Note CRUD
-class NoteListView(generics.ListCreateAPIView):
+class NoteListView(QuerysetOptimizerMixin, generics.ListCreateAPIView):
+    queryset = Note.objects.all()
+    serializer_class = NoteSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    ordering = '-created_at'
+
+class NoteBulkCreateView(BulkCreateMixin, generics.GenericAPIView):
     queryset = Note.objects.all()
     serializer_class = NoteSerializer
     permission_classes = [permissions.IsAuthenticated]
+    bulk_owner_field = 'user'
 
-class NoteDetailView(generics.RetrieveUpdateDestroyAPIView):
+class NoteDetailView(QuerysetOptimizerMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Note.objects.all()
     serializer_class = NoteSerializer
     permission_classes = [permissions.IsAuthenticated]
 
 # ChatMessage CRUD
-class ChatMessageListView(generics.ListCreateAPIView):
+def _content_encoding(request):
+    """``br`` (when the brotli package is installed) or ``gzip`` if the client accepts it, else None."""
+    accepted = {part.split(';')[0].strip().lower() for part in request.headers.get('Accept-Encoding', '').split(',')}
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def _encode_body(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    return data
+
+
+def _not_modified(request, etag):
+    """304 response if the request's ``If-None-Match`` already carries ``etag``."""
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        return response
+    return None
+
+
+class ChatMessageListView(QuerysetOptimizerMixin, generics.ListCreateAPIView):
+    """
+    Chat history; live rooms are served over WebSockets (see api/chat.py).
+
+    ``?course=<id>&after=<message id>`` (or ``&since=<ISO timestamp>``) is the
+    incremental sync used by polling clients: messages after the cursor in
+    ascending order in a compact payload (user ids plus a separate ``users``
+    map) with an ``ETag``, so an idle poll is one indexed query and a 304.
+    """
     queryset = ChatMessage.objects.all()
     serializer_class = ChatMessageSerializer
     permission_classes = [permissions.IsAuthenticated]
+    ordering = '-timestamp'
+    sync_limit = 200
+    max_sync_limit = 1000
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        course = self.request.query_params.get('course')
+        if course:
+            qs = qs.filter(course_id=course)
+        return qs
+
+    def list(self, request, *args, **kwargs):
+        params = request.query_params
+        if 'after' not in params and 'since' not in params:
+            return super().list(request, *args, **kwargs)
+        try:
+            course = int(params['course'])
+            limit = min(max(int(params.get('limit', self.sync_limit)), 1), self.max_sync_limit)
+            after = int(params.get('after', 0))
+        except (KeyError, ValueError):
+            return Response({'error': 'course, after and limit must be integers (course is required)'}, status=400)
+        since = parse_datetime(params['since']) if 'since' in params else None
+        if 'since' in params and since is None:
+            return Response({'error': 'since must be an ISO 8601 timestamp'}, status=400)
+
+        messages = ChatMessage.objects.filter(course_id=course, id__gt=after)
+        if since is not None:
+            messages = messages.filter(timestamp__gt=since)
+        # The latest edit is part of the tag, so editing a message already in the window is not answered with a 304.
+        state = messages.aggregate(last=Max('id'), count=Count('id'), edited=Max('updated_at'))
+        edited = state['edited'].timestamp() if state['edited'] else 0
+        etag = quote_etag(
+            f"chat-{course}-{after}-{params.get('since', '')}-{limit}-{state['last']}-{state['count']}-{edited:.6f}"
+        )
+        not_modified = _not_modified(request, etag)
+        if not_modified:
+            return not_modified
+
+        rows = list(messages.order_by('id').values('id', 'user_id', 'message', 'timestamp')[:limit])
+        users = {
+            str(user.pk): {'username': user.username, 'displayName': user.get_full_name() or user.username}
+            for user in User.objects.filter(pk__in={row['user_id'] for row in rows}).only('username', 'first_name', 'last_name')
+        }
+        response = Response({
+            'course': course,
+            'messages': [
+                {'id': row['id'], 'user': row['user_id'], 'message': row['message'], 'timestamp': row['timestamp']}
+                for row in rows
+            ],
+            'users': users,
+            'cursor': rows[-1]['id'] if rows else after,
+            'has_more': state['count'] > len(rows),
+        })
+        response['ETag'] = etag
+        return response
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
 
-class ChatMessageDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ChatMessageDetailView(QuerysetOptimizerMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = ChatMessage.objects.all()
     serializer_class = ChatMessageSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def retrieve(self, request, *args, **kwargs):
+        row = get_object_or_404(ChatMessage.objects.values('id', 'user_id', 'message', 'timestamp'), pk=kwargs['pk'])
+        digest = hashlib.sha1(repr(sorted(row.items())).encode()).hexdigest()
+        etag = quote_etag(f'chat-message-{digest}')
+        not_modified = _not_modified(request, etag)
+        if not_modified:
+            return not_modified
+        response = super().retrieve(request, *args, **kwargs)
+        response['ETag'] = etag
+        return response
+
 # Analytics/Stats
 class UserStatsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     def get(self, request):
         user = request.user
-        enrollments = Enrollment.objects.filter(user=user)
-        completed_courses = enrollments.filter(completed=True).count()
-        progress = UserProgress.objects.filter(user=user, completed=True).count()
-        return Response({
-            'completed_courses': completed_courses,
-            'completed_lessons': progress,
-        })
+        return Response(dashboard.cached(user.id, 'stats', lambda: {
+            'completed_courses': Enrollment.objects.filter(user=user, completed=True).count(),
+            'completed_lessons': UserProgress.objects.filter(user=user, completed=True).count(),
+        }))
 
 # AI Feedback (placeholder)
 class AIFeedbackView(APIView):
@@ -343,49 +766,143 @@ class AIFeedbackView(APIView):
         language = request.data.get('language', 'python')
         return Response({'feedback': f'AI feedback for {language} code (placeholder).', 'suggestions': []})
 
-# Judge0 Code Execution (placeholder)
+# Code Execution (local sandbox pool)
 class CodeExecutionView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     def post(self, request):
-        # TODO: Integrate Judge0 API
         code = request.data.get('code')
+        if not code:
+            return Response({'error': 'code is required'}, status=400)
         language = request.data.get('language', 'python')
-        return Response({'stdout': 'Output placeholder', 'stderr': '', 'success': True})
+        result = run_code(code, stdin=request.data.get('stdin', ''), language=language)
+        return Response({
+            'stdout': result['stdout'],
+            'stderr': result['stderr'],
+            'status': result['status'],
+            'time': result['time'],
+            'success': result['status'] == 'ok',
+        })
 
-# File upload for PDF extraction (placeholder)
+# PDF ingestion (see api/ingest.py)
 class PDFUploadView(APIView):
+    """
+    Upload a PDF (multipart ``file``) to be split into lessons of ``course``
+    (instructor or staff only) or into notes on ``lesson``. The file is spooled
+    to disk and processed by the ``ingest_pdfs`` worker; poll ``status_url``.
+    """
     parser_classes = [MultiPartParser]
     permission_classes = [permissions.IsAuthenticated]
+
+    # Room for the form fields and multipart boundaries around the file itself.
+    form_overhead = 64 * 1024
+
     def post(self, request):
-        # TODO: Integrate PDF extraction logic
-        file = request.FILES['file']
-        return Response({'filename': file.name, 'message': 'PDF received'}, status=200)
+        limit = ingest.max_upload_bytes()
+        try:
+            declared = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            declared = 0
+        # Refuse before reading the body when the client announces too much.
+        if declared > limit + self.form_overhead:
+            return Response({'error': 'file is too large'}, status=413)
+        # Stream every upload to a temporary file instead of buffering small ones in memory.
+        handler = ingest.LimitedUploadHandler(request._request, limit)
+        request._request.upload_handlers = [handler]
+        upload = request.FILES.get('file')
+        if handler.exceeded:
+            return Response({'error': 'file is too large'}, status=413)
+        if upload is None:
+            return Response({'error': 'file is required'}, status=400)
+        if upload.read(5) != b'%PDF-':
+            return Response({'error': 'file is not a PDF'}, status=400)
+
+        try:
+            course_id = int(request.data['course']) if request.data.get('course') else None
+            lesson_id = int(request.data['lesson']) if request.data.get('lesson') else None
+        except ValueError:
+            return Response({'error': 'course and lesson must be integers'}, status=400)
+        course = lesson = None
+        if course_id is not None:
+            course = get_object_or_404(Course, pk=course_id)
+            if not (request.user.is_staff or course.instructor_id == request.user.id):
+                return Response({'error': 'Only the course instructor can import lessons'}, status=403)
+        elif lesson_id is not None:
+            lesson = get_object_or_404(Lesson, pk=lesson_id)
+        else:
+            return Response({'error': 'course or lesson is required'}, status=400)
+
+        job = PDFIngestJob.objects.create(
+            user=request.user, course=course, lesson=lesson, filename=upload.name[:255], path=ingest.spool_upload(upload),
+        )
+        return Response({
+            'job': job.pk,
+            'filename': job.filename,
+            'status': job.status,
+            'status_url': reverse('pdf-job-status', args=[job.pk]),
+        }, status=202)
+
+class PDFIngestJobView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        jobs = PDFIngestJob.objects.all() if request.user.is_staff else PDFIngestJob.objects.filter(user=request.user)
+        job = get_object_or_404(jobs, pk=pk)
+        return Response({
+            'job': job.pk,
+            'filename': job.filename,
+            'status': job.status,
+            'pages_total': job.pages_total,
+            'pages_done': job.pages_done,
+            'course': job.course_id,
+            'lesson': job.lesson_id,
+            'created': job.created,
+            'error': job.error,
+        })
 
 # Home Overview
+HOME_OVERVIEW_LIMIT = 6
+
+
+def _overview_course(course, progress):
+    return {"id": course.id, "title": course.title, "language": course.language, "progress": progress}
+
+
+def _home_overview_payload(user):
+    progress = dict(Enrollment.objects.filter(user=user).values_list('course_id', 'progress'))
+    recent = (
+        UserProgress.objects.filter(user=user).select_related('lesson__course')
+        .order_by('-last_accessed').first()
+    )
+    recommended_ids = recommendations.recommended_course_ids(progress, HOME_OVERVIEW_LIMIT)
+    trending_ids = recommendations.trending_course_ids(HOME_OVERVIEW_LIMIT)
+    courses = Course.objects.in_bulk(recommended_ids + trending_ids)
+
+    def listed(course_ids):
+        return [
+            _overview_course(courses[course_id], progress.get(course_id, 0.0))
+            for course_id in course_ids if course_id in courses
+        ]
+
+    most_recent = None
+    if recent is not None:
+        course = recent.lesson.course
+        most_recent = dict(_overview_course(course, progress.get(course.id, 0.0)), lesson={
+            "id": recent.lesson.id, "title": recent.lesson.title, "last_accessed": recent.last_accessed,
+        })
+    return {
+        "most_recent": most_recent,
+        "recommended": listed(recommended_ids),
+        "trending": listed(trending_ids),
+    }
+
+
 @api_view(["GET"])
 @permission_classes([permissions.IsAuthenticated])
 def home_overview(request):
-    # Dummy user data
-    user_id = request.user.id
-    # Dummy most recent course
-    most_recent = {
-        "id": 1,
-        "title": "Full Stack Web Development",
-        "progress": 65,
-        "image": "https://source.unsplash.com/featured/?web,code",
-    }
-    # Dummy recommended courses
-    recommended = [
-        {"id": 2, "title": "Python for Data Science", "image": "https://source.unsplash.com/featured/?python,data", "progress": 0},
-        {"id": 3, "title": "React Mastery", "image": "https://source.unsplash.com/featured/?react,frontend", "progress": 0},
-    ]
-    # Dummy trending courses
-    trending = [
-        {"id": 4, "title": "Machine Learning Basics", "image": "https://source.unsplash.com/featured/?machinelearning,ai", "progress": 0},
-        {"id": 5, "title": "DevOps Essentials", "image": "https://source.unsplash.com/featured/?devops,cloud", "progress": 0},
-    ]
-    return Response({
-        "most_recent": most_recent,
-        "recommended": recommended,
-        "trending": trending,
-    })
+    """
+    Last accessed course, recommendations and trending courses. Recommendations
+    and trends are read from tables rebuilt by ``compute_recommendations``; the
+    whole payload is cached per user (see api/dashboard.py).
+    """
+    user = request.user
+    return Response(dashboard.cached(user.id, 'overview', lambda: _home_overview_payload(user)))
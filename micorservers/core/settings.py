@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -23,7 +27,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = "django-insecure-na11erj+k8df(p&4w*0%0#yt-+k)njzin(n8rk+q&w@p8g^9*l"
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get("DJANGO_DEBUG", "1") != "0"
 
 ALLOWED_HOSTS = []
 
@@ -44,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.metrics.MetricsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -85,6 +90,36 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Answer keys, dashboards, outlines and catalog versions are invalidated by
+# signals in whichever process made the write, so every web process and the
+# grade_worker must share one cache. Set REDIS_URL (needs the "redis" package)
+# or CACHE_BACKEND/CACHE_LOCATION to a shared backend. Local memory is per
+# process and is refused outside DEBUG unless CACHE_ALLOW_LOCAL=1 (a single
+# process serving everything).
+
+REDIS_URL = os.environ.get("REDIS_URL", "")
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND",
+            "django.core.cache.backends.redis.RedisCache" if REDIS_URL else "django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", REDIS_URL or "codementor"),
+        "TIMEOUT": 300,
+    }
+}
+if CACHES["default"]["BACKEND"].endswith(".LocMemCache"):
+    CACHES["default"]["OPTIONS"] = {"MAX_ENTRIES": 10000}
+    if not DEBUG and os.environ.get("CACHE_ALLOW_LOCAL") != "1":
+        raise ImproperlyConfigured(
+            "CACHES['default'] is a per-process LocMemCache, so cache invalidation would not reach other "
+            "processes. Set REDIS_URL or CACHE_BACKEND to a shared cache, or CACHE_ALLOW_LOCAL=1 for a "
+            "single-process deployment."
+        )
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -140,4 +175,87 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.TokenAuthentication',
         'api.authentication.CsrfExemptSessionAuthentication',
     ],
-}
\ No newline at end of file
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+}
+
+# Per-route request metrics served at /api/metrics/ (see api/metrics.py)
+METRICS_ENABLED = True
+
+# Local code-execution sandbox (see api/sandbox.py)
+SANDBOX = {
+    # Upper bound per process; workers are started on demand.
+    'WORKERS': int(os.environ.get('SANDBOX_WORKERS', os.cpu_count() or 2)),
+    # Never run code without namespaces/chroot/privilege drop unless explicitly disabled (development only).
+    'ISOLATION': os.environ.get('SANDBOX_ISOLATION', '1') != '0',
+    'CPU_SECONDS': 2,
+    'WALL_SECONDS': 5,
+    'MEMORY_MB': 256,
+    'MAX_OUTPUT': 64 * 1024,
+    # Batched grading: per test case and whole-session limits.
+    'CASE_SECONDS': 2,
+    'BATCH_SECONDS': 30,
+    'STOP_ON_FAILURE': False,
+}
+
+# Cache of verdicts for byte-identical submissions (see api/verdict_cache.py)
+VERDICT_CACHE = {
+    'TTL': 7 * 24 * 3600,
+    'MAX_ENTRIES': 50000,
+    'CULL_EVERY': 100,
+}
+
+# Offline recommendation tables behind home_overview (see api/recommendations.py)
+RECOMMENDATIONS = {
+    'TRENDING_WINDOW_DAYS': 7,
+    'ENROLLMENT_WEIGHT': 3.0,
+    'SUBMISSION_WEIGHT': 1.0,
+    'SIMILAR_PER_COURSE': 20,
+    'MIN_CO_ENROLLMENTS': 2,
+}
+
+# Per-user dashboard payloads (see api/dashboard.py)
+DASHBOARD_CACHE = {
+    'CACHE': 'default',
+    'TTL': 15 * 60,
+}
+
+# Versioned cache and HTTP caching of public course catalog reads (see api/catalog.py)
+CATALOG_CACHE = {
+    'CACHE': 'default',
+    'TTL': 60 * 60,
+    'MAX_AGE': 60,
+}
+
+# Per-course outline trees (see api/outline.py)
+OUTLINE_CACHE = {
+    'CACHE': 'default',
+    'TTL': 60 * 60,
+}
+
+# Course chat over WebSockets (see api/chat.py). Use 'api.chat.RedisBroker'
+# (needs the "redis" package) when running more than one server process.
+CHAT = {
+    'BROKER': os.environ.get('CHAT_BROKER', 'api.chat.InProcessBroker'),
+    'REDIS_URL': os.environ.get('CHAT_REDIS_URL', 'redis://localhost:6379/0'),
+    'BACKFILL': 50,
+    'BATCH_INTERVAL': 0.05,
+    'BATCH_SIZE': 100,
+}
+
+# PDF ingestion (see api/ingest.py); run `manage.py ingest_pdfs` to process uploads.
+PDF_INGEST = {
+    'SPOOL_DIR': os.environ.get('PDF_SPOOL_DIR', os.path.join(tempfile.gettempdir(), 'codementor-pdf-spool')),
+    'MAX_UPLOAD_MB': 100,
+    'PROCESSES': int(os.environ.get('PDF_INGEST_PROCESSES', 2)),
+    'PAGES_PER_TASK': 8,
+    'CHUNK_CHARS': 20000,
+}
+
+# Near-duplicate submission index (see api/plagiarism.py); run
+# `manage.py rebuild_plagiarism_index` after changing these values.
+PLAGIARISM = {
+    'SHINGLE_SIZE': 5,
+    'PERMUTATIONS': 128,
+    'BANDS': 32,
+}